@@ -1,5 +1,21 @@
+import importlib
+
 from .config import Settings
-from .planner import TaskPlanner
-from .executor import TaskExecutor
-from .report import ReportRenderer
-from .state import StateStore
+
+_LAZY = {
+    "TaskPlanner": ".planner",
+    "TaskExecutor": ".executor",
+    "ReportRenderer": ".report",
+    "StateStore": ".state",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["Settings", *_LAZY]
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import Settings
+
+
+DETECTORS = ("isolation_forest", "mad")
+MODEL_PARAMS = ("contamination", "n_estimators", "max_samples", "threshold")
+MAD_SCALE = 0.6745
+
+
+class MADDetector:
+    def __init__(self, threshold: float = 3.5):
+        self.threshold = threshold
+        self.median: Optional[np.ndarray] = None
+        self.mad: Optional[np.ndarray] = None
+
+    def fit(self, X: np.ndarray) -> "MADDetector":
+        self.median = np.nanmedian(X, axis=0)
+        mad = np.nanmedian(np.abs(X - self.median), axis=0)
+        self.mad = np.where(mad > 0, mad, np.nan)
+        return self
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        z = MAD_SCALE * np.abs(X - self.median) / self.mad
+        return np.nan_to_num(z, nan=0.0).max(axis=1)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return np.where(self.score(X) > self.threshold, -1, 1)
+
+
+def build_detector(name: str, params: Dict[str, Any], n_jobs: int = 1):
+    if name == "mad":
+        return MADDetector(threshold=float(params.get("threshold", 3.5)))
+    if name == "isolation_forest":
+        from sklearn.ensemble import IsolationForest
+
+        return IsolationForest(
+            random_state=42,
+            contamination=params.get("contamination", 0.05),
+            n_estimators=int(params.get("n_estimators", 100)),
+            max_samples=params.get("max_samples", "auto"),
+            n_jobs=int(params.get("n_jobs", n_jobs)),
+        )
+    raise ValueError(f"不支持的异常检测方法: {name}")
+
+
+def schema_key(detector: str, columns: List[str], dtypes: Iterable[Any], params: Dict[str, Any]) -> str:
+    material = json.dumps(
+        [detector, columns, [str(d) for d in dtypes], {k: params.get(k) for k in MODEL_PARAMS}],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:24]
+
+
+class ModelStore:
+    def __init__(self, settings: Settings):
+        self.root = settings.model_dir or os.path.join(settings.state_dir, "models")
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.joblib")
+
+    def load(self, key: str):
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        import joblib
+
+        try:
+            return joblib.load(path)
+        except Exception:
+            return None
+
+    def save(self, key: str, model) -> str:
+        import joblib
+
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(key)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            joblib.dump(model, tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return path
+
+
+def matrix(frame: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    return np.nan_to_num(frame[columns].to_numpy(dtype=np.float64), nan=0.0)
+
+
+def fit_sample(frame: pd.DataFrame, size: int, seed: int = 42) -> pd.DataFrame:
+    if size <= 0 or len(frame) <= size:
+        return frame
+    return frame.sample(n=size, random_state=seed)
+
+
+def score_batches(model, frame: pd.DataFrame, columns: List[str], batch_size: int) -> np.ndarray:
+    batch_size = max(1, batch_size)
+    preds = np.empty(len(frame), dtype=np.int8)
+    for start in range(0, len(frame), batch_size):
+        preds[start : start + batch_size] = model.predict(matrix(frame.iloc[start : start + batch_size], columns))
+    return preds
+
+
+class AnomalyEngine:
+    def __init__(self, settings: Settings, params: Dict[str, Any]):
+        self.settings = settings
+        self.params = params
+        self.detector = params.get("detector", "isolation_forest")
+        if self.detector not in DETECTORS:
+            raise ValueError(f"不支持的异常检测方法: {self.detector}")
+        self.fit_sample_size = int(params.get("fit_sample_size", settings.model_fit_sample_size))
+        self.batch_size = int(params.get("batch_size") or settings.stream_chunksize)
+        self.reuse = bool(params.get("reuse_model", settings.model_reuse))
+        self.store = ModelStore(settings)
+        self.reused = False
+        self.model_path: Optional[str] = None
+
+    def fit(self, sample: pd.DataFrame, columns: List[str]):
+        key = schema_key(self.detector, columns, sample[columns].dtypes, self.params)
+        if self.reuse:
+            model = self.store.load(key)
+            if model is not None:
+                self.reused = True
+                self.model_path = self.store.path(key)
+                return model
+        model = build_detector(self.detector, self.params, self.settings.model_n_jobs)
+        model.fit(matrix(fit_sample(sample, self.fit_sample_size), columns))
+        self.model_path = self.store.save(key, model)
+        return model
+
+    def summary(self) -> Dict[str, Any]:
+        return {"detector": self.detector, "model_path": self.model_path, "model_reused": self.reused}
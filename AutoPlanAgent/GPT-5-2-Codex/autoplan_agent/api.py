@@ -1,11 +1,18 @@
-from fastapi import FastAPI
+import asyncio
+import json
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 
 from .config import Settings
 from .planner import TaskPlanner
-from .executor import TaskExecutor
 from .state import StateStore
+from .schemas import ExecutionPlan, TaskUnderstanding
+from .jobs import JobManager, JobQueueFull
+from .metrics import REGISTRY
 
 
 class PlanRequest(BaseModel):
@@ -17,40 +24,150 @@ class ExecuteRequest(BaseModel):
     task: str
     feedback: Optional[str] = None
     run_id: Optional[str] = None
+    understanding: Optional[TaskUnderstanding] = None
+    plan: Optional[ExecutionPlan] = None
+    wait: bool = False
 
 
 def create_app() -> FastAPI:
     settings = Settings.load()
     planner = TaskPlanner(settings)
-    executor = TaskExecutor(settings)
     state = StateStore(settings)
+    if settings.api_execution == "process":
+        from .workers import WorkerPool
+
+        workers = WorkerPool(settings)
+        run, close = workers.run, workers.shutdown
+        jobs = JobManager(settings, run, state.create, workers=workers.size)
+    else:
+        from .executor import TaskExecutor
+
+        executor = TaskExecutor(settings)
+        run, close = executor.run, executor.close
+        jobs = JobManager(settings, run, state.create)
 
     app = FastAPI(title="AutoPlanAgent API")
 
-    @app.post("/plan")
-    def plan(req: PlanRequest):
-        understanding = planner.understand(req.task)
-        if req.feedback:
+    @app.on_event("shutdown")
+    def shutdown():
+        jobs.shutdown()
+        close()
+
+    def _resolve(req: ExecuteRequest):
+        understanding = req.understanding or planner.understand(req.task)
+        if req.plan is not None:
+            plan = req.plan
+        elif req.feedback:
             plan = planner.replan(understanding, req.feedback)
         else:
             plan = planner.plan(understanding)
-        return {"understanding": understanding.model_dump(), "plan": plan.model_dump()}
+        return understanding, plan
 
-    @app.post("/execute")
-    def execute(req: ExecuteRequest):
-        understanding = planner.understand(req.task)
+    @app.post("/plan")
+    async def plan(req: PlanRequest):
+        understanding = await run_in_threadpool(planner.understand, req.task)
         if req.feedback:
-            plan = planner.replan(understanding, req.feedback)
+            plan = await run_in_threadpool(planner.replan, understanding, req.feedback)
         else:
-            plan = planner.plan(understanding)
-        result = executor.run(plan, understanding, run_id=req.run_id)
-        return {"run": result}
+            plan = await run_in_threadpool(planner.plan, understanding)
+        return {"understanding": understanding.model_dump(), "plan": plan.model_dump()}
+
+    @app.post("/execute")
+    async def execute(req: ExecuteRequest):
+        understanding, plan = await run_in_threadpool(_resolve, req)
+        if req.wait:
+            result = await run_in_threadpool(run, plan, understanding, req.run_id)
+            return {"run": result}
+        try:
+            job = jobs.submit(plan, understanding, run_id=req.run_id)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        return {"run_id": job.run_id, "status": job.status}
 
     @app.get("/status/{run_id}")
-    def status(run_id: str):
+    async def status(run_id: str):
+        job = jobs.get(run_id)
         if not state.exists(run_id):
+            if job is not None:
+                return {"run_id": run_id, "job": job.progress()}
             return {"error": "run_id 不存在"}
-        return state.load(run_id)
+        data = await run_in_threadpool(state.load, run_id)
+        if job is not None:
+            data["job"] = job.progress()
+        return data
+
+    @app.delete("/runs/{run_id}")
+    async def cancel(run_id: str):
+        job = jobs.cancel(run_id)
+        if not state.exists(run_id):
+            if job is None:
+                raise HTTPException(status_code=404, detail="run_id 不存在")
+            return {"run_id": run_id, "status": job.status}
+        if job is not None and job.status == "cancelled":
+            await run_in_threadpool(state.finish, run_id, "cancelled")
+            return {"run_id": run_id, "status": "cancelled"}
+        data = await run_in_threadpool(state.load, run_id)
+        if data.get("status") != "running" and (job is None or job.done):
+            return {"run_id": run_id, "status": data.get("status")}
+        await run_in_threadpool(state.request_cancel, run_id)
+        return {"run_id": run_id, "status": "cancelling"}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/runs")
+    async def runs(
+        status: Optional[str] = None,
+        tool: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        objective: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ):
+        return await run_in_threadpool(
+            state.catalog.query,
+            status=status,
+            tool=tool,
+            since=since,
+            until=until,
+            objective=objective,
+            limit=limit,
+            cursor=cursor,
+        )
+
+    @app.get("/runs/{run_id}/events")
+    async def events(run_id: str):
+        job = jobs.get(run_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="run_id 不存在或未在后台执行")
+
+        async def stream():
+            wake = job.subscribe(asyncio.get_running_loop())
+            try:
+                cursor = 0
+                while True:
+                    # 先清除唤醒标记再读取事件，读取之后到达的事件会再次唤醒
+                    wake.clear()
+                    batch = job.events_since(cursor)
+                    if not batch:
+                        if job.done:
+                            return
+                        try:
+                            await asyncio.wait_for(wake.wait(), 15.0)
+                        except asyncio.TimeoutError:
+                            yield ": keep-alive\n\n"
+                        continue
+                    for event in batch:
+                        yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+                    cursor += len(batch)
+                    if batch[-1]["type"] == "run_finished":
+                        return
+            finally:
+                job.unsubscribe(wake)
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
 
     return app
 
@@ -0,0 +1,184 @@
+import os
+import uuid
+from datetime import datetime
+from typing import Iterator, Optional
+
+from .config import Settings
+
+
+EXTENSIONS = {"arrow": ".arrow", "parquet": ".parquet", "csv": ".csv"}
+
+
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def unique_stamp() -> str:
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def format_of(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    for fmt, suffix in EXTENSIONS.items():
+        if ext == suffix:
+            return fmt
+    raise ValueError(f"无法识别的数据文件格式: {path}")
+
+
+def _to_arrow(df: "pd.DataFrame", schema=None):
+    import pyarrow as pa
+
+    if schema is None:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    try:
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.Table.from_pandas(df, preserve_index=False).cast(schema)
+
+
+def _widen_nulls(table):
+    # 首个分块中全为空的列会被推断为 null 类型，后续分块有值时无法转换，先放宽为字符串
+    import pyarrow as pa
+
+    if not any(pa.types.is_null(f.type) for f in table.schema):
+        return table
+    fields = [f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in table.schema]
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+def _to_pandas(table) -> "pd.DataFrame":
+    return table.to_pandas(split_blocks=True)
+
+
+class FrameWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self.format = format_of(path)
+        self.rows = 0
+        self._writer = None
+        self._sink = None
+        self._schema = None
+
+    def write(self, chunk: "pd.DataFrame") -> None:
+        if self.format == "csv":
+            chunk.to_csv(self.path, mode="a" if self.rows else "w", header=not self.rows, index=False)
+            self.rows += len(chunk)
+            return
+        import pyarrow as pa
+
+        if self._writer is None:
+            table = _widen_nulls(_to_arrow(chunk))
+            self._schema = table.schema
+            if self.format == "parquet":
+                import pyarrow.parquet as pq
+
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                self._sink = pa.OSFile(self.path, "wb")
+                self._writer = pa.ipc.new_file(self._sink, table.schema)
+        else:
+            table = _to_arrow(chunk, self._schema)
+        self._writer.write_table(table)
+        self.rows += len(chunk)
+
+    def close(self) -> None:
+        if self.format == "csv":
+            if not self.rows:
+                open(self.path, "w").close()
+            return
+        if self._writer is None:
+            import pandas as pd
+
+            self.write(pd.DataFrame())
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+    def __enter__(self) -> "FrameWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ArtifactStore:
+    def __init__(self, settings: Settings, fmt: Optional[str] = None):
+        self.settings = settings
+        fmt = (fmt or settings.artifact_format or "arrow").lower()
+        if fmt not in EXTENSIONS:
+            raise ValueError(f"不支持的数据文件格式: {fmt}")
+        if fmt != "csv" and not _has_pyarrow():
+            fmt = "csv"
+        self.format = fmt
+
+    def path(self, prefix: str) -> str:
+        os.makedirs(self.settings.output_dir, exist_ok=True)
+        name = f"{prefix}_{unique_stamp()}{EXTENSIONS[self.format]}"
+        return os.path.join(self.settings.output_dir, name)
+
+    def writer(self, prefix: str) -> FrameWriter:
+        return FrameWriter(self.path(prefix))
+
+    def write_frame(self, df: "pd.DataFrame", prefix: str) -> str:
+        return write_frame(df, self.path(prefix))
+
+
+def write_frame(df: "pd.DataFrame", path: str) -> str:
+    fmt = format_of(path)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        import pyarrow as pa
+
+        table = _to_arrow(df)
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+
+def read_frame(path: str) -> "pd.DataFrame":
+    import pandas as pd
+
+    fmt = format_of(path)
+    if fmt == "csv":
+        return pd.read_csv(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        return _to_pandas(pq.read_table(path, memory_map=True))
+    import pyarrow as pa
+
+    return _to_pandas(pa.ipc.open_file(pa.memory_map(path, "r")).read_all())
+
+
+def iter_frames(path: str, chunksize: int) -> Iterator["pd.DataFrame"]:
+    import pandas as pd
+
+    fmt = format_of(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, chunksize=chunksize)
+        return
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path, memory_map=True)
+        if not parquet.metadata.num_rows:
+            yield _to_pandas(parquet.schema_arrow.empty_table())
+            return
+        for batch in parquet.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas(split_blocks=True)
+        return
+    import pyarrow as pa
+
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    if not table.num_rows:
+        yield _to_pandas(table)
+        return
+    for batch in table.to_batches(max_chunksize=chunksize):
+        yield batch.to_pandas(split_blocks=True)
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .config import Settings
+from .catalog import payload_artifacts
+from .checkpoint import link_or_copy, json_default, safe_name
+from .schemas import PlanStep
+from .tools import ToolSpec
+
+
+def canonical_json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=json_default)
+
+
+class StepCache:
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.root = settings.cache_dir or os.path.join(settings.state_dir, "cache")
+        self.max_bytes = settings.cache_max_bytes
+        self.max_entries = settings.cache_max_entries
+        self.disabled_tools = set(settings.cache_disabled_tools)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30, check_same_thread=False)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute(
+                "create table if not exists entries ("
+                "key text primary key, tool text, size integer, created_at real, last_access real, "
+                "payload text, checkpoint text, fingerprint text, files text)"
+            )
+            conn.execute("create index if not exists entries_last_access on entries (last_access)")
+            self._conn = conn
+        return self._conn
+
+    def enabled_for(self, spec: ToolSpec, step: PlanStep) -> bool:
+        if not self.settings.step_cache or not spec.cacheable or spec.name in self.disabled_tools:
+            return False
+        return bool(step.parameters.get("cache", True))
+
+    def key(self, spec: ToolSpec, step: PlanStep, inputs: List[str]) -> Optional[str]:
+        external = ""
+        if spec.fingerprint is not None:
+            try:
+                external = spec.fingerprint(self.settings, step.parameters)
+            except Exception:
+                return None
+            if external is None:
+                return None
+        params = {k: v for k, v in step.parameters.items() if k != "cache"}
+        options = {k: getattr(self.settings, k, None) for k in spec.settings_keys}
+        material = canonical_json([spec.name, spec.version, params, options, inputs, external])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute(
+                "select payload, checkpoint, fingerprint, files from entries where key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            checkpoint = json.loads(row[1])
+            files = json.loads(row[3]) + [e["path"] for e in checkpoint.values()]
+            if not all(os.path.exists(f) for f in files):
+                self._delete(key)
+                return None
+            self._db().execute("update entries set last_access = ? where key = ?", (time.time(), key))
+            self._db().commit()
+        return {"payload": json.loads(row[0]), "checkpoint": checkpoint, "fingerprint": row[2]}
+
+    def put(
+        self,
+        key: str,
+        spec: ToolSpec,
+        payload: Dict[str, Any],
+        checkpoint: Dict[str, Dict[str, str]],
+        fingerprint: str,
+    ) -> None:
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        stored: Dict[str, Dict[str, str]] = {}
+        size = 0
+        for name, entry in checkpoint.items():
+            ext = os.path.splitext(entry["path"])[1]
+            path = link_or_copy(entry["path"], os.path.join(entry_dir, f"{safe_name(name)}{ext}"))
+            stored[name] = dict(entry, path=path)
+            size += os.path.getsize(path)
+        now = time.time()
+        with self._lock:
+            self._db().execute(
+                "insert or replace into entries values (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    spec.name,
+                    size,
+                    now,
+                    now,
+                    canonical_json(payload),
+                    json.dumps(stored),
+                    fingerprint,
+                    json.dumps(payload_artifacts(payload)),
+                ),
+            )
+            self._db().commit()
+            self._evict()
+
+    def _delete(self, key: str) -> None:
+        self._db().execute("delete from entries where key = ?", (key,))
+        self._db().commit()
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def _evict(self) -> None:
+        db = self._db()
+        count, total = db.execute("select count(*), coalesce(sum(size), 0) from entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, size in db.execute("select key, size from entries order by last_access").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._delete(key)
+            count -= 1
+            total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            for (key,) in self._db().execute("select key from entries").fetchall():
+                self._delete(key)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
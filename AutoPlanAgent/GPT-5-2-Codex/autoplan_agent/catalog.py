@@ -0,0 +1,223 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .config import Settings
+
+
+SCHEMA = """
+create table if not exists runs (
+    run_id text primary key,
+    created_at text,
+    updated_at real,
+    started_at real,
+    finished_at real,
+    duration real,
+    status text,
+    objective text,
+    steps_total integer default 0,
+    steps_done integer default 0,
+    steps_failed integer default 0,
+    tools text default '[]',
+    rows integer,
+    artifacts text default '[]'
+);
+create index if not exists runs_created on runs (created_at, run_id);
+create index if not exists runs_status_created on runs (status, created_at, run_id);
+create table if not exists run_tools (
+    run_id text,
+    tool text,
+    primary key (tool, run_id)
+) without rowid;
+create table if not exists run_steps (
+    run_id text,
+    step_name text,
+    status text,
+    primary key (run_id, step_name)
+) without rowid;
+"""
+
+# 步骤状态到运行状态的映射：failed/cancelled 一旦出现即保持，直到运行结束写入最终状态
+STEP_RUN_STATUS = {"failed": "failed", "cancelled": "cancelled"}
+STICKY_RUN_STATUS = ("failed", "cancelled")
+
+
+def payload_artifacts(payload: Dict[str, Any]) -> List[str]:
+    found = []
+    for value in payload.values():
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, str) and os.path.isfile(item):
+                found.append(item)
+    return found
+
+
+def payload_rows(payload: Dict[str, Any]) -> Optional[int]:
+    rows = payload.get("rows")
+    return int(rows) if isinstance(rows, (int, float)) else None
+
+
+class RunCatalog:
+    def __init__(self, settings: Settings):
+        self.path = settings.catalog_path or os.path.join(settings.state_dir, "catalog.db")
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=normal")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def record_snapshot(self, run_id: str, data: Dict[str, Any]) -> None:
+        plan_steps = (data.get("plan") or {}).get("steps", [])
+        tools = sorted({s.get("tool") for s in plan_steps if s.get("tool")})
+        steps = data.get("steps", [])
+        latest = {s.get("step_name"): s for s in steps}
+        artifacts: List[str] = []
+        rows = None
+        for step in steps:
+            payload = step.get("payload") or {}
+            artifacts.extend(payload_artifacts(payload))
+            step_rows = payload_rows(payload)
+            if step_rows is not None:
+                rows = step_rows if rows is None else max(rows, step_rows)
+        status = data.get("status") or ("running" if steps else "created")
+        started_at = data.get("started_at")
+        finished_at = data.get("finished_at")
+        duration = finished_at - started_at if started_at and finished_at else None
+        row = (
+            run_id,
+            data.get("created_at", ""),
+            time.time(),
+            started_at,
+            finished_at,
+            duration,
+            status,
+            (data.get("understanding") or {}).get("objective", ""),
+            len(plan_steps),
+            sum(1 for s in latest.values() if s.get("status") == "success"),
+            sum(1 for s in latest.values() if s.get("status") == "failed"),
+            json.dumps(tools, ensure_ascii=False),
+            rows,
+            json.dumps(artifacts, ensure_ascii=False),
+        )
+        with self._lock:
+            db = self._db()
+            if status == "running":
+                # 同一次执行中已有步骤失败或取消时，压缩写入的快照不把状态改回 running
+                current = db.execute("select status, started_at from runs where run_id = ?", (run_id,)).fetchone()
+                if current is not None and current["status"] in STICKY_RUN_STATUS and current["started_at"] == started_at:
+                    row = row[:6] + (current["status"],) + row[7:]
+            db.execute("insert or replace into runs values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            db.execute("delete from run_tools where run_id = ?", (run_id,))
+            db.executemany("insert or ignore into run_tools values (?, ?)", [(run_id, t) for t in tools])
+            db.execute("delete from run_steps where run_id = ?", (run_id,))
+            db.executemany(
+                "insert into run_steps values (?, ?, ?)",
+                [(run_id, name, s.get("status")) for name, s in latest.items() if name],
+            )
+            db.commit()
+
+    def record_step(self, run_id: str, step: Dict[str, Any]) -> None:
+        payload = step.get("payload") or {}
+        with self._lock:
+            db = self._db()
+            current = db.execute("select artifacts, rows from runs where run_id = ?", (run_id,)).fetchone()
+            if current is None:
+                return
+            artifacts = json.loads(current["artifacts"] or "[]") + payload_artifacts(payload)
+            rows = payload_rows(payload)
+            if current["rows"] is not None:
+                rows = current["rows"] if rows is None else max(rows, current["rows"])
+            # 每个步骤只保留最新状态，重试与恢复运行不会重复计数，计数与快照口径一致
+            db.execute("insert or replace into run_steps values (?, ?, ?)", (run_id, step.get("step_name"), step.get("status")))
+            db.execute(
+                "update runs set updated_at = ?, status = case when status in (?, ?) then status else ? end, "
+                "steps_done = (select count(*) from run_steps where run_id = ? and status = 'success'), "
+                "steps_failed = (select count(*) from run_steps where run_id = ? and status = 'failed'), "
+                "rows = ?, artifacts = ? where run_id = ?",
+                (
+                    time.time(),
+                    *STICKY_RUN_STATUS,
+                    STEP_RUN_STATUS.get(step.get("status"), "running"),
+                    run_id,
+                    run_id,
+                    rows,
+                    json.dumps(artifacts, ensure_ascii=False),
+                    run_id,
+                ),
+            )
+            db.commit()
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        tool: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        objective: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        clauses, args = [], []
+        if status:
+            clauses.append("r.status = ?")
+            args.append(status)
+        if tool:
+            clauses.append("r.run_id in (select run_id from run_tools where tool = ?)")
+            args.append(tool)
+        if since:
+            clauses.append("r.created_at >= ?")
+            args.append(since)
+        if until:
+            clauses.append("r.created_at < ?")
+            args.append(until)
+        if objective:
+            clauses.append("r.objective like ?")
+            args.append(f"%{objective}%")
+        if cursor:
+            created_at, _, run_id = cursor.partition("|")
+            clauses.append("(r.created_at, r.run_id) < (?, ?)")
+            args.extend([created_at, run_id])
+        limit = max(1, min(int(limit), 500))
+        where = f"where {' and '.join(clauses)}" if clauses else ""
+        sql = f"select * from runs r {where} order by r.created_at desc, r.run_id desc limit ?"
+        with self._lock:
+            rows = self._db().execute(sql, args + [limit + 1]).fetchall()
+        runs = []
+        for row in rows[:limit]:
+            item = dict(row)
+            item["tools"] = json.loads(item["tools"] or "[]")
+            item["artifacts"] = json.loads(item["artifacts"] or "[]")
+            runs.append(item)
+        next_cursor = None
+        if len(rows) > limit:
+            last = runs[-1]
+            next_cursor = f"{last['created_at']}|{last['run_id']}"
+        return {"runs": runs, "next_cursor": next_cursor}
+
+    def rebuild(self, load, run_ids: List[str]) -> int:
+        count = 0
+        for run_id in run_ids:
+            try:
+                self.record_snapshot(run_id, load(run_id))
+            except (OSError, ValueError):
+                continue
+            count += 1
+        return count
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,123 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import Settings
+from .checkpoint import link_or_copy, safe_name
+
+
+STYLE_VERSION = "1"
+KDE_SAMPLE = 10000
+POOL_MIN_CHARTS = 4
+
+
+@dataclass
+class ChartSpec:
+    kind: str
+    name: str
+    title: str
+    data: Dict[str, np.ndarray] = field(default_factory=dict)
+    size: tuple = (8, 4)
+
+    def fingerprint(self) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{STYLE_VERSION}|{self.kind}|{self.title}|{self.size}".encode("utf-8"))
+        for key in sorted(self.data):
+            arr = np.ascontiguousarray(self.data[key])
+            h.update(f"|{key}:{arr.dtype}:{arr.shape}|".encode("utf-8"))
+            h.update(arr.tobytes())
+        return h.hexdigest()
+
+
+def histogram_spec(series: pd.Series, bins: int = 50, kde: bool = False) -> Optional[ChartSpec]:
+    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return None
+    counts, edges = np.histogram(values, bins=bins)
+    data = {"counts": counts, "edges": edges}
+    if kde and len(values) > 1 and values.min() < values.max():
+        from scipy.stats import gaussian_kde
+
+        rng = np.random.default_rng(42)
+        sample = values if len(values) <= KDE_SAMPLE else rng.choice(values, KDE_SAMPLE, replace=False)
+        grid = np.linspace(edges[0], edges[-1], 200)
+        density = gaussian_kde(sample)(grid) * len(values) * (edges[1] - edges[0])
+        data.update({"kde_x": grid, "kde_y": density})
+    return ChartSpec("hist", safe_name(f"hist_{series.name}"), str(series.name), data)
+
+
+def scatter_spec(df: pd.DataFrame, x: str, y: str, max_points: int = 20000, hexbin_threshold: int = 50000) -> Optional[ChartSpec]:
+    pair = df[[x, y]].apply(pd.to_numeric, errors="coerce").dropna()
+    if not len(pair):
+        return None
+    xs, ys = pair[x].to_numpy(dtype=np.float64), pair[y].to_numpy(dtype=np.float64)
+    if len(pair) > hexbin_threshold:
+        kind = "hexbin"
+    else:
+        kind = "scatter"
+        if len(pair) > max_points:
+            idx = np.random.default_rng(42).choice(len(pair), max_points, replace=False)
+            xs, ys = xs[idx], ys[idx]
+    return ChartSpec(kind, safe_name(f"scatter_{x}_{y}"), f"{x} vs {y}", {"x": xs, "y": ys}, size=(6, 6))
+
+
+def render_chart(spec: ChartSpec, path: str, dpi: int = 100) -> str:
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=spec.size, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    if spec.kind == "hist":
+        edges = spec.data["edges"]
+        ax.stairs(spec.data["counts"], edges, fill=True, alpha=0.6)
+        if "kde_x" in spec.data:
+            ax.plot(spec.data["kde_x"], spec.data["kde_y"])
+        ax.set_xlabel(spec.title)
+        ax.set_ylabel("count")
+    elif spec.kind == "hexbin":
+        mappable = ax.hexbin(spec.data["x"], spec.data["y"], gridsize=60, bins="log", mincnt=1)
+        fig.colorbar(mappable, ax=ax)
+        ax.set_title(spec.title)
+    else:
+        ax.scatter(spec.data["x"], spec.data["y"], s=6, alpha=0.5, linewidths=0, rasterized=True)
+        ax.set_title(spec.title)
+    fig.tight_layout()
+    tmp = f"{path}.{os.getpid()}.tmp.png"
+    fig.savefig(tmp)
+    os.replace(tmp, path)
+    return path
+
+
+class ChartRenderer:
+    def __init__(self, settings: Settings, workers: Optional[int] = None):
+        self.settings = settings
+        self.cache_dir = settings.chart_cache_dir or os.path.join(settings.state_dir, "charts")
+        self.workers = (settings.chart_workers or os.cpu_count() or 1) if workers is None else workers
+
+    def _cached(self, spec: ChartSpec) -> str:
+        return os.path.join(self.cache_dir, f"{spec.fingerprint()}.png")
+
+    def render(self, specs: List[ChartSpec], output_dir: str, stamp: str) -> Dict[str, Any]:
+        os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        targets = [(spec, self._cached(spec)) for spec in specs]
+        missing = [(spec, path) for spec, path in targets if not os.path.exists(path)]
+        if len(missing) >= POOL_MIN_CHARTS and self.workers > 1:
+            from .ingest import _process_context
+
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(missing)), mp_context=_process_context()) as pool:
+                list(pool.map(render_chart, [s for s, _ in missing], [p for _, p in missing]))
+        else:
+            for spec, path in missing:
+                render_chart(spec, path)
+        images = []
+        for spec, cached in targets:
+            images.append(link_or_copy(cached, os.path.join(output_dir, f"{spec.name}_{stamp}.png")))
+        return {"images": images, "rendered": len(missing), "cached": len(targets) - len(missing)}
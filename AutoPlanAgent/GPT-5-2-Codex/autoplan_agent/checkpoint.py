@@ -0,0 +1,339 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from .config import Settings
+
+
+@dataclass
+class Slot:
+    kind: str = "object"
+    nbytes: int = 0
+    refs: int = 0
+    touched: int = 0
+    source: Optional[Callable[[], Any]] = None
+
+
+def _slot_kind(value: Any) -> str:
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(value, pd.DataFrame):
+        return "frame"
+    if type(value).__name__ == "ChunkSource":
+        return "chunks"
+    return "object"
+
+
+def _slot_bytes(value: Any, kind: str, deep: bool = False) -> int:
+    # deep=True 需要逐个扫描 object 列，只在设置了内存预算时才值得付出这个代价
+    if kind != "frame":
+        return 0
+    return int(value.memory_usage(index=True, deep=deep).sum())
+
+
+class RunContext(MutableMapping):
+    def __init__(self, data: Optional[Dict[str, Any]] = None, budget: int = 0):
+        self._data: Dict[str, Any] = {}
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._slots: Dict[str, Slot] = {}
+        self._clock = 0
+        self._pinned = False
+        self.budget = budget
+        self._lock = threading.RLock()
+        for key, value in (data or {}).items():
+            self[key] = value
+
+    def _slot(self, key: str) -> Slot:
+        slot = self._slots.setdefault(key, Slot())
+        self._clock += 1
+        slot.touched = self._clock
+        return slot
+
+    def _store(self, key: str, value: Any) -> None:
+        slot = self._slot(key)
+        slot.kind = _slot_kind(value)
+        slot.nbytes = _slot_bytes(value, slot.kind, deep=self.budget > 0)
+        self._data[key] = value
+
+    def defer(self, key: str, loader: Callable[[], Any]) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._loaders[key] = loader
+            self._slot(key).source = loader
+
+    def peek(self, key: str) -> Any:
+        with self._lock:
+            return self._data.get(key)
+
+    def append(self, key: str, item: Any) -> None:
+        with self._lock:
+            self._data.setdefault(key, []).append(item)
+            self._slot(key)
+
+    def bind(self, key: str, loader: Optional[Callable[[], Any]]) -> None:
+        with self._lock:
+            if key in self._slots:
+                self._slots[key].source = loader
+
+    def retain(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._slots.setdefault(key, Slot()).refs += 1
+
+    def pin(self) -> None:
+        with self._lock:
+            self._pinned = True
+
+    def release(self, keys: Iterable[str]) -> List[str]:
+        with self._lock:
+            for key in keys:
+                if key in self._slots:
+                    self._slots[key].refs -= 1
+            return self.collect()
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            if self._pinned:
+                return []
+            dropped = [
+                key
+                for key, slot in self._slots.items()
+                if slot.kind == "frame" and slot.refs <= 0 and (key in self._data or key in self._loaders)
+            ]
+            for key in dropped:
+                self._data.pop(key, None)
+                self._loaders.pop(key, None)
+                self._slots[key].source = None
+                self._slots[key].nbytes = 0
+            return dropped
+
+    def spill(self, key: str) -> bool:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None or slot.source is None or key not in self._data:
+                return False
+            del self._data[key]
+            self._loaders[key] = slot.source
+            return True
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(slot.nbytes for key, slot in self._slots.items() if key in self._data)
+
+    def enforce_budget(self) -> List[str]:
+        spilled: List[str] = []
+        with self._lock:
+            if self.budget <= 0:
+                return spilled
+            resident = self.resident_bytes()
+            candidates = sorted(
+                (slot.touched, key)
+                for key, slot in self._slots.items()
+                if slot.kind == "frame" and slot.source is not None and key in self._data
+            )
+            for _, key in candidates:
+                if resident <= self.budget:
+                    break
+                resident -= self._slots[key].nbytes
+                self.spill(key)
+                spilled.append(key)
+        return spilled
+
+    def slots(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                key: {"kind": slot.kind, "bytes": slot.nbytes, "refs": slot.refs, "resident": key in self._data}
+                for key, slot in self._slots.items()
+                if key in self._data or key in self._loaders
+            }
+
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            if key in self._loaders:
+                self._store(key, self._loaders.pop(key)())
+            else:
+                self._slot(key)
+            return self._data[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._loaders.pop(key, None)
+            self._store(key, value)
+            self._slots[key].source = None
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            if self._loaders.pop(key, None) is None:
+                del self._data[key]
+            else:
+                self._data.pop(key, None)
+            if key in self._slots:
+                self._slots[key].source = None
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data or key in self._loaders
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._data) + [k for k in self._loaders if k not in self._data])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(set(self._data) | set(self._loaders))
+
+    def view(self, token: Any = None) -> "StepContext":
+        return StepContext(self, token)
+
+
+class StepContext(MutableMapping):
+    def __init__(self, run_context: RunContext, token: Any = None):
+        self.run_context = run_context
+        self.token = token
+        self.written: Set[str] = set()
+
+    def __getitem__(self, key: str) -> Any:
+        return self.run_context[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if self.token is not None:
+            self.token.raise_if_cancelled()
+        self.written.add(key)
+        self.run_context[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        self.written.discard(key)
+        del self.run_context[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.run_context
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.run_context)
+
+    def __len__(self) -> int:
+        return len(self.run_context)
+
+
+def json_default(value: Any) -> Any:
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def safe_name(name: str) -> str:
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+def link_or_copy(src: str, dst: str) -> str:
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return dst
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def manifest_digest(manifest: Dict[str, Dict[str, str]], payload: Dict[str, Any]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for key in sorted(manifest):
+        h.update(f"{key}:{manifest[key].get('kind')}:{file_digest(manifest[key]['path'])};".encode("utf-8"))
+    if not manifest:
+        h.update(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=json_default).encode("utf-8"))
+    return h.hexdigest()
+
+
+class CheckpointStore:
+    def __init__(self, settings: Settings):
+        self.settings = settings
+
+    def _dir(self, run_id: str, step_name: str) -> str:
+        path = os.path.join(self.settings.state_dir, safe_name(run_id), safe_name(step_name))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def save(self, run_id: str, step_name: str, context: RunContext, keys: Set[str], payload: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+        import pandas as pd
+        from .artifacts import EXTENSIONS, ArtifactStore, write_frame
+        from .streaming import ChunkSource
+
+        declared = payload.get("context") or {}
+        manifest: Dict[str, Dict[str, str]] = {}
+        for key in sorted(keys):
+            if key not in context:
+                continue
+            value = context[key]
+            if isinstance(value, ChunkSource):
+                path = declared.get(key) or value.path
+                if path:
+                    manifest[key] = {"kind": "chunks", "path": path}
+            elif isinstance(value, pd.DataFrame):
+                path = declared.get(key)
+                if not path:
+                    fmt = ArtifactStore(self.settings).format
+                    path = os.path.join(self._dir(run_id, step_name), f"{safe_name(key)}{EXTENSIONS[fmt]}")
+                    write_frame(value, path)
+                manifest[key] = {"kind": "frame", "path": path}
+            else:
+                path = os.path.join(self._dir(run_id, step_name), f"{safe_name(key)}.json")
+                try:
+                    text = json.dumps(value, ensure_ascii=False, default=json_default)
+                except (TypeError, ValueError):
+                    continue
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(text)
+                manifest[key] = {"kind": "json", "path": path}
+        return manifest
+
+    def adopt(self, run_id: str, step_name: str, manifest: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+        adopted: Dict[str, Dict[str, str]] = {}
+        for key, entry in manifest.items():
+            dst = os.path.join(self._dir(run_id, step_name), os.path.basename(entry["path"]))
+            adopted[key] = dict(entry, path=link_or_copy(entry["path"], dst))
+        return adopted
+
+    def loader(self, entry: Dict[str, str]) -> Optional[Callable[[], Any]]:
+        path = entry.get("path")
+        if not path or not os.path.exists(path):
+            return None
+        kind = entry.get("kind")
+        if kind == "chunks":
+            from .streaming import ChunkSource
+
+            return lambda: ChunkSource.from_path(path, self.settings.stream_chunksize)
+        if kind == "frame":
+            from .artifacts import read_frame
+
+            return lambda: read_frame(path)
+
+        def load_json():
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        return load_json
+
+    def restore(self, steps: list, context: RunContext) -> int:
+        restored = 0
+        for step in steps:
+            for key, entry in (step.get("checkpoint") or {}).items():
+                load = self.loader(entry)
+                if load is not None:
+                    context.defer(key, load)
+                    restored += 1
+        return restored
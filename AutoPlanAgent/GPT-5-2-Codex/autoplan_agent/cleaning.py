@@ -0,0 +1,114 @@
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+STRATEGIES = ("ffill", "median", "mean", "mode", "constant", "interpolate", "drop", "none")
+CATEGORY_RATIO = 0.5
+
+
+def _fill_positions(valid: np.ndarray) -> Optional[np.ndarray]:
+    n = len(valid)
+    if not valid.any():
+        return None
+    positions = np.where(valid, np.arange(n), -1)
+    np.maximum.accumulate(positions, out=positions)
+    positions[positions < 0] = int(np.argmax(valid))
+    return positions
+
+
+def fill_forward_backward(series: pd.Series) -> pd.Series:
+    valid = series.notna().to_numpy()
+    if valid.all():
+        return series
+    positions = _fill_positions(valid)
+    if positions is None:
+        return series
+    if not isinstance(series.dtype, np.dtype):
+        return series.ffill().bfill()
+    return pd.Series(series.to_numpy()[positions], index=series.index, name=series.name)
+
+
+def _normalize(spec: Union[str, Dict[str, Any], None], default: str) -> Dict[str, Any]:
+    if spec is None:
+        spec = default
+    if isinstance(spec, str):
+        spec = {"strategy": spec}
+    strategy = spec.get("strategy", default)
+    if strategy not in STRATEGIES:
+        raise ValueError(f"不支持的清洗策略: {strategy}")
+    return dict(spec, strategy=strategy)
+
+
+def _apply(series: pd.Series, spec: Dict[str, Any]) -> pd.Series:
+    strategy = spec["strategy"]
+    if strategy == "ffill":
+        return fill_forward_backward(series)
+    if strategy == "constant":
+        return series.fillna(spec.get("value"))
+    if strategy in ("median", "mean"):
+        if not pd.api.types.is_numeric_dtype(series):
+            return fill_forward_backward(series)
+        value = series.median() if strategy == "median" else series.mean()
+        return series.fillna(value)
+    if strategy == "mode":
+        modes = series.mode(dropna=True)
+        return series.fillna(modes.iloc[0]) if len(modes) else series
+    if strategy == "interpolate":
+        if not pd.api.types.is_numeric_dtype(series):
+            return fill_forward_backward(series)
+        return series.interpolate(method=spec.get("method", "linear"), limit_direction="both")
+    return series
+
+
+def downcast(df: pd.DataFrame, level: Union[bool, str] = True) -> pd.DataFrame:
+    if not level:
+        return df
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_integer_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+            df[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            if level == "all":
+                df[col] = pd.to_numeric(series, downcast="float")
+        elif (series.dtype == object or isinstance(series.dtype, pd.StringDtype)) and len(series):
+            if series.nunique(dropna=True) <= CATEGORY_RATIO * len(series):
+                df[col] = series.astype("category")
+    return df
+
+
+def clean_frame(
+    df: pd.DataFrame,
+    strategies: Optional[Dict[str, Any]] = None,
+    default: str = "ffill",
+    dedupe: bool = True,
+    downcast_level: Union[bool, str] = False,
+    inplace: bool = False,
+) -> pd.DataFrame:
+    strategies = strategies or {}
+    unknown = [c for c in strategies if c not in df.columns]
+    if unknown:
+        raise ValueError(f"清洗策略引用了不存在的字段: {', '.join(map(str, unknown))}")
+    specs = {col: _normalize(strategies.get(col), default) for col in df.columns}
+    if dedupe:
+        duplicated = df.duplicated().to_numpy()
+        if duplicated.any():
+            df = df.take(np.flatnonzero(~duplicated))
+            inplace = True
+    drop_cols = [col for col, spec in specs.items() if spec["strategy"] == "drop"]
+    if drop_cols:
+        missing = df[drop_cols].isna().any(axis=1).to_numpy()
+        if missing.any():
+            df = df.take(np.flatnonzero(~missing))
+            inplace = True
+    if not inplace:
+        df = df.copy(deep=False)
+    for col, spec in specs.items():
+        if spec["strategy"] in ("drop", "none"):
+            continue
+        series = df[col]
+        if not series.hasnans:
+            continue
+        df[col] = _apply(series, spec)
+    return downcast(df, downcast_level)
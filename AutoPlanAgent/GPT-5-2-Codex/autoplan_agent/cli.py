@@ -2,11 +2,6 @@ import argparse
 import json
 
 from .config import Settings
-from .planner import TaskPlanner
-from .executor import TaskExecutor
-from .state import StateStore
-from .tools import public_data_ingest, build_default_registry
-from .schemas import ExecutionPlan, TaskUnderstanding
 
 
 def _print(obj):
@@ -33,15 +28,36 @@ def main():
     ingest_cmd = sub.add_parser("ingest")
     ingest_cmd.add_argument("--companies", nargs="*")
     ingest_cmd.add_argument("--years", nargs="*")
+    ingest_cmd.add_argument("--incremental", action="store_true", default=None)
+    ingest_cmd.add_argument("--full", dest="incremental", action="store_false")
 
     status_cmd = sub.add_parser("status")
     status_cmd.add_argument("--run-id", required=True)
 
+    cancel_cmd = sub.add_parser("cancel")
+    cancel_cmd.add_argument("--run-id", required=True)
+
+    list_cmd = sub.add_parser("list")
+    list_cmd.add_argument("--status")
+    list_cmd.add_argument("--tool")
+    list_cmd.add_argument("--since")
+    list_cmd.add_argument("--until")
+    list_cmd.add_argument("--objective")
+    list_cmd.add_argument("--limit", type=int, default=50)
+    list_cmd.add_argument("--cursor")
+    list_cmd.add_argument("--reindex", action="store_true")
+
     args = parser.parse_args()
     settings = Settings.load()
-    planner = TaskPlanner(settings)
-    executor = TaskExecutor(settings)
-    state = StateStore(settings)
+
+    if args.command in ("plan", "run"):
+        from .planner import TaskPlanner
+
+        planner = TaskPlanner(settings)
+    if args.command in ("resume", "status", "list", "cancel"):
+        from .state import StateStore
+
+        state = StateStore(settings)
 
     if args.command == "plan":
         understanding = planner.understand(args.task)
@@ -65,7 +81,9 @@ def main():
                         return
                 else:
                     return
-        result = executor.run(plan, understanding, run_id=args.run_id)
+        from .executor import TaskExecutor
+
+        result = TaskExecutor(settings).run(plan, understanding, run_id=args.run_id)
         _print(result)
         return
 
@@ -79,20 +97,43 @@ def main():
         if not plan_data or not understanding_data:
             print("缺少计划或理解数据，无法续跑")
             return
+        from .executor import TaskExecutor
+        from .schemas import ExecutionPlan, TaskUnderstanding
+
         plan = ExecutionPlan.model_validate(plan_data)
         understanding = TaskUnderstanding.model_validate(understanding_data)
-        result = executor.run(plan, understanding, run_id=args.run_id)
+        result = TaskExecutor(settings).run(plan, understanding, run_id=args.run_id)
         _print(result)
         return
 
     if args.command == "ingest":
-        registry = build_default_registry()
+        from .tools import get_registry
+
+        registry = get_registry(settings)
         context = {}
         params = {"companies": args.companies or [], "years": args.years or []}
+        if args.incremental is not None:
+            params["incremental"] = args.incremental
         result = registry.get("public_data_ingest")(settings, context, params)
         _print(result)
         return
 
+    if args.command == "list":
+        if args.reindex:
+            state.reindex()
+        _print(
+            state.catalog.query(
+                status=args.status,
+                tool=args.tool,
+                since=args.since,
+                until=args.until,
+                objective=args.objective,
+                limit=args.limit,
+                cursor=args.cursor,
+            )
+        )
+        return
+
     if args.command == "status":
         if not state.exists(args.run_id):
             print("run_id 不存在")
@@ -100,6 +141,18 @@ def main():
         _print(state.load(args.run_id))
         return
 
+    if args.command == "cancel":
+        if not state.exists(args.run_id):
+            print("run_id 不存在")
+            return
+        status = state.load(args.run_id).get("status")
+        if status != "running":
+            print(f"运行未在执行中: {status}")
+            return
+        state.request_cancel(args.run_id)
+        print("已请求取消，执行器将在下一次轮询时停止")
+        return
+
 
 if __name__ == "__main__":
     main()
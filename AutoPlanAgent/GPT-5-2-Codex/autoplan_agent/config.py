@@ -1,5 +1,6 @@
+import json
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 try:
     from dotenv import load_dotenv
@@ -22,6 +23,58 @@ class Settings:
     output_dir: str
     tool_modules: list[str]
     log_file: str
+    max_workers: int = 4
+    db_pool_size: int = 5
+    db_pool_idle_timeout: float = 300.0
+    db_pool_acquire_timeout: float = 30.0
+    ingest_batch_size: int = 1000
+    ingest_fetch_workers: int = 16
+    ingest_extract_workers: int = 0
+    ingest_per_host_limit: int = 4
+    ingest_timeout: float = 20.0
+    ingest_incremental: bool = False
+    ingest_state_path: str = ""
+    query_row_limit: int = 10000
+    query_stream: bool = False
+    stream_chunksize: int = 50000
+    stream_sample_size: int = 100000
+    stream_dedupe_max_keys: int = 10_000_000
+    artifact_format: str = "arrow"
+    step_cache: bool = True
+    cache_dir: str = ""
+    cache_max_bytes: int = 2 * 1024**3
+    cache_max_entries: int = 1000
+    cache_disabled_tools: list[str] = field(default_factory=list)
+    llm_cache_path: str = ""
+    llm_cache_ttl: float = 86400.0
+    api_job_workers: int = 2
+    api_job_queue: int = 32
+    api_execution: str = "thread"
+    api_process_workers: int = 2
+    run_timeout: float = 0.0
+    worker_cpu_limit: float = 0.0
+    worker_memory_limit: int = 0
+    worker_warm_imports: list[str] = field(
+        default_factory=lambda: ["pandas", "sklearn.ensemble", "matplotlib.figure", "matplotlib.backends.backend_agg"]
+    )
+    state_compact_every: int = 50
+    catalog_path: str = ""
+    step_metrics_memory: str = "rss"
+    eda_exact_cells: int = 20_000_000
+    model_dir: str = ""
+    model_fit_sample_size: int = 200000
+    model_reuse: bool = False
+    model_n_jobs: int = 1
+    run_memory_budget: int = 0
+    chart_cache_dir: str = ""
+    chart_workers: int = 0
+    template_cache_dir: str = ""
+    report_formats: list[str] = field(default_factory=lambda: ["markdown", "html", "pdf"])
+    step_timeout: float = 0.0
+    step_retries: int = 0
+    step_retry_backoff: float = 1.0
+    step_retry_max_backoff: float = 30.0
+    step_policies: dict = field(default_factory=dict)
 
     @staticmethod
     def load() -> "Settings":
@@ -42,4 +95,60 @@ class Settings:
             output_dir=os.getenv("OUTPUT_DIR", "./outputs"),
             tool_modules=[m for m in os.getenv("TOOL_MODULES", "").split(",") if m],
             log_file=os.getenv("LOG_FILE", "./outputs/agent.log"),
+            max_workers=int(os.getenv("MAX_WORKERS", "4")),
+            db_pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            db_pool_idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+            db_pool_acquire_timeout=float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "30")),
+            ingest_batch_size=int(os.getenv("INGEST_BATCH_SIZE", "1000")),
+            ingest_fetch_workers=int(os.getenv("INGEST_FETCH_WORKERS", "16")),
+            ingest_extract_workers=int(os.getenv("INGEST_EXTRACT_WORKERS", str(os.cpu_count() or 1))),
+            ingest_per_host_limit=int(os.getenv("INGEST_PER_HOST_LIMIT", "4")),
+            ingest_timeout=float(os.getenv("INGEST_TIMEOUT", "20")),
+            ingest_incremental=os.getenv("INGEST_INCREMENTAL", "0").lower() in ("1", "true", "yes"),
+            ingest_state_path=os.getenv("INGEST_STATE_PATH", ""),
+            query_row_limit=int(os.getenv("QUERY_ROW_LIMIT", "10000")),
+            query_stream=os.getenv("QUERY_STREAM", "0").lower() in ("1", "true", "yes"),
+            stream_chunksize=int(os.getenv("STREAM_CHUNKSIZE", "50000")),
+            stream_sample_size=int(os.getenv("STREAM_SAMPLE_SIZE", "100000")),
+            stream_dedupe_max_keys=int(os.getenv("STREAM_DEDUPE_MAX_KEYS", "10000000")),
+            artifact_format=os.getenv("ARTIFACT_FORMAT", "arrow"),
+            step_cache=os.getenv("STEP_CACHE", "1").lower() in ("1", "true", "yes"),
+            cache_dir=os.getenv("CACHE_DIR", ""),
+            cache_max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(2 * 1024**3))),
+            cache_max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1000")),
+            cache_disabled_tools=[t for t in os.getenv("CACHE_DISABLED_TOOLS", "").split(",") if t],
+            llm_cache_path=os.getenv("LLM_CACHE_PATH", ""),
+            llm_cache_ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+            api_job_workers=int(os.getenv("API_JOB_WORKERS", "2")),
+            api_job_queue=int(os.getenv("API_JOB_QUEUE", "32")),
+            api_execution=os.getenv("API_EXECUTION", "thread").lower(),
+            api_process_workers=int(os.getenv("API_PROCESS_WORKERS", "2")),
+            run_timeout=float(os.getenv("RUN_TIMEOUT", "0")),
+            worker_cpu_limit=float(os.getenv("WORKER_CPU_LIMIT", "0")),
+            worker_memory_limit=int(os.getenv("WORKER_MEMORY_LIMIT", "0")),
+            worker_warm_imports=[
+                m
+                for m in os.getenv(
+                    "WORKER_WARM_IMPORTS", "pandas,sklearn.ensemble,matplotlib.figure,matplotlib.backends.backend_agg"
+                ).split(",")
+                if m
+            ],
+            state_compact_every=int(os.getenv("STATE_COMPACT_EVERY", "50")),
+            catalog_path=os.getenv("CATALOG_PATH", ""),
+            step_metrics_memory=os.getenv("STEP_METRICS_MEMORY", "rss"),
+            eda_exact_cells=int(os.getenv("EDA_EXACT_CELLS", "20000000")),
+            model_dir=os.getenv("MODEL_DIR", ""),
+            model_fit_sample_size=int(os.getenv("MODEL_FIT_SAMPLE_SIZE", "200000")),
+            model_reuse=os.getenv("MODEL_REUSE", "0").lower() in ("1", "true", "yes"),
+            model_n_jobs=int(os.getenv("MODEL_N_JOBS", "1")),
+            run_memory_budget=int(os.getenv("RUN_MEMORY_BUDGET", "0")),
+            chart_cache_dir=os.getenv("CHART_CACHE_DIR", ""),
+            chart_workers=int(os.getenv("CHART_WORKERS", "0")),
+            template_cache_dir=os.getenv("TEMPLATE_CACHE_DIR", ""),
+            report_formats=[f.strip() for f in os.getenv("REPORT_FORMATS", "markdown,html,pdf").split(",") if f.strip()],
+            step_timeout=float(os.getenv("STEP_TIMEOUT", "0")),
+            step_retries=int(os.getenv("STEP_RETRIES", "0")),
+            step_retry_backoff=float(os.getenv("STEP_RETRY_BACKOFF", "1")),
+            step_retry_max_backoff=float(os.getenv("STEP_RETRY_MAX_BACKOFF", "30")),
+            step_policies=json.loads(os.getenv("STEP_POLICIES") or "{}"),
         )
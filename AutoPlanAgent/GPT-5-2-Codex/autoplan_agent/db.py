@@ -0,0 +1,188 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import Settings
+
+
+class PoolExhausted(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        max_size: int = 5,
+        idle_timeout: float = 300.0,
+        acquire_timeout: float = 30.0,
+        ping_interval: float = 30.0,
+    ):
+        self.factory = factory
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.ping_interval = ping_interval
+        self._idle: List[Tuple[Any, float]] = []
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def size(self) -> int:
+        with self._cond:
+            return self._in_use + len(self._idle)
+
+    def _close_quietly(self, conn: Any) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn: Any) -> bool:
+        try:
+            if hasattr(conn, "ping"):
+                conn.ping(reconnect=False)
+            else:
+                cursor = conn.cursor()
+                cursor.execute("select 1")
+                cursor.fetchall()
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self, now: float) -> List[Any]:
+        expired = [conn for conn, since in self._idle if now - since > self.idle_timeout]
+        self._idle = [(conn, since) for conn, since in self._idle if now - since <= self.idle_timeout]
+        return expired
+
+    def acquire(self) -> Any:
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("连接池已关闭")
+                expired = self._evict_idle(time.monotonic())
+                candidate = None
+                if self._idle:
+                    candidate, since = self._idle.pop()
+                    self._in_use += 1
+                elif self._in_use < self.max_size:
+                    self._in_use += 1
+                    since = None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolExhausted(f"数据库连接池已满 (max_size={self.max_size})")
+                    self._cond.wait(remaining)
+                    continue
+            for conn in expired:
+                self._close_quietly(conn)
+            if candidate is not None:
+                if time.monotonic() - since < self.ping_interval or self._healthy(candidate):
+                    return candidate
+                self._close_quietly(candidate)
+            try:
+                return self.factory()
+            except Exception:
+                with self._cond:
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            keep = not discard and not self._closed
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if not keep:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        self.release(conn)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+
+def mysql_factory(settings: Settings) -> Callable[[], Any]:
+    def connect():
+        import pymysql
+
+        return pymysql.connect(
+            host=settings.mysql_host,
+            port=settings.mysql_port,
+            user=settings.mysql_user,
+            password=settings.mysql_password,
+            database=settings.mysql_db,
+            charset="utf8mb4",
+        )
+
+    return connect
+
+
+_pools: Dict[tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(settings: Settings) -> tuple:
+    return (settings.mysql_host, settings.mysql_port, settings.mysql_user, settings.mysql_db)
+
+
+def get_pool(settings: Settings, factory: Optional[Callable[[], Any]] = None) -> ConnectionPool:
+    key = _pool_key(settings)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and not pool.closed and factory is not None and pool.factory is not factory:
+            raise ValueError(f"数据库连接池已存在且使用不同的连接工厂: {key}，请先 close_pools() 或用 set_pool() 替换")
+        if pool is None or pool.closed:
+            pool = ConnectionPool(
+                factory or mysql_factory(settings),
+                max_size=settings.db_pool_size,
+                idle_timeout=settings.db_pool_idle_timeout,
+                acquire_timeout=settings.db_pool_acquire_timeout,
+            )
+            _pools[key] = pool
+        return pool
+
+
+def set_pool(settings: Settings, pool: ConnectionPool) -> None:
+    with _pools_lock:
+        _pools[_pool_key(settings)] = pool
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def connection(settings: Settings):
+    return get_pool(settings).connection()
@@ -1,28 +1,196 @@
-import importlib
-from typing import Dict, Any, Optional
+import threading
+import time
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Any, Optional, List
 
 from .config import Settings
-from .schemas import ExecutionPlan, TaskUnderstanding, StepResult
-from .tools import build_default_registry, ToolRegistry
+from .db import get_pool
+from .schemas import ExecutionPlan, TaskUnderstanding, StepResult, PlanStep
+from .tools import get_registry, ToolRegistry
 from .state import StateStore
+from .checkpoint import CheckpointStore, RunContext, manifest_digest
+from .cache import StepCache
+from .catalog import payload_artifacts, payload_rows
+from .metrics import REGISTRY, StepProbe
 from .logging_utils import setup_logging
+from .policy import CancelToken, ExecutionPolicy, RunCancelled, StepTimeout, is_transient
+
+
+POLL_INTERVAL = 0.5
+TIMEOUT_GRACE = 5.0
+
+
+def _start_thread(func: Callable[..., Any], *args: Any) -> Future:
+    future: Future = Future()
+
+    def target() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, name="autoplan-step", daemon=True).start()
+    return future
+
+
+def build_dependency_graph(steps: List[PlanStep]) -> Dict[str, set]:
+    names = [s.name for s in steps]
+    if len(set(names)) != len(names):
+        raise ValueError("计划中存在重名步骤")
+    graph: Dict[str, set] = {}
+    for i, step in enumerate(steps):
+        unknown = [d for d in step.dependencies if d not in names]
+        if unknown:
+            raise ValueError(f"步骤 {step.name} 依赖不存在的步骤: {', '.join(unknown)}")
+        # 未声明依赖的步骤接在计划中的前一步之后；工具可能通过数据库等副作用衔接，不能仅凭上下文键推断为可并发
+        graph[step.name] = set(step.dependencies) if step.dependencies else ({names[i - 1]} if i else set())
+    remaining = {name: set(deps) for name, deps in graph.items()}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"计划存在循环依赖: {', '.join(sorted(remaining))}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return graph
 
 
 class TaskExecutor:
     def __init__(self, settings: Settings):
         self.settings = settings
-        self.registry = build_default_registry()
-        self._load_extensions(self.registry)
+        self.db_pool = get_pool(settings)
+        self._registry: Optional[ToolRegistry] = None
         self.state = StateStore(settings)
+        self.checkpoints = CheckpointStore(settings)
+        self.cache = StepCache(settings)
         self.logger = setup_logging("autoplan.executor", log_file=self.settings.log_file)
+        self._stragglers: List[Future] = []
+
+    @property
+    def registry(self) -> ToolRegistry:
+        if self._registry is None:
+            self._registry = get_registry(self.settings)
+        return self._registry
+
+    def stragglers(self) -> int:
+        self._stragglers = [future for future in self._stragglers if not future.done()]
+        return len(self._stragglers)
 
-    def _load_extensions(self, registry: ToolRegistry) -> None:
-        for module_name in self.settings.tool_modules:
-            module = importlib.import_module(module_name)
-            if hasattr(module, "register_tools"):
-                module.register_tools(registry)
+    def close(self) -> None:
+        self.db_pool.close()
+        self.cache.close()
 
-    def run(self, plan: ExecutionPlan, understanding: TaskUnderstanding, run_id: Optional[str] = None) -> Dict[str, Any]:
+    def _run_step(
+        self,
+        run_id: str,
+        step: PlanStep,
+        context: RunContext,
+        inputs: Optional[List[str]],
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+        token: Optional[CancelToken] = None,
+    ) -> StepResult:
+        spec = self.registry.spec(step.tool)
+        if on_event is not None:
+            on_event({"type": "step_started", "step": step.name, "tool": step.tool})
+        probe = StepProbe(self.settings.step_metrics_memory).start()
+        rows_in = self._rows_in(context)
+        key = None
+        if inputs is not None and self.cache.enabled_for(spec, step):
+            key = self.cache.key(spec, step, inputs)
+        if key is not None:
+            hit = self.cache.get(key)
+            if hit is not None:
+                self.logger.info(f"命中缓存: {step.name}")
+                checkpoint = self.checkpoints.adopt(run_id, step.name, hit["checkpoint"])
+                self.checkpoints.restore([{"checkpoint": checkpoint}], context)
+                payload = dict(hit["payload"], cached=True)
+                metrics = dict(probe.stop(rows_in, payload_rows(payload), []), cached=True)
+                self._record_metrics(step, context, "success", metrics)
+                return StepResult(
+                    step_name=step.name,
+                    status="success",
+                    payload=payload,
+                    checkpoint=checkpoint,
+                    fingerprint=hit["fingerprint"],
+                    metrics=metrics,
+                )
+        self.logger.info(f"执行步骤: {step.name}")
+        view = context.view(token)
+        try:
+            payload = spec.func(self.settings, view, step.parameters)
+            if token is not None:
+                token.raise_if_cancelled()
+        except Exception:
+            self._record_metrics(step, context, "failed", probe.stop(rows_in, None, []))
+            raise
+        checkpoint = self.checkpoints.save(run_id, step.name, context, view.written, payload)
+        for key, entry in checkpoint.items():
+            if entry["kind"] == "frame":
+                context.bind(key, self.checkpoints.loader(entry))
+        spilled = context.enforce_budget()
+        if spilled:
+            self.logger.info(f"上下文超出内存预算，已落盘: {', '.join(spilled)}")
+        fingerprint = manifest_digest(checkpoint, payload) if self.settings.step_cache else ""
+        if key is not None:
+            self.cache.put(key, spec, payload, checkpoint, fingerprint)
+        rows_out = payload_rows(payload)
+        if rows_out is None and "dataframe" in view.written:
+            frame = context.peek("dataframe")
+            rows_out = len(frame) if frame is not None else None
+        files = payload_artifacts(payload) + [e["path"] for e in checkpoint.values()]
+        metrics = dict(probe.stop(rows_in, rows_out, files), context_bytes=context.resident_bytes())
+        self._record_metrics(step, context, "success", metrics)
+        self.logger.info(f"步骤完成: {step.name} 耗时 {metrics['wall_seconds']:.3f}s CPU {metrics['cpu_seconds']:.3f}s")
+        return StepResult(
+            step_name=step.name,
+            status="success",
+            payload=payload,
+            checkpoint=checkpoint,
+            fingerprint=fingerprint,
+            metrics=metrics,
+        )
+
+    def _policy(self, step: PlanStep) -> ExecutionPolicy:
+        return ExecutionPolicy.resolve(self.settings, step.tool, self.registry.spec(step.tool).policy)
+
+    def _rows_in(self, context: RunContext) -> Optional[int]:
+        frame = context.peek("dataframe")
+        if frame is not None:
+            return len(frame)
+        chunks = context.peek("chunks")
+        return getattr(chunks, "rows", None)
+
+    def _record_metrics(self, step: PlanStep, context: RunContext, status: str, metrics: Dict[str, Any]) -> None:
+        REGISTRY.observe(step.tool, status, metrics)
+        context.append("step_metrics", dict(metrics, step=step.name, tool=step.tool, status=status))
+
+    def _inputs(self, name: str, graph: Dict[str, set], fingerprints: Dict[str, str]) -> Optional[List[str]]:
+        # 按全部上游（含间接依赖）的输出指纹寻址，任一祖先变化都会使缓存失效
+        ancestors: set = set()
+        stack = list(graph[name])
+        while stack:
+            dep = stack.pop()
+            if dep not in ancestors:
+                ancestors.add(dep)
+                stack.extend(graph.get(dep, ()))
+        if not all(fingerprints.get(d) for d in ancestors):
+            return None
+        return [f"{d}:{fingerprints[d]}" for d in sorted(ancestors)]
+
+    def run(
+        self,
+        plan: ExecutionPlan,
+        understanding: TaskUnderstanding,
+        run_id: Optional[str] = None,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        graph = build_dependency_graph(plan.steps)
+        self.registry.validate([step.tool for step in plan.steps])
+        # 策略在创建运行前统一解析，STEP_POLICIES 配置错误直接报错而不会留下未结束的运行
+        policies = {step.name: self._policy(step) for step in plan.steps}
         if run_id is None:
             run_id = self.state.create()
         elif not self.state.exists(run_id):
@@ -32,24 +200,179 @@ class TaskExecutor:
             state_data["understanding"] = understanding.model_dump()
         if not state_data.get("plan"):
             state_data["plan"] = plan.model_dump()
+        state_data["status"] = "running"
+        state_data["started_at"] = time.time()
+        state_data["finished_at"] = None
         self.state.save(run_id, state_data)
+        self.state.clear_cancel(run_id)
         completed_steps = {s["step_name"] for s in state_data.get("steps", []) if s.get("status") == "success"}
-        context: Dict[str, Any] = {"understanding": understanding.model_dump()}
-        results: list[StepResult] = []
-        for step in plan.steps:
-            if step.name in completed_steps:
-                continue
-            tool = self.registry.get(step.tool)
-            self.logger.info(f"执行步骤: {step.name}")
-            try:
-                payload = tool(self.settings, context, step.parameters)
-                result = StepResult(step_name=step.name, status="success", payload=payload)
-                results.append(result)
-                state_data["steps"].append(result.model_dump())
-                self.state.save(run_id, state_data)
-            except Exception as e:
-                result = StepResult(step_name=step.name, status="failed", payload={"error": str(e)})
-                state_data["steps"].append(result.model_dump())
-                self.state.save(run_id, state_data)
-                raise
-        return {"run_id": run_id, "steps": [r.model_dump() for r in results]}
+        context = RunContext({"understanding": understanding.model_dump()}, budget=self.settings.run_memory_budget)
+        fingerprints: Dict[str, str] = {}
+        if completed_steps:
+            latest = {s["step_name"]: s for s in state_data.get("steps", []) if s.get("status") == "success"}
+            restored = self.checkpoints.restore([latest[s.name] for s in plan.steps if s.name in latest], context)
+            fingerprints.update({name: s.get("fingerprint", "") for name, s in latest.items()})
+            for s in plan.steps:
+                if s.name in latest and latest[s.name].get("metrics"):
+                    context.append("step_metrics", dict(latest[s.name]["metrics"], step=s.name, tool=s.tool, status="success"))
+            self.logger.info(f"恢复已完成步骤输出: {restored} 项")
+        order = {step.name: i for i, step in enumerate(plan.steps)}
+        pending = [step for step in plan.steps if step.name not in completed_steps]
+        for step in pending:
+            declared = self.registry.spec(step.tool).inputs
+            if declared is None:
+                context.pin()
+            else:
+                context.retain(declared)
+        done = set(completed_steps)
+        results: Dict[str, StepResult] = {}
+        error: Optional[BaseException] = None
+        run_token = CancelToken()
+        queued: List[tuple] = []
+        delayed: List[tuple] = []
+        running: Dict[Future, tuple] = {}
+        stopping: Dict[Future, tuple] = {}
+        max_workers = max(1, self.settings.max_workers)
+
+        def release(step: PlanStep) -> None:
+            released = context.release(self.registry.spec(step.tool).inputs or [])
+            if released:
+                self.logger.info(f"释放不再使用的上下文: {', '.join(released)}")
+
+        def finish(step: PlanStep, attempt: int, status: str, exc: BaseException) -> None:
+            release(step)
+            result = StepResult(step_name=step.name, status=status, payload={"error": str(exc)}, attempts=attempt)
+            state_data["steps"].append(result.model_dump())
+            self.state.append_step(run_id, result.model_dump())
+            if on_event is not None:
+                on_event({"type": "step_finished", "step": step.name, "tool": step.tool, "status": status, "error": str(exc)})
+
+        def abandon(future: Future, step: PlanStep) -> None:
+            if not future.done():
+                self.logger.warning(f"步骤 {step.name} 未响应取消，放弃其执行线程")
+                self._stragglers.append(future)
+
+        status = "failed"
+        try:
+            while pending or running or stopping or delayed or queued:
+                now = time.monotonic()
+                if not run_token.cancelled and self.state.cancel_requested(run_id):
+                    self.logger.info(f"收到取消请求: {run_id}")
+                    run_token.cancel()
+                if run_token.cancelled:
+                    if error is None:
+                        error = RunCancelled(f"运行已取消: {run_id}")
+                    for future, (step, attempt, _, _) in sorted(running.items(), key=lambda item: order[item[1][0].name]):
+                        abandon(future, step)
+                        finish(step, attempt, "cancelled", error)
+                    for future, (step, attempt, _, _) in stopping.items():
+                        abandon(future, step)
+                        finish(step, attempt, "cancelled", error)
+                    running.clear()
+                    stopping.clear()
+                    break
+                if error is None:
+                    for step in [step for step in pending if graph[step.name] <= done]:
+                        pending.remove(step)
+                        queued.append((step, 1))
+                    for item in [item for item in delayed if item[0] <= now]:
+                        delayed.remove(item)
+                        queued.append(item[1:])
+                    while queued and len(running) + len(stopping) < max_workers:
+                        step, attempt = queued.pop(0)
+                        policy = policies[step.name]
+                        token = CancelToken(run_token)
+                        inputs = self._inputs(step.name, graph, fingerprints)
+                        future = _start_thread(self._run_step, run_id, step, context, inputs, on_event, token)
+                        deadline = now + policy.timeout if policy.timeout > 0 else None
+                        running[future] = (step, attempt, token, deadline)
+                else:
+                    queued.clear()
+                    delayed.clear()
+                if not running and not stopping and not delayed:
+                    break
+                wake = [d for _, _, _, d in running.values() if d is not None]
+                wake += [d for _, _, _, d in stopping.values()] + [item[0] for item in delayed]
+                timeout = max(0.0, min([POLL_INTERVAL] + [w - now for w in wake]))
+                finished, _ = wait(list(running) + list(stopping), timeout=timeout, return_when=FIRST_COMPLETED)
+                now = time.monotonic()
+                for future, (step, attempt, token, deadline) in list(running.items()):
+                    if future not in finished and deadline is not None and deadline <= now:
+                        # 超时的尝试先通知取消，等待其线程在宽限期内退出后才允许重试
+                        token.cancel()
+                        del running[future]
+                        stopping[future] = (step, attempt, token, now + TIMEOUT_GRACE)
+                        self._record_metrics(step, context, "timeout", {"wall_seconds": policies[step.name].timeout})
+                        self.logger.warning(f"步骤 {step.name} 超时，等待其退出")
+                outcomes = []
+                for future, (step, attempt, token, grace) in list(stopping.items()):
+                    if future in finished or grace <= now:
+                        del stopping[future]
+                        token.detach()
+                        timeout_error = StepTimeout(f"步骤 {step.name} 超过 {policies[step.name].timeout:g} 秒未完成")
+                        if future not in finished:
+                            abandon(future, step)
+                            finish(step, attempt, "failed", timeout_error)
+                            if error is None:
+                                error = timeout_error
+                            continue
+                        outcomes.append((step, attempt, None, timeout_error))
+                for future in [future for future in finished if future in running]:
+                    step, attempt, token, _ = running.pop(future)
+                    token.detach()
+                    outcomes.append((step, attempt, future, future.exception()))
+                for step, attempt, future, exc in sorted(outcomes, key=lambda item: order[item[0].name]):
+                    if exc is None:
+                        result = future.result()
+                        result.attempts = attempt
+                        release(step)
+                        results[step.name] = result
+                        fingerprints[step.name] = result.fingerprint
+                        done.add(step.name)
+                        state_data["steps"].append(result.model_dump())
+                        self.state.append_step(run_id, result.model_dump())
+                        if on_event is not None:
+                            on_event(
+                                {
+                                    "type": "step_finished",
+                                    "step": step.name,
+                                    "tool": step.tool,
+                                    "status": "success",
+                                    "payload": result.payload,
+                                    "metrics": result.metrics,
+                                }
+                            )
+                        continue
+                    policy = policies[step.name]
+                    if error is None and attempt <= policy.retries and is_transient(exc):
+                        delay = policy.delay(attempt)
+                        delayed.append((now + delay, step, attempt + 1))
+                        self.logger.warning(f"步骤 {step.name} 第 {attempt} 次执行失败，{delay:.1f}s 后重试: {exc}")
+                        if on_event is not None:
+                            on_event(
+                                {"type": "step_retry", "step": step.name, "tool": step.tool, "attempt": attempt, "delay": delay, "error": str(exc)}
+                            )
+                        continue
+                    finish(step, attempt, "failed", exc)
+                    if error is None:
+                        error = exc
+        except BaseException as e:
+            # 调度循环自身出错（事件回调、状态写入等）时取消仍在执行的步骤，运行按失败结束
+            run_token.cancel()
+            for future, (step, _, _, _) in list(running.items()) + list(stopping.items()):
+                abandon(future, step)
+            if isinstance(e, KeyboardInterrupt):
+                status = "cancelled"
+            raise
+        else:
+            released = context.collect()
+            if released:
+                self.logger.info(f"释放不再使用的上下文: {', '.join(released)}")
+            status = "cancelled" if isinstance(error, RunCancelled) else "failed" if error is not None else "succeeded"
+        finally:
+            self.state.finish(run_id, status)
+            self.state.clear_cancel(run_id)
+        if error is not None:
+            raise error
+        ordered = sorted(results.values(), key=lambda r: order[r.step_name])
+        return {"run_id": run_id, "steps": [r.model_dump() for r in ordered]}
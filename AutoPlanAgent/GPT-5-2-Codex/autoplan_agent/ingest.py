@@ -0,0 +1,248 @@
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Executor, Future, as_completed
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .config import Settings
+
+
+USER_AGENT = "Mozilla/5.0 (compatible; AutoPlanAgent/0.1)"
+MAX_DOCUMENT_BYTES = 20 * 1024 * 1024
+PROCESS_POOL_MIN_JOBS = 32
+
+
+@dataclass
+class SourceDocument:
+    company: str
+    source_url: Optional[str] = None
+    snippet: Optional[str] = None
+    html: Optional[bytes] = None
+    text: Optional[str] = None
+    error: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    unchanged: bool = False
+
+
+class HostLimiter:
+    def __init__(self, per_host: int):
+        self.per_host = max(1, per_host)
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url: str):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            semaphore = self._slots.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        with semaphore:
+            yield
+
+
+class _InlineExecutor(Executor):
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def _shutdown(pool: Executor, kill: bool = False) -> None:
+    # 抽取超时的进程不会自行退出，关闭进程池时不等待并终止仍在运行的子进程
+    if kill and isinstance(pool, ProcessPoolExecutor):
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        return
+    pool.shutdown(wait=True)
+
+
+def fetch_document(url: str, timeout: float) -> bytes:
+    return fetch_conditional(url, timeout)[0]
+
+
+def fetch_conditional(
+    url: str, timeout: float, etag: Optional[str] = None, last_modified: Optional[str] = None
+) -> Tuple[Optional[bytes], Dict[str, Optional[str]]]:
+    headers = {"User-Agent": USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read(MAX_DOCUMENT_BYTES)
+            validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+            return body, validators
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, {"etag": etag, "last_modified": last_modified}
+        raise
+
+
+class SourceStateStore:
+    def __init__(self, path: str, scope: str = ""):
+        self.path = path
+        # 抽取结果还取决于抽取参数（如年份），变更检测按 (url, scope) 记录
+        self.scope = scope
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "create table if not exists source_state ("
+            "url text, scope text, etag text, last_modified text, content_hash text, fetched_at real, "
+            "primary key (url, scope))"
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "select etag, last_modified, content_hash from source_state where url = ? and scope = ?",
+                (url, self.scope),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "content_hash": row[2]}
+
+    def record(self, docs: List[SourceDocument]) -> int:
+        rows = [
+            (doc.source_url, self.scope, doc.etag, doc.last_modified, doc.content_hash, time.time())
+            for doc in docs
+            if doc.source_url and doc.content_hash and not doc.error
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "insert into source_state (url, scope, etag, last_modified, content_hash, fetched_at) "
+                "values (?, ?, ?, ?, ?, ?) "
+                "on conflict(url, scope) do update set etag = excluded.etag, last_modified = excluded.last_modified, "
+                "content_hash = excluded.content_hash, fetched_at = excluded.fetched_at",
+                rows,
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _process_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class IngestPipeline:
+    def __init__(
+        self,
+        settings: Settings,
+        fetch_workers: Optional[int] = None,
+        extract_workers: Optional[int] = None,
+        per_host_limit: Optional[int] = None,
+        timeout: Optional[float] = None,
+        sources: Optional[SourceStateStore] = None,
+    ):
+        self.settings = settings
+        self.sources = sources
+        self.fetch_workers = max(1, fetch_workers or settings.ingest_fetch_workers)
+        self.extract_workers = settings.ingest_extract_workers if extract_workers is None else extract_workers
+        self.timeout = timeout or settings.ingest_timeout
+        self.limiter = HostLimiter(per_host_limit or settings.ingest_per_host_limit)
+        self._search_client = None
+
+    def _search(self, name: str) -> Optional[Dict[str, Any]]:
+        if self._search_client is None:
+            from tavily import TavilyClient
+
+            self._search_client = TavilyClient(api_key=self.settings.tavily_api_key)
+        data = self._search_client.search(query=f"{name} 年报 营业收入 数据", max_results=3)
+        items = data.get("results", [])
+        return items[0] if items else None
+
+    def _collect(self, name: str, urls: List[str]) -> SourceDocument:
+        doc = SourceDocument(company=name)
+        for u in urls:
+            if name in u:
+                doc.source_url = u
+                break
+        if self.settings.tavily_api_key:
+            try:
+                item = self._search(name)
+                if item:
+                    doc.source_url = item.get("url")
+                    doc.snippet = item.get("content")
+            except Exception as e:
+                doc.source_url = None
+                doc.error = f"search: {e}"
+        if doc.source_url:
+            previous = self.sources.get(doc.source_url) if self.sources else None
+            try:
+                with self.limiter.slot(doc.source_url):
+                    body, validators = fetch_conditional(
+                        doc.source_url,
+                        self.timeout,
+                        etag=previous and previous["etag"],
+                        last_modified=previous and previous["last_modified"],
+                    )
+                doc.etag, doc.last_modified = validators["etag"], validators["last_modified"]
+                if body is None:
+                    doc.content_hash = previous["content_hash"]
+                    doc.unchanged = True
+                else:
+                    doc.content_hash = hashlib.sha256(body).hexdigest()
+                    doc.unchanged = bool(previous) and previous["content_hash"] == doc.content_hash
+                    if not doc.unchanged:
+                        doc.html = body
+            except Exception as e:
+                doc.error = f"fetch: {e}"
+        return doc
+
+    def _extract_executor(self, jobs: int) -> Executor:
+        if self.extract_workers <= 0 or jobs < PROCESS_POOL_MIN_JOBS:
+            return _InlineExecutor()
+        return ProcessPoolExecutor(max_workers=min(self.extract_workers, jobs), mp_context=_process_context())
+
+    def run(self, names: List[str], urls: Optional[List[str]] = None) -> List[SourceDocument]:
+        import trafilatura
+
+        urls = urls or []
+        docs: List[Optional[SourceDocument]] = [None] * len(names)
+        extracting: Dict[Any, int] = {}
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as fetch_pool:
+            fetching = {fetch_pool.submit(self._collect, name, urls): i for i, name in enumerate(names)}
+            extract_pool = self._extract_executor(len(names))
+            stuck = False
+            try:
+                for future in as_completed(fetching):
+                    i = fetching[future]
+                    docs[i] = future.result()
+                    if docs[i].html:
+                        extracting[extract_pool.submit(trafilatura.extract, docs[i].html)] = i
+                for future, i in extracting.items():
+                    try:
+                        docs[i].text = future.result(timeout=self.timeout)
+                    except FutureTimeout:
+                        stuck = True
+                        docs[i].error = f"extract: 超过 {self.timeout:g} 秒未完成"
+                    except Exception as e:
+                        docs[i].error = f"extract: {e}"
+                    docs[i].html = None
+            finally:
+                _shutdown(extract_pool, kill=stuck)
+        return docs
@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import Settings
+from .policy import RunCancelled
+from .schemas import ExecutionPlan, TaskUnderstanding
+
+
+JOB_RETENTION = 3600.0
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class Job:
+    def __init__(self, run_id: str, total_steps: int):
+        self.run_id = run_id
+        self.total_steps = total_steps
+        self.status = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._cond = threading.Condition()
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        with self._cond:
+            self.events.append(dict(event, seq=len(self.events), ts=time.time()))
+            self._cond.notify_all()
+            subscribers = list(self._subscribers)
+        for loop, wake in subscribers:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        # 终态与 run_finished 事件在同一把锁内写入，SSE 读者看到 done 时必能取到该事件
+        with self._cond:
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+            self.emit({"type": "run_finished", "status": status, "error": error})
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop) -> asyncio.Event:
+        # 异步订阅方由作业线程通过 call_soon_threadsafe 唤醒，等待期间不占用线程池线程
+        wake = asyncio.Event()
+        with self._cond:
+            self._subscribers.append((loop, wake))
+        return wake
+
+    def unsubscribe(self, wake: asyncio.Event) -> None:
+        with self._cond:
+            self._subscribers = [item for item in self._subscribers if item[1] is not wake]
+
+    def events_since(self, cursor: int) -> List[Dict[str, Any]]:
+        with self._cond:
+            return self.events[cursor:]
+
+    def progress(self) -> Dict[str, Any]:
+        with self._cond:
+            finished = [e["step"] for e in self.events if e["type"] == "step_finished" and e.get("status") == "success"]
+            running = {e["step"] for e in self.events if e["type"] == "step_started"} - {
+                e["step"] for e in self.events if e["type"] == "step_finished"
+            }
+        return {
+            "run_id": self.run_id,
+            "status": self.status,
+            "completed_steps": len(finished),
+            "total_steps": self.total_steps,
+            "running_steps": sorted(running),
+            "error": self.error,
+        }
+
+
+class JobManager:
+    def __init__(
+        self,
+        settings: Settings,
+        run: Callable[..., Dict[str, Any]],
+        create_run_id: Callable[[], str],
+        workers: Optional[int] = None,
+    ):
+        self.settings = settings
+        self.run = run
+        self.create_run_id = create_run_id
+        self.max_pending = max(1, settings.api_job_queue)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers or settings.api_job_workers), thread_name_prefix="autoplan-job")
+        self.jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def _pending(self) -> int:
+        return sum(1 for job in self.jobs.values() if not job.done)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - JOB_RETENTION
+        for run_id in [r for r, job in self.jobs.items() if job.done and (job.finished_at or 0) < cutoff]:
+            del self.jobs[run_id]
+
+    def submit(self, plan: ExecutionPlan, understanding: TaskUnderstanding, run_id: Optional[str] = None) -> Job:
+        with self._lock:
+            self._prune()
+            if self._pending() >= self.max_pending:
+                raise JobQueueFull(f"排队任务已达上限 ({self.max_pending})")
+            run_id = run_id or self.create_run_id()
+            current = self.jobs.get(run_id)
+            if current is not None and not current.done:
+                return current
+            job = Job(run_id, len(plan.steps))
+            self.jobs[run_id] = job
+        self.pool.submit(self._execute, job, plan, understanding)
+        return job
+
+    def _execute(self, job: Job, plan: ExecutionPlan, understanding: TaskUnderstanding) -> None:
+        with self._lock:
+            if job.status == "cancelled":
+                return
+            job.status = "running"
+        job.emit({"type": "run_started"})
+        try:
+            job.result = self.run(plan, understanding, run_id=job.run_id, on_event=job.emit)
+        except RunCancelled as e:
+            job.finish("cancelled", str(e))
+        except Exception as e:
+            job.finish("failed", str(e))
+        else:
+            job.finish("succeeded")
+
+    def get(self, run_id: str) -> Optional[Job]:
+        return self.jobs.get(run_id)
+
+    def cancel(self, run_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self.jobs.get(run_id)
+            if job is None or job.status != "queued":
+                return job
+            job.finish("cancelled", "运行已取消")
+        return job
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -1,17 +1,25 @@
-from typing import Any, Type, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, Type, Optional
+from concurrent.futures import Future
+import hashlib
 import json
+import os
+import sqlite3
+import threading
+import time
 
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
 from pydantic import BaseModel
 
 from .config import Settings
 
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
 
-def build_llm(settings: Settings) -> Optional[ChatOpenAI]:
+
+def build_llm(settings: Settings) -> Optional["ChatOpenAI"]:
     if not settings.openai_api_key:
         return None
+    from langchain_openai import ChatOpenAI
+
     base_url = settings.openai_base_url or None
     return ChatOpenAI(
         model=settings.openai_model,
@@ -21,13 +29,112 @@ def build_llm(settings: Settings) -> Optional[ChatOpenAI]:
     )
 
 
+class LLMCache:
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("create table if not exists responses (key text primary key, value text, expires_at real)")
+            conn.execute("delete from responses where expires_at < ?", (time.time(),))
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def key(llm: Any, output_model: Type[BaseModel], system_prompt: str, user_prompt: str) -> str:
+        material = json.dumps(
+            [
+                getattr(llm, "model_name", ""),
+                getattr(llm, "openai_api_base", None) or "",
+                getattr(llm, "temperature", None),
+                system_prompt,
+                user_prompt,
+                output_model.model_json_schema(),
+            ],
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute(
+                "select value from responses where key = ? and expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._db().execute(
+                "insert or replace into responses values (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time() + self.ttl),
+            )
+            self._db().commit()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+_caches: Dict[str, LLMCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache(settings: Settings) -> Optional[LLMCache]:
+    if settings.llm_cache_ttl <= 0:
+        return None
+    path = os.path.abspath(settings.llm_cache_path or os.path.join(settings.state_dir, "llm_cache.db"))
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = LLMCache(path, settings.llm_cache_ttl)
+            _caches[path] = cache
+        return cache
+
+
 def llm_structured_output(
-    llm: Optional[ChatOpenAI],
+    llm: Optional["ChatOpenAI"],
     output_model: Type[BaseModel],
     system_prompt: str,
     user_prompt: str,
+    cache: Optional[LLMCache] = None,
 ) -> BaseModel:
-    parser = PydanticOutputParser(pydantic_object=output_model)
+    if llm is not None and cache is not None:
+        key = cache.key(llm, output_model, system_prompt, user_prompt)
+        data = cache.get_or_compute(
+            key, lambda: llm_structured_output(llm, output_model, system_prompt, user_prompt).model_dump()
+        )
+        return output_model.model_validate(data)
     if llm is None:
         data = {}
         try:
@@ -35,6 +142,10 @@ def llm_structured_output(
         except Exception:
             data = {}
         return output_model.model_validate(data)
+    from langchain_core.output_parsers import PydanticOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
+    parser = PydanticOutputParser(pydantic_object=output_model)
     prompt = ChatPromptTemplate.from_messages(
         [
             ("system", system_prompt),
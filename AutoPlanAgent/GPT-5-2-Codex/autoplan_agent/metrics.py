@@ -0,0 +1,206 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+RSS_SAMPLE_INTERVAL = 0.02
+
+
+def _max_rss() -> Optional[int]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _current_rss() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _RssSampler:
+    # ru_maxrss 是进程生命周期内的峰值，首个大步骤之后增量恒为 0，改为在步骤期间采样当前 RSS
+    def __init__(self):
+        self.base = _current_rss()
+        self.peak = self.base
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if self.base is not None:
+            self._thread = threading.Thread(target=self._run, name="autoplan-rss", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self._sample()
+
+    def _sample(self) -> None:
+        rss = _current_rss()
+        if rss is not None and rss > self.peak:
+            self.peak = rss
+
+    def stop(self) -> Optional[int]:
+        if self._thread is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return max(0, self.peak - self.base)
+
+
+class _Tracing:
+    # tracemalloc 的峰值是进程级的：仅在没有其他步骤并发时重置并报告峰值，最后一个步骤结束时停止追踪
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Dict[int, bool] = {}
+        self._started = False
+
+    def enter(self, probe_id: int) -> int:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+            exclusive = not self._active
+            for other in self._active:
+                self._active[other] = False
+            self._active[probe_id] = exclusive
+            if exclusive:
+                tracemalloc.reset_peak()
+            return tracemalloc.get_traced_memory()[0]
+
+    def exit(self, probe_id: int) -> Optional[int]:
+        with self._lock:
+            exclusive = self._active.pop(probe_id, False)
+            peak = tracemalloc.get_traced_memory()[1] if exclusive else None
+            if not self._active and self._started:
+                tracemalloc.stop()
+                self._started = False
+            return peak
+
+
+_TRACING = _Tracing()
+
+
+class StepProbe:
+    def __init__(self, memory: str = "rss"):
+        self.memory = memory
+        self._wall = 0.0
+        self._cpu = 0.0
+        self._rss: Optional[int] = None
+        self._sampler: Optional[_RssSampler] = None
+        self._traced = 0
+
+    def start(self) -> "StepProbe":
+        if self.memory == "tracemalloc":
+            self._traced = _TRACING.enter(id(self))
+        elif self.memory == "rss":
+            self._sampler = _RssSampler()
+            if self._sampler.base is None:
+                self._rss = _max_rss()
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self
+
+    def stop(self, rows_in: Optional[int], rows_out: Optional[int], files: Iterable[str]) -> Dict[str, Any]:
+        metrics: Dict[str, Any] = {
+            "wall_seconds": round(time.perf_counter() - self._wall, 6),
+            "cpu_seconds": round(time.thread_time() - self._cpu, 6),
+            "rows_in": rows_in,
+            "rows_out": rows_out,
+            "bytes_written": sum(os.path.getsize(f) for f in set(files) if os.path.isfile(f)),
+        }
+        if self.memory == "tracemalloc":
+            peak = _TRACING.exit(id(self))
+            metrics["peak_memory_bytes"] = None if peak is None else max(0, peak - self._traced)
+        elif self.memory == "rss":
+            peak = self._sampler.stop() if self._sampler is not None else None
+            if peak is None and self._rss is not None:
+                peak = max(0, (_max_rss() or 0) - self._rss)
+            metrics["peak_memory_bytes"] = peak
+        return metrics
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs: Dict[Tuple, int] = {}
+        self.cache_hits: Dict[Tuple, int] = {}
+        self.cpu: Dict[Tuple, float] = {}
+        self.bytes_written: Dict[Tuple, int] = {}
+        self.rows_out: Dict[Tuple, int] = {}
+        self.peak_memory: Dict[Tuple, int] = {}
+        self.duration: Dict[Tuple, List[float]] = {}
+
+    def observe(self, tool: str, status: str, metrics: Dict[str, Any]) -> None:
+        key = (("tool", tool),)
+        with self._lock:
+            run_key = key + (("status", status),)
+            self.runs[run_key] = self.runs.get(run_key, 0) + 1
+            if metrics.get("cached"):
+                self.cache_hits[key] = self.cache_hits.get(key, 0) + 1
+            if "wall_seconds" not in metrics:
+                return
+            wall = metrics["wall_seconds"]
+            hist = self.duration.setdefault(key, [0] * len(DURATION_BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if wall <= bound:
+                    hist[i] += 1
+            hist[-2] += wall
+            hist[-1] += 1
+            self.cpu[key] = self.cpu.get(key, 0.0) + metrics.get("cpu_seconds", 0.0)
+            self.bytes_written[key] = self.bytes_written.get(key, 0) + int(metrics.get("bytes_written") or 0)
+            self.rows_out[key] = self.rows_out.get(key, 0) + int(metrics.get("rows_out") or 0)
+            if metrics.get("peak_memory_bytes") is not None:
+                self.peak_memory[key] = max(self.peak_memory.get(key, 0), int(metrics["peak_memory_bytes"]))
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str, values: Dict[Tuple, Any]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(values.items()):
+                lines.append(f"{name}{_labels(labels)} {value}")
+
+        with self._lock:
+            family("autoplan_step_runs_total", "counter", "Completed plan steps.", self.runs)
+            family("autoplan_step_cache_hits_total", "counter", "Steps served from the step cache.", self.cache_hits)
+            lines.append("# HELP autoplan_step_duration_seconds Wall time per step.")
+            lines.append("# TYPE autoplan_step_duration_seconds histogram")
+            for labels, hist in sorted(self.duration.items()):
+                for i, bound in enumerate(DURATION_BUCKETS):
+                    lines.append(f"autoplan_step_duration_seconds_bucket{_labels(labels + (('le', str(bound)),))} {hist[i]}")
+                lines.append(f"autoplan_step_duration_seconds_bucket{_labels(labels + (('le', '+Inf'),))} {hist[-1]}")
+                lines.append(f"autoplan_step_duration_seconds_sum{_labels(labels)} {hist[-2]}")
+                lines.append(f"autoplan_step_duration_seconds_count{_labels(labels)} {hist[-1]}")
+            family("autoplan_step_cpu_seconds_total", "counter", "CPU time spent in step threads.", self.cpu)
+            family("autoplan_step_bytes_written_total", "counter", "Bytes written to artifacts.", self.bytes_written)
+            family("autoplan_step_rows_out_total", "counter", "Rows produced by steps.", self.rows_out)
+            family("autoplan_step_peak_memory_bytes", "gauge", "Largest peak memory growth seen for a step.", self.peak_memory)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
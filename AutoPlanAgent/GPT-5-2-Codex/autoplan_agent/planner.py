@@ -1,7 +1,7 @@
 from typing import List
 
 from .config import Settings
-from .llm import build_llm, llm_structured_output
+from .llm import build_llm, get_llm_cache, llm_structured_output
 from .schemas import TaskUnderstanding, ExecutionPlan, PlanStep
 
 
@@ -9,6 +9,18 @@ class TaskPlanner:
     def __init__(self, settings: Settings):
         self.settings = settings
         self.llm = build_llm(settings)
+        self.cache = get_llm_cache(settings)
+
+    def _tool_catalog(self) -> str:
+        from .tools import get_registry
+
+        lines = ["step.tool 只能取以下已注册工具（inputs/outputs 为读写的上下文键）:"]
+        for spec in get_registry(self.settings).describe():
+            lines.append(
+                f"- {spec['name']}: {spec['description']}；inputs={spec['inputs']} outputs={spec['outputs']} "
+                f"resource={spec['resource']}"
+            )
+        return "\n".join(lines)
 
     def understand(self, task: str) -> TaskUnderstanding:
         system_prompt = "你是资深数据分析规划助手，输出结构化任务理解。"
@@ -27,10 +39,13 @@ class TaskPlanner:
             TaskUnderstanding,
             system_prompt,
             task,
+            cache=self.cache,
         )
 
     def plan(self, understanding: TaskUnderstanding) -> ExecutionPlan:
         system_prompt = "你是数据分析任务规划引擎，输出可执行步骤与依赖。"
+        if self.llm is not None:
+            system_prompt = f"{system_prompt}\n{self._tool_catalog()}"
         if self.llm is None:
             steps: List[PlanStep] = [
                 PlanStep(
@@ -46,6 +61,7 @@ class TaskPlanner:
                     description="清洗缺失值、重复值与异常值",
                     inputs=["原始数据"],
                     outputs=["清洗数据"],
+                    dependencies=["data_extract"],
                     tool="data_clean",
                     parameters={},
                 ),
@@ -54,6 +70,7 @@ class TaskPlanner:
                     description="描述性统计与相关性分析",
                     inputs=["清洗数据"],
                     outputs=["EDA结果"],
+                    dependencies=["data_clean"],
                     tool="eda",
                     parameters={},
                 ),
@@ -62,14 +79,16 @@ class TaskPlanner:
                     description="异常检测与趋势分析",
                     inputs=["清洗数据"],
                     outputs=["模型结果"],
+                    dependencies=["data_clean"],
                     tool="modeling",
                     parameters={},
                 ),
                 PlanStep(
                     name="visualization",
                     description="生成图表与仪表盘素材",
-                    inputs=["EDA结果", "模型结果"],
+                    inputs=["清洗数据"],
                     outputs=["图表文件"],
+                    dependencies=["data_clean"],
                     tool="visualization",
                     parameters={},
                 ),
@@ -78,6 +97,7 @@ class TaskPlanner:
                     description="汇总报告并生成多格式输出",
                     inputs=["全部分析结果"],
                     outputs=["报告文件"],
+                    dependencies=["eda", "modeling", "visualization"],
                     tool="report",
                     parameters={},
                 ),
@@ -88,6 +108,7 @@ class TaskPlanner:
             ExecutionPlan,
             system_prompt,
             understanding.model_dump_json(),
+            cache=self.cache,
         )
 
     def replan(self, understanding: TaskUnderstanding, feedback: str) -> ExecutionPlan:
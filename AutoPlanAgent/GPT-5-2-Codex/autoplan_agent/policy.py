@@ -0,0 +1,139 @@
+import random
+import socket
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .config import Settings
+
+
+TRANSIENT_ERROR_NAMES = {"URLError", "RemoteDisconnected", "PoolExhausted"}
+DB_ERROR_NAMES = {"OperationalError", "InterfaceError"}
+# 2003 无法连接、2006 服务端断开、2013 查询中连接丢失、1205 锁等待超时、1213 死锁
+TRANSIENT_DB_ERRNOS = {2003, 2006, 2013, 1205, 1213}
+
+
+class TransientError(RuntimeError):
+    pass
+
+
+class StepTimeout(TimeoutError):
+    pass
+
+
+class StepCancelled(RuntimeError):
+    pass
+
+
+class RunCancelled(RuntimeError):
+    pass
+
+
+def _db_errno(exc: BaseException) -> Optional[int]:
+    if not any(cls.__name__ in DB_ERROR_NAMES for cls in type(exc).__mro__):
+        return None
+    code = exc.args[0] if exc.args else None
+    return code if isinstance(code, int) else None
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (StepCancelled, RunCancelled)):
+        return False
+    if isinstance(exc, (TransientError, TimeoutError, socket.timeout, ConnectionError)):
+        return True
+    if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(exc).__mro__):
+        return True
+    if _db_errno(exc) in TRANSIENT_DB_ERRNOS:
+        return True
+    return exc.__cause__ is not None and is_transient(exc.__cause__)
+
+
+@dataclass
+class ExecutionPolicy:
+    timeout: float = 0.0
+    retries: int = 0
+    backoff: float = 1.0
+    max_backoff: float = 30.0
+
+    @classmethod
+    def resolve(cls, settings: Settings, tool: str, declared: Optional[Dict[str, Any]] = None) -> "ExecutionPolicy":
+        values: Dict[str, Any] = {
+            "timeout": settings.step_timeout,
+            "retries": settings.step_retries,
+            "backoff": settings.step_retry_backoff,
+            "max_backoff": settings.step_retry_max_backoff,
+        }
+        values.update(declared or {})
+        values.update(settings.step_policies.get(tool) or {})
+        known = {f.name for f in fields(cls)}
+        unknown = sorted(set(values) - known)
+        if unknown:
+            raise ValueError(f"工具 {tool} 的执行策略包含未知字段: {', '.join(unknown)}")
+        return cls(
+            timeout=max(0.0, float(values["timeout"] or 0)),
+            retries=max(0, int(values["retries"] or 0)),
+            backoff=max(0.0, float(values["backoff"])),
+            max_backoff=max(0.0, float(values["max_backoff"])),
+        )
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** max(0, attempt - 1)))
+
+
+class CancelToken:
+    def __init__(self, parent: Optional["CancelToken"] = None):
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], Any]] = []
+        self._lock = threading.Lock()
+        self._parent = parent
+        if parent is not None:
+            parent.on_cancel(self.cancel)
+
+    def detach(self) -> None:
+        if self._parent is not None:
+            self._parent.remove(self.cancel)
+            self._parent = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback: Callable[[], Any]) -> None:
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        try:
+            callback()
+        except Exception:
+            pass
+
+    def remove(self, callback: Callable[[], Any]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    @contextmanager
+    def scope(self, callback: Callable[[], Any]) -> Iterator[None]:
+        self.on_cancel(callback)
+        try:
+            yield
+        finally:
+            self.remove(callback)
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise StepCancelled("步骤已取消")
@@ -0,0 +1,260 @@
+import heapq
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .streaming import ReservoirSample
+
+
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+FULL_CORRELATION_MAX_COLUMNS = 64
+
+
+def hash_values(series: pd.Series) -> np.ndarray:
+    return pd.util.hash_pandas_object(series.dropna(), index=False).to_numpy()
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = 14):
+        if not 4 <= precision <= 18:
+            raise ValueError("HyperLogLog 精度需在 4 到 18 之间")
+        self.p = precision
+        self.m = 1 << precision
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def update(self, hashes: np.ndarray) -> None:
+        if not len(hashes):
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        width = 64 - self.p
+        index = (hashes >> np.uint64(width)).astype(np.int64)
+        rest = hashes & np.uint64((1 << width) - 1)
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = (width - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class QuantileSketch:
+    def __init__(self, k: int = 200, seed: int = 42):
+        self.k = max(8, k)
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self.pending: List[np.ndarray] = []
+        self.pending_size = 0
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self) -> float:
+        return 2.446 / self.k**0.9433
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.pending.append(values)
+        self.pending_size += len(values)
+        if self.pending_size >= self._capacity(0):
+            self._flush()
+
+    def _flush(self) -> None:
+        if self.pending:
+            self.levels[0] = np.concatenate([self.levels[0]] + self.pending)
+            self.pending = []
+            self.pending_size = 0
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                items = np.sort(items)
+                if len(items) % 2:
+                    keep, items = items[-1:], items[:-1]
+                else:
+                    keep = items[:0]
+                promoted = items[int(self.rng.integers(2)) :: 2]
+                self.levels[level] = keep
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantiles(self, qs: Iterable[float] = QUANTILES) -> Dict[str, Optional[float]]:
+        self._flush()
+        items = np.concatenate(self.levels)
+        if not len(items):
+            return {f"p{int(q * 100)}": None for q in qs}
+        weights = np.concatenate([np.full(len(lv), 2.0**h) for h, lv in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items, weights = items[order], weights[order]
+        cumulative = np.cumsum(weights) / weights.sum()
+        result = {}
+        for q in qs:
+            i = min(int(np.searchsorted(cumulative, q, side="left")), len(items) - 1)
+            result[f"p{int(q * 100)}"] = float(items[i])
+        return result
+
+
+def top_k_correlation(frame: pd.DataFrame, k: int = 20, block_size: int = 256) -> List[Dict[str, Any]]:
+    columns = list(frame.columns)
+    n = len(frame)
+    if n < 2 or len(columns) < 2:
+        return []
+    values = frame.to_numpy(dtype=np.float64)
+    mean = np.nanmean(values, axis=0)
+    std = np.nanstd(values, axis=0, ddof=1)
+    std[~(std > 0)] = np.nan
+    z = np.nan_to_num((values - mean) / std, nan=0.0)
+    heap: List = []
+    p = len(columns)
+    for i in range(0, p, block_size):
+        bi = z[:, i : i + block_size]
+        for j in range(i, p, block_size):
+            block = bi.T @ z[:, j : j + block_size] / (n - 1)
+            if i == j:
+                rows, cols = np.triu_indices(block.shape[0], 1)
+            else:
+                rows, cols = (idx.ravel() for idx in np.indices(block.shape))
+            if not len(rows):
+                continue
+            scores = np.abs(block[rows, cols])
+            take = min(k, len(scores))
+            for idx in np.argpartition(-scores, take - 1)[:take]:
+                r = float(block[rows[idx], cols[idx]])
+                item = (abs(r), columns[rows[idx] + i], columns[cols[idx] + j], r)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item[0] > heap[0][0]:
+                    heapq.heapreplace(heap, item)
+    return [{"a": a, "b": b, "r": r} for _, a, b, r in sorted(heap, reverse=True)]
+
+
+class ApproxProfile:
+    def __init__(self, sample_size: int = 100000, quantile_k: int = 200, hll_precision: int = 14, seed: int = 42):
+        self.sample = ReservoirSample(sample_size, seed=seed)
+        self.quantile_k = quantile_k
+        self.hll_precision = hll_precision
+        self.rows = 0
+        self.columns: List[str] = []
+        self.numeric: List[str] = []
+        self.missing: Dict[str, int] = {}
+        self.moments: Dict[str, List[float]] = {}
+        self.sketches: Dict[str, QuantileSketch] = {}
+        self.distinct: Dict[str, HyperLogLog] = {}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        if not len(chunk):
+            return
+        if not self.columns:
+            self.columns = list(chunk.columns)
+            self.numeric = list(chunk.select_dtypes(include="number").columns)
+            for col in self.columns:
+                self.missing[col] = 0
+                self.distinct[col] = HyperLogLog(self.hll_precision)
+            for col in self.numeric:
+                self.moments[col] = [0.0, 0.0, 0.0, math.inf, -math.inf]
+                self.sketches[col] = QuantileSketch(self.quantile_k)
+        self.rows += len(chunk)
+        self.sample.update(chunk)
+        nulls = chunk.isna().sum()
+        for col in self.columns:
+            if col not in chunk:
+                self.missing[col] += len(chunk)
+                continue
+            self.missing[col] += int(nulls[col])
+            self.distinct[col].update(hash_values(chunk[col]))
+        for col in self.numeric:
+            if col not in chunk:
+                continue
+            values = pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float64)
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            n, mean, m2, lo, hi = self.moments[col]
+            n_b = len(values)
+            mean_b = values.mean()
+            m2_b = ((values - mean_b) ** 2).sum()
+            total = n + n_b
+            delta = mean_b - mean
+            self.moments[col] = [
+                total,
+                mean + delta * n_b / total,
+                m2 + m2_b + delta**2 * n * n_b / total,
+                min(lo, values.min()),
+                max(hi, values.max()),
+            ]
+            self.sketches[col].update(values)
+
+    def result(self, top_k: int = 20, block_size: int = 256) -> Dict[str, Any]:
+        describe: Dict[str, Dict[str, Any]] = {}
+        sample = self.sample.frame() if self.rows else pd.DataFrame()
+        for col in self.columns:
+            info: Dict[str, Any] = {
+                "count": self.rows - self.missing[col],
+                "missing": self.missing[col],
+                "distinct_approx": self.distinct[col].count(),
+            }
+            if col in self.moments and self.moments[col][0]:
+                n, mean, m2, lo, hi = self.moments[col]
+                info.update(
+                    {
+                        "mean": float(mean),
+                        "std": float(math.sqrt(m2 / (n - 1))) if n > 1 else "",
+                        "min": float(lo),
+                        "max": float(hi),
+                    }
+                )
+                info.update(self.sketches[col].quantiles())
+            elif col in sample:
+                top = sample[col].value_counts(dropna=True).head(5)
+                info["top_values"] = {str(k): int(v) for k, v in top.items()}
+            describe[col] = info
+        numeric_sample = sample[[c for c in self.numeric if c in sample]] if len(sample) else pd.DataFrame()
+        n_sample = len(numeric_sample)
+        if 0 < numeric_sample.shape[1] <= FULL_CORRELATION_MAX_COLUMNS:
+            correlation: Dict[str, Any] = numeric_sample.corr().to_dict()
+        else:
+            correlation = {"top_pairs": top_k_correlation(numeric_sample, top_k, block_size)}
+        exact_correlation = n_sample >= self.rows
+        return {
+            "mode": "approx",
+            "rows": self.rows,
+            "describe": describe,
+            "correlation": correlation,
+            "sample_rows": n_sample,
+            "error_bounds": {
+                "moments": "exact",
+                "quantile_rank_error": round(self.sketches[self.numeric[0]].rank_error, 6) if self.numeric else None,
+                "distinct_relative_error": round(1.04 / math.sqrt(1 << self.hll_precision), 6),
+                "correlation_std_error": 0.0 if exact_correlation else round(1 / math.sqrt(max(n_sample - 1, 1)), 6),
+            },
+        }
+
+
+def profile(chunks: Iterable[pd.DataFrame], **options: Any) -> ApproxProfile:
+    state = ApproxProfile(**options)
+    for chunk in chunks:
+        state.update(chunk)
+    return state
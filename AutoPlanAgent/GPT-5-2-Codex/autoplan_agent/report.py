@@ -1,21 +1,57 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, List, Optional
 import os
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 
+from .artifacts import unique_stamp
 from .config import Settings
 from .schemas import AnalysisReport
 
 
+FORMATS = ("markdown", "html", "pdf")
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+
+_ENVIRONMENTS: Dict[tuple, Environment] = {}
+_ENV_LOCK = threading.Lock()
+
+
+def get_environment(template_dir: str, cache_dir: str = "") -> Environment:
+    key = (os.path.abspath(template_dir), cache_dir)
+    with _ENV_LOCK:
+        env = _ENVIRONMENTS.get(key)
+        if env is None:
+            bytecode_cache = None
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(cache_dir)
+            env = Environment(
+                loader=FileSystemLoader(template_dir),
+                autoescape=select_autoescape(["html", "xml"]),
+                bytecode_cache=bytecode_cache,
+            )
+            _ENVIRONMENTS[key] = env
+        return env
+
+
+def parse_formats(formats: Optional[Iterable[str]]) -> List[str]:
+    if formats is None:
+        return list(FORMATS)
+    if isinstance(formats, str):
+        formats = formats.split(",")
+    selected = [f.strip().lower() for f in formats if f and f.strip()]
+    unknown = [f for f in selected if f not in FORMATS]
+    if unknown:
+        raise ValueError(f"不支持的报告格式: {', '.join(unknown)}")
+    return [f for f in FORMATS if f in selected]
+
+
 class ReportRenderer:
     def __init__(self, settings: Settings):
         self.settings = settings
-        template_dir = os.path.join(os.path.dirname(__file__), "templates")
-        self.env = Environment(
-            loader=FileSystemLoader(template_dir),
-            autoescape=select_autoescape(["html", "xml"]),
-        )
+        self.template_cache_dir = settings.template_cache_dir or os.path.join(settings.state_dir, "templates")
+        self.env = get_environment(TEMPLATE_DIR, self.template_cache_dir)
 
     def _build_report_model(self, context: Dict[str, Any]) -> AnalysisReport:
         eda = context.get("eda", {})
@@ -35,35 +71,65 @@ class ReportRenderer:
             findings=findings,
             recommendations=["关注异常样本与关键指标趋势变化"],
             artifacts=visuals,
+            step_metrics=[
+                {
+                    "step": m.get("step"),
+                    "tool": m.get("tool"),
+                    "wall_seconds": m.get("wall_seconds"),
+                    "cpu_seconds": m.get("cpu_seconds"),
+                    "peak_memory_mb": round(m["peak_memory_bytes"] / 1024**2, 1) if m.get("peak_memory_bytes") is not None else None,
+                    "rows_in": m.get("rows_in"),
+                    "rows_out": m.get("rows_out"),
+                    "bytes_written": m.get("bytes_written"),
+                    "cached": bool(m.get("cached")),
+                }
+                for m in context.get("step_metrics", [])
+                if m.get("status") == "success"
+            ],
         )
 
-    def render(self, context: Dict[str, Any], template_path: Optional[str] = None) -> Dict[str, Any]:
+    def render(
+        self,
+        context: Dict[str, Any],
+        template_path: Optional[str] = None,
+        formats: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Any]:
         os.makedirs(self.settings.output_dir, exist_ok=True)
+        selected = parse_formats(self.settings.report_formats if formats is None else formats)
         report = self._build_report_model(context)
-        md_path = os.path.join(self.settings.output_dir, f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md")
-        html_path = md_path.replace(".md", ".html")
-        template_name = "report.md.j2"
+        data = report.model_dump()
+        base = os.path.join(self.settings.output_dir, f"report_{unique_stamp()}")
+        md_env, md_name = self.env, "report.md.j2"
         if template_path:
-            template_dir, template_name = os.path.split(template_path)
-            env = Environment(loader=FileSystemLoader(template_dir))
-            md = env.get_template(template_name).render(report=report.model_dump())
+            template_dir, md_name = os.path.split(template_path)
+            md_env = get_environment(template_dir or ".", self.template_cache_dir)
+        jobs = {
+            "markdown": lambda: self._render_template(md_env, md_name, data, f"{base}.md"),
+            "html": lambda: self._render_template(self.env, "report.html.j2", data, f"{base}.html"),
+            "pdf": lambda: self._render_pdf(report, f"{base}.pdf"),
+        }
+        result: Dict[str, Any] = {fmt: None for fmt in FORMATS}
+        if len(selected) > 1:
+            with ThreadPoolExecutor(max_workers=len(selected)) as pool:
+                futures = {fmt: pool.submit(jobs[fmt]) for fmt in selected}
+                result.update({fmt: future.result() for fmt, future in futures.items()})
         else:
-            md = self.env.get_template("report.md.j2").render(report=report.model_dump())
-        with open(md_path, "w", encoding="utf-8") as f:
-            f.write(md)
-        html = self.env.get_template("report.html.j2").render(report=report.model_dump())
-        with open(html_path, "w", encoding="utf-8") as f:
-            f.write(html)
-        pdf_path = self._render_pdf(report)
-        return {"markdown": md_path, "html": html_path, "pdf": pdf_path, "summary": report.model_dump()}
+            result.update({fmt: jobs[fmt]() for fmt in selected})
+        result["summary"] = data
+        return result
+
+    def _render_template(self, env: Environment, name: str, data: Dict[str, Any], path: str) -> str:
+        text = env.get_template(name).render(report=data)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
 
-    def _render_pdf(self, report: AnalysisReport) -> Optional[str]:
+    def _render_pdf(self, report: AnalysisReport, pdf_path: str) -> Optional[str]:
         try:
             from reportlab.lib.pagesizes import A4
             from reportlab.pdfgen import canvas
         except Exception:
             return None
-        pdf_path = os.path.join(self.settings.output_dir, f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
         c = canvas.Canvas(pdf_path, pagesize=A4)
         width, height = A4
         y = height - 40
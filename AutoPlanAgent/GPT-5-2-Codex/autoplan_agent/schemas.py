@@ -31,6 +31,10 @@ class StepResult(BaseModel):
     step_name: str
     status: str
     payload: Dict[str, Any] = Field(default_factory=dict)
+    checkpoint: Dict[str, Dict[str, str]] = Field(default_factory=dict)
+    fingerprint: str = Field(default="")
+    metrics: Dict[str, Any] = Field(default_factory=dict)
+    attempts: int = Field(default=1)
 
 
 class AnalysisReport(BaseModel):
@@ -40,3 +44,4 @@ class AnalysisReport(BaseModel):
     findings: List[str]
     recommendations: List[str]
     artifacts: List[str]
+    step_metrics: List[Dict[str, Any]] = Field(default_factory=list)
@@ -1,32 +1,201 @@
 import os
 import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 from .config import Settings
+from .catalog import RunCatalog
+
+
+logger = logging.getLogger("autoplan.state")
+
+
+def _fsync_dir(path: str) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, text: str) -> None:
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(os.path.dirname(path) or ".")
 
 
 class StateStore:
     def __init__(self, settings: Settings):
         self.settings = settings
-        os.makedirs(self.settings.state_dir, exist_ok=True)
+        self.compact_every = max(1, settings.state_compact_every)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._journal_lines: Dict[str, int] = {}
+        self.catalog = RunCatalog(settings)
 
     def _path(self, run_id: str) -> str:
         return os.path.join(self.settings.state_dir, f"{run_id}.json")
 
+    def _journal_path(self, run_id: str) -> str:
+        return os.path.join(self.settings.state_dir, f"{run_id}.journal.jsonl")
+
+    def _cancel_path(self, run_id: str) -> str:
+        return os.path.join(self.settings.state_dir, f"{run_id}.cancel")
+
+    def _lock_path(self, run_id: str) -> str:
+        return os.path.join(self.settings.state_dir, ".locks", f"{run_id}.lock")
+
+    @contextmanager
+    def _lock(self, run_id: str) -> Iterator[None]:
+        # 线程锁保护本进程内的并发，fcntl 文件锁保护 CLI、API 与 worker 进程之间的并发
+        with self._locks_guard:
+            lock = self._locks.setdefault(run_id, threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(os.path.dirname(self._lock_path(run_id)), exist_ok=True)
+            with open(self._lock_path(run_id), "a") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
     def create(self) -> str:
-        run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-        data = {"run_id": run_id, "created_at": datetime.now().isoformat(), "steps": []}
+        os.makedirs(self.settings.state_dir, exist_ok=True)
+        while True:
+            now = datetime.now()
+            run_id = f"{now.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+            try:
+                fd = os.open(self._path(run_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+            os.close(fd)
+            break
+        data = {"run_id": run_id, "created_at": now.isoformat(), "steps": []}
         self.save(run_id, data)
         return run_id
 
+    def _index(self, record, run_id: str, data: Dict[str, Any]) -> None:
+        try:
+            record(run_id, data)
+        except sqlite3.Error as e:
+            logger.warning(f"运行目录索引更新失败 {run_id}: {e}")
+
+    def _journal_size(self, run_id: str) -> int:
+        try:
+            return os.path.getsize(self._journal_path(run_id))
+        except FileNotFoundError:
+            return 0
+
+    def _save(self, run_id: str, data: Dict[str, Any], fold: bool = False) -> None:
+        # 快照记录已并入的日志字节偏移，写快照后崩溃不会重放已并入的步骤；日志仅在运行结束时删除
+        os.makedirs(self.settings.state_dir, exist_ok=True)
+        snapshot = dict(data, journal_offset=self._journal_size(run_id))
+        atomic_write(self._path(run_id), json.dumps(snapshot, ensure_ascii=False, indent=2))
+        if fold and os.path.exists(self._journal_path(run_id)):
+            os.remove(self._journal_path(run_id))
+        self._journal_lines[run_id] = 0
+        self._index(self.catalog.record_snapshot, run_id, data)
+
+    def _load(self, run_id: str) -> Dict[str, Any]:
+        with open(self._path(run_id), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        offset = int(data.pop("journal_offset", 0) or 0)
+        data.setdefault("steps", []).extend(self._replay(run_id, offset))
+        return data
+
+    def _replay(self, run_id: str, offset: int = 0) -> List[Dict[str, Any]]:
+        path = self._journal_path(run_id)
+        if not os.path.exists(path):
+            return []
+        steps = []
+        with open(path, "rb") as f:
+            # 日志比偏移短说明结束时已删除、之后重新创建，从头重放
+            if offset <= os.fstat(f.fileno()).st_size:
+                f.seek(offset)
+            for line in f:
+                try:
+                    steps.append(json.loads(line))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+        return steps
+
     def save(self, run_id: str, data: Dict[str, Any]) -> None:
-        with open(self._path(run_id), "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with self._lock(run_id):
+            self._save(run_id, data)
 
     def load(self, run_id: str) -> Dict[str, Any]:
-        with open(self._path(run_id), "r", encoding="utf-8") as f:
-            return json.load(f)
+        with self._lock(run_id):
+            return self._load(run_id)
+
+    def append_step(self, run_id: str, step: Dict[str, Any]) -> None:
+        line = json.dumps(step, ensure_ascii=False) + "\n"
+        with self._lock(run_id):
+            with open(self._journal_path(run_id), "a+b") as f:
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = "\n" + line
+                f.write(line.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_lines[run_id] = self._journal_lines.get(run_id, 0) + 1
+            self._index(self.catalog.record_step, run_id, step)
+            if self._journal_lines[run_id] >= self.compact_every:
+                self._save(run_id, self._load(run_id))
+
+    def compact(self, run_id: str) -> None:
+        with self._lock(run_id):
+            self._save(run_id, self._load(run_id))
+
+    def finish(self, run_id: str, status: str) -> None:
+        with self._lock(run_id):
+            data = self._load(run_id)
+            data["status"] = status
+            data["finished_at"] = time.time()
+            self._save(run_id, data, fold=True)
+
+    def request_cancel(self, run_id: str) -> None:
+        atomic_write(self._cancel_path(run_id), str(time.time()))
+
+    def cancel_requested(self, run_id: str) -> bool:
+        return os.path.exists(self._cancel_path(run_id))
+
+    def clear_cancel(self, run_id: str) -> None:
+        try:
+            os.remove(self._cancel_path(run_id))
+        except FileNotFoundError:
+            pass
 
     def exists(self, run_id: str) -> bool:
         return os.path.exists(self._path(run_id))
+
+    def run_ids(self) -> List[str]:
+        if not os.path.isdir(self.settings.state_dir):
+            return []
+        return sorted(name[: -len(".json")] for name in os.listdir(self.settings.state_dir) if name.endswith(".json"))
+
+    def reindex(self) -> int:
+        return self.catalog.rebuild(self.load, self.run_ids())
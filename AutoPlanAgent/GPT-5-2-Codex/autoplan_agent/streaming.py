@@ -0,0 +1,277 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class ChunkSource:
+    def __init__(
+        self,
+        factory: Callable[[], Iterable[pd.DataFrame]],
+        chunksize: int,
+        rows: Optional[int] = None,
+        path: Optional[str] = None,
+    ):
+        self.factory = factory
+        self.chunksize = chunksize
+        self.rows = rows
+        self.path = path
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        return iter(self.factory())
+
+    @staticmethod
+    def from_path(path: str, chunksize: int, rows: Optional[int] = None) -> "ChunkSource":
+        from .artifacts import iter_frames
+
+        return ChunkSource(lambda: iter_frames(path, chunksize), chunksize, rows=rows, path=path)
+
+
+def server_side_cursor(conn):
+    try:
+        import pymysql
+        import pymysql.cursors
+    except Exception:
+        return conn.cursor()
+    if isinstance(conn, pymysql.connections.Connection):
+        return conn.cursor(pymysql.cursors.SSCursor)
+    return conn.cursor()
+
+
+def iter_query(conn, sql: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    cursor = server_side_cursor(conn)
+    try:
+        cursor.execute(sql)
+        columns = [d[0] for d in cursor.description]
+        empty = True
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            empty = False
+            # coerce_float 把 DECIMAL 转为浮点，与 read_sql 一致，下游按数值列处理
+            yield pd.DataFrame.from_records(list(rows), columns=columns, coerce_float=True)
+        if empty:
+            # 空结果也输出带列名的空分块，保证落盘文件带有表结构
+            yield pd.DataFrame(columns=columns)
+    finally:
+        cursor.close()
+
+
+class ReservoirSample:
+    def __init__(self, size: int, seed: int = 42):
+        self.size = max(1, size)
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+        self.columns: List[str] = []
+        self.arrays: Dict[str, np.ndarray] = {}
+        self.filled = 0
+
+    def _assign(self, slots: np.ndarray, chunk: pd.DataFrame, rows: np.ndarray) -> None:
+        for col in self.columns:
+            values = chunk[col].to_numpy()[rows] if col in chunk else np.full(len(rows), np.nan)
+            try:
+                self.arrays[col][slots] = values
+            except (TypeError, ValueError):
+                self.arrays[col] = self.arrays[col].astype(object)
+                self.arrays[col][slots] = values
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        m = len(chunk)
+        if not m:
+            return
+        if not self.columns:
+            self.columns = list(chunk.columns)
+            self.arrays = {col: np.empty(self.size, dtype=chunk[col].to_numpy().dtype) for col in self.columns}
+        take = min(self.size - self.filled, m)
+        if take > 0:
+            self._assign(np.arange(self.filled, self.filled + take), chunk, np.arange(take))
+            self.filled += take
+        if take < m:
+            positions = self.seen + np.arange(take, m)
+            slots = (self.rng.random(len(positions)) * (positions + 1)).astype(np.int64)
+            keep = slots < self.size
+            if keep.any():
+                self._assign(slots[keep], chunk, np.arange(take, m)[keep])
+        self.seen += m
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame({col: self.arrays[col][: self.filled] for col in self.columns})
+
+
+class StreamingStats:
+    def __init__(self):
+        self.numeric: List[str] = []
+        self.count: Optional[np.ndarray] = None
+        self.mean: Optional[np.ndarray] = None
+        self.m2: Optional[np.ndarray] = None
+        self.min: Optional[np.ndarray] = None
+        self.max: Optional[np.ndarray] = None
+        self.shift: Optional[np.ndarray] = None
+        self.n_complete = 0
+        self.sum = None
+        self.cross = None
+        self.non_numeric: Dict[str, int] = {}
+        self.rows = 0
+
+    def _numeric_columns(self, chunk: pd.DataFrame) -> List[str]:
+        # 数值列按每个分块判断：首块全空的列或以 Decimal 等对象返回的数值列在后续分块中仍能识别
+        columns = list(chunk.select_dtypes(include="number").columns)
+        for col in chunk.columns:
+            if col in columns or col in self.numeric:
+                continue
+            values = chunk[col].dropna().iloc[:1000]
+            if len(values) and pd.api.types.is_object_dtype(values) and pd.to_numeric(values, errors="coerce").notna().all():
+                columns.append(col)
+        return columns
+
+    def _grow(self, columns: List[str]) -> None:
+        k = len(columns)
+        self.numeric.extend(columns)
+        self.count = np.concatenate([self.count, np.zeros(k)])
+        self.mean = np.concatenate([self.mean, np.zeros(k)])
+        self.m2 = np.concatenate([self.m2, np.zeros(k)])
+        self.min = np.concatenate([self.min, np.full(k, np.inf)])
+        self.max = np.concatenate([self.max, np.full(k, -np.inf)])
+        for col in columns:
+            self.non_numeric.pop(col, None)
+        # 已累计的完整行不含新列，相关系数从新列出现起重新累计
+        n = len(self.numeric)
+        self.shift = None
+        self.n_complete = 0
+        self.sum = np.zeros(n)
+        self.cross = np.zeros((n, n))
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        if not len(chunk):
+            return
+        self.rows += len(chunk)
+        if self.count is None:
+            self.count = np.zeros(0)
+            self.mean = np.zeros(0)
+            self.m2 = np.zeros(0)
+            self.min = np.zeros(0)
+            self.max = np.zeros(0)
+        added = [col for col in self._numeric_columns(chunk) if col not in self.numeric]
+        if added:
+            self._grow(added)
+        for col in chunk.columns:
+            if col not in self.numeric:
+                self.non_numeric[col] = self.non_numeric.get(col, 0) + int(chunk[col].notna().sum())
+        if not self.numeric:
+            return
+        values = chunk.reindex(columns=self.numeric).apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+        mask = ~np.isnan(values)
+        n_b = mask.sum(axis=0)
+        filled = np.where(mask, values, 0.0)
+        safe_n = np.maximum(n_b, 1)
+        mean_b = filled.sum(axis=0) / safe_n
+        m2_b = (np.where(mask, values - mean_b, 0.0) ** 2).sum(axis=0)
+        total = self.count + n_b
+        delta = mean_b - self.mean
+        safe_total = np.maximum(total, 1)
+        self.mean = self.mean + delta * n_b / safe_total
+        self.m2 = self.m2 + m2_b + delta**2 * self.count * n_b / safe_total
+        self.count = total
+        self.min = np.fmin(self.min, np.where(mask, values, np.inf).min(axis=0))
+        self.max = np.fmax(self.max, np.where(mask, values, -np.inf).max(axis=0))
+        complete = values[mask.all(axis=1)]
+        if len(complete):
+            if self.shift is None:
+                self.shift = complete.mean(axis=0)
+            centered = complete - self.shift
+            self.n_complete += len(complete)
+            self.sum += centered.sum(axis=0)
+            self.cross += centered.T @ centered
+
+    def describe(self) -> Dict[str, Dict[str, Any]]:
+        result: Dict[str, Dict[str, Any]] = {}
+        for i, col in enumerate(self.numeric):
+            n = int(self.count[i])
+            result[col] = {
+                "count": n,
+                "mean": float(self.mean[i]) if n else "",
+                "std": float(np.sqrt(self.m2[i] / (n - 1))) if n > 1 else "",
+                "min": float(self.min[i]) if n else "",
+                "max": float(self.max[i]) if n else "",
+            }
+        for col, n in self.non_numeric.items():
+            result[col] = {"count": n}
+        return result
+
+    def correlation(self) -> Dict[str, Dict[str, float]]:
+        n = self.n_complete
+        if n < 2 or not self.numeric:
+            return {}
+        cov = (self.cross - np.outer(self.sum, self.sum) / n) / (n - 1)
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.outer(std, std)
+        return pd.DataFrame(corr, index=self.numeric, columns=self.numeric).to_dict()
+
+
+def first_valid_values(source: Iterable[pd.DataFrame]) -> pd.Series:
+    found: Optional[pd.Series] = None
+    for chunk in source:
+        head = chunk.bfill().iloc[0] if len(chunk) else None
+        if head is None:
+            continue
+        found = head if found is None else found.combine_first(head)
+        if found.notna().all():
+            break
+    return found if found is not None else pd.Series(dtype=object)
+
+
+class HashSet:
+    """有上限的行哈希集合：按排序的 uint64 数组保存，每行 8 字节，达到上限后不再收录新键。"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max(0, max_keys)
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.saturated = False
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        if not len(self.keys):
+            return np.zeros(len(hashes), dtype=bool)
+        pos = np.searchsorted(self.keys, hashes)
+        pos[pos == len(self.keys)] = 0
+        return self.keys[pos] == hashes
+
+    def add(self, hashes: np.ndarray) -> None:
+        room = self.max_keys - len(self.keys)
+        if room < len(hashes):
+            self.saturated = True
+            hashes = hashes[: max(0, room)]
+        if len(hashes):
+            self.keys = np.union1d(self.keys, hashes)
+
+
+def _row_hashes(chunk: pd.DataFrame) -> np.ndarray:
+    # 分块间 dtype 会漂移（整数列出现空值变为浮点、全空分块为 object），数值列统一为浮点后再哈希
+    canonical = chunk.copy(deep=False)
+    for i in range(chunk.shape[1]):
+        values = chunk.iloc[:, i]
+        if pd.api.types.is_numeric_dtype(values) or values.isna().all():
+            canonical.isetitem(i, values.astype("float64"))
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy(dtype=np.uint64)
+
+
+def clean_stream(source: ChunkSource, writer, dedupe: bool = True, max_keys: int = 10_000_000) -> Dict[str, Any]:
+    leading = first_valid_values(source)
+    last: Optional[pd.Series] = None
+    seen = HashSet(max_keys)
+    for chunk in source:
+        if dedupe and len(chunk):
+            hashes = _row_hashes(chunk)
+            dup = pd.Series(hashes).duplicated().to_numpy() | seen.contains(hashes)
+            seen.add(hashes[~dup])
+            chunk = chunk[~dup]
+        chunk = chunk.ffill()
+        if last is not None:
+            chunk = chunk.fillna(last)
+        chunk = chunk.fillna(leading)
+        if len(chunk):
+            last = chunk.iloc[-1]
+        writer.write(chunk)
+    # 去重键达到上限后只对已收录的行做跨分块去重，分块内去重不受影响
+    return {"rows": writer.rows, "dedupe_exact": not seen.saturated}
@@ -1,29 +1,215 @@
-from typing import Callable, Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Union
 import os
 import json
 import re
-from datetime import datetime
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import logging
+import threading
+import uuid
+from contextlib import nullcontext
+from dataclasses import dataclass, field
 
 from .config import Settings
+from .db import connection
+from .artifacts import ArtifactStore, unique_stamp
 
 
 ToolFunc = Callable[[Settings, Dict[str, Any], Dict[str, Any]], Dict[str, Any]]
+FingerprintFunc = Callable[[Settings, Dict[str, Any]], Optional[str]]
+
+logger = logging.getLogger("autoplan.tools")
+
+
+def _module_source(name: str) -> bytes:
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        spec = None
+    if spec is None or not spec.origin or not os.path.isfile(spec.origin):
+        return name.encode("utf-8")
+    with open(spec.origin, "rb") as f:
+        return f.read()
+
+
+def _source_version(func: ToolFunc, modules: Optional[List[str]] = None) -> str:
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}"
+    h = hashlib.sha256(source.encode("utf-8"))
+    for name in sorted(modules or []):
+        h.update(b"\0" + _module_source(name))
+    return h.hexdigest()[:16]
+
+
+def resolve_target(target: Union[str, Callable]) -> Callable:
+    if not isinstance(target, str):
+        return target
+    module_name, _, attr = target.partition(":")
+    if not attr:
+        raise ValueError(f"工具入口格式应为 module:function: {target}")
+    obj = importlib.import_module(module_name)
+    for part in attr.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+ENTRY_POINT_GROUP = "autoplan_agent.tools"
+SPEC_ENTRY_POINT_GROUP = "autoplan_agent.tool_specs"
+RESOURCE_CLASSES = ("cpu", "io", "network", "memory")
+
+
+@dataclass
+class ToolSpec:
+    name: str
+    target: Union[str, ToolFunc]
+    cacheable: bool = True
+    fingerprint_target: Union[str, FingerprintFunc, None] = None
+    declared_version: Optional[str] = None
+    inputs: Optional[List[str]] = None
+    outputs: List[str] = field(default_factory=list)
+    resource: str = "cpu"
+    cost: Dict[str, Any] = field(default_factory=dict)
+    description: str = ""
+    policy: Dict[str, Any] = field(default_factory=dict)
+    settings_keys: List[str] = field(default_factory=list)
+    modules: List[str] = field(default_factory=list)
+    _func: Optional[ToolFunc] = field(default=None, repr=False, compare=False)
+    _version: Optional[str] = field(default=None, repr=False, compare=False)
+
+    @property
+    def func(self) -> ToolFunc:
+        if self._func is None:
+            self._func = resolve_target(self.target)
+        return self._func
+
+    @property
+    def version(self) -> str:
+        if self._version is None:
+            self._version = self.declared_version or _source_version(self.func, self.modules)
+        return self._version
+
+    @property
+    def fingerprint(self) -> Optional[FingerprintFunc]:
+        if self.fingerprint_target is None:
+            return None
+        return resolve_target(self.fingerprint_target)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "inputs": None if self.inputs is None else list(self.inputs),
+            "outputs": list(self.outputs),
+            "resource": self.resource,
+            "cacheable": self.cacheable,
+            "cost": dict(self.cost),
+            "policy": dict(self.policy),
+        }
 
 
 class ToolRegistry:
     def __init__(self):
-        self.tools: Dict[str, ToolFunc] = {}
+        self.specs: Dict[str, ToolSpec] = {}
+
+    def register(
+        self,
+        name: str,
+        func: Union[str, ToolFunc],
+        version: Optional[str] = None,
+        cacheable: bool = True,
+        fingerprint: Union[str, FingerprintFunc, None] = None,
+        inputs: Optional[List[str]] = None,
+        outputs: Optional[List[str]] = None,
+        resource: str = "cpu",
+        cost: Optional[Dict[str, Any]] = None,
+        description: str = "",
+        policy: Optional[Dict[str, Any]] = None,
+        settings_keys: Optional[List[str]] = None,
+        modules: Optional[List[str]] = None,
+    ) -> None:
+        if resource not in RESOURCE_CLASSES:
+            raise ValueError(f"工具 {name} 的资源类别无效: {resource}")
+        self.specs[name] = ToolSpec(
+            name,
+            func,
+            cacheable,
+            fingerprint,
+            version,
+            None if inputs is None else list(inputs),
+            list(outputs or []),
+            resource,
+            dict(cost or {}),
+            description,
+            dict(policy or {}),
+            list(settings_keys or []),
+            list(modules or []),
+        )
 
-    def register(self, name: str, func: ToolFunc) -> None:
-        self.tools[name] = func
+    def __contains__(self, name: str) -> bool:
+        return name in self.specs
 
     def get(self, name: str) -> ToolFunc:
-        if name not in self.tools:
+        return self.spec(name).func
+
+    def spec(self, name: str) -> ToolSpec:
+        if name not in self.specs:
             raise ValueError(f"工具未注册: {name}")
-        return self.tools[name]
+        return self.specs[name]
 
     def all(self) -> Dict[str, ToolFunc]:
-        return self.tools
+        return {name: spec.func for name, spec in self.specs.items()}
+
+    def describe(self) -> List[Dict[str, Any]]:
+        return [spec.describe() for spec in self.specs.values()]
+
+    def validate(self, names: List[str]) -> None:
+        unknown = sorted({name for name in names if name not in self.specs})
+        if unknown:
+            raise ValueError(f"计划引用了未注册的工具: {', '.join(unknown)}")
+
+    def discover(self, group: str = ENTRY_POINT_GROUP, spec_group: str = SPEC_ENTRY_POINT_GROUP) -> int:
+        from importlib.metadata import entry_points
+
+        # `模块:函数` 入口只登记目标，首次调用时才导入；`模块` 入口（register_tools）与元数据组的入口需在发现时导入
+        found = 0
+        for ep in entry_points(group=group):
+            try:
+                if ep.attr:
+                    self.register(ep.name, ep.value)
+                else:
+                    module = ep.load()
+                    if not hasattr(module, "register_tools"):
+                        raise ValueError(f"模块 {ep.value} 未定义 register_tools")
+                    module.register_tools(self)
+            except Exception as e:
+                logger.warning(f"插件工具 {ep.name} 注册失败，已跳过: {e}")
+                continue
+            found += 1
+        for ep in entry_points(group=spec_group):
+            try:
+                options = dict(ep.load())
+                if "target" not in options:
+                    raise ValueError(f"元数据缺少 target: {ep.value}")
+                self.register(ep.name, options.pop("target"), **options)
+            except Exception as e:
+                logger.warning(f"插件工具 {ep.name} 注册失败，已跳过: {e}")
+                continue
+            found += 1
+        return found
+
+    def load_modules(self, modules: List[str]) -> None:
+        for module_name in modules:
+            if "=" in module_name:
+                name, target = (part.strip() for part in module_name.split("=", 1))
+                self.register(name, target)
+                continue
+            module = importlib.import_module(module_name)
+            if hasattr(module, "register_tools"):
+                module.register_tools(self)
 
 
 def _safe_select(sql: str) -> bool:
@@ -41,126 +227,269 @@ def _ensure_limit(sql: str, limit: int = 10000) -> str:
     return f"{sql} limit {limit}"
 
 
+def _check_cancelled(context: Dict[str, Any]) -> None:
+    token = getattr(context, "token", None)
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def _cancel_scope(context: Dict[str, Any], callback):
+    token = getattr(context, "token", None)
+    if token is None:
+        return nullcontext()
+    return token.scope(callback)
+
+
 def mysql_query(settings: Settings, context: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
     import pandas as pd
-    import pymysql
 
     sql = params.get("sql") or "select * from sample_finance"
     if not _safe_select(sql):
         raise ValueError("仅允许单条 SELECT 语句")
-    sql = _ensure_limit(sql)
-    conn = pymysql.connect(
-        host=settings.mysql_host,
-        port=settings.mysql_port,
-        user=settings.mysql_user,
-        password=settings.mysql_password,
-        database=settings.mysql_db,
-        charset="utf8mb4",
-    )
-    df = pd.read_sql(sql, conn)
-    conn.close()
-    output_dir = settings.output_dir
-    os.makedirs(output_dir, exist_ok=True)
-    path = os.path.join(output_dir, f"raw_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
-    df.to_csv(path, index=False)
+    store = ArtifactStore(settings, params.get("artifact_format"))
+    if params.get("stream", settings.query_stream):
+        from .streaming import ChunkSource, iter_query
+        chunksize = int(params.get("chunksize") or settings.stream_chunksize)
+        with store.writer("raw") as writer, connection(settings) as conn, _cancel_scope(context, conn.close):
+            for chunk in iter_query(conn, sql, chunksize):
+                _check_cancelled(context)
+                writer.write(chunk)
+        context["chunks"] = ChunkSource.from_path(writer.path, chunksize, rows=writer.rows)
+        return {"rows": writer.rows, "path": writer.path, "stream": True, "context": {"chunks": writer.path}}
+    sql = _ensure_limit(sql, int(params.get("limit") or settings.query_row_limit))
+    with connection(settings) as conn, _cancel_scope(context, conn.close):
+        df = pd.read_sql(sql, conn)
+    _check_cancelled(context)
+    path = store.write_frame(df, "raw")
     context["dataframe"] = df
-    return {"rows": len(df), "path": path}
+    return {"rows": len(df), "path": path, "context": {"dataframe": path}}
+
+
+def _query_fingerprint(settings: Settings, params: Dict[str, Any]) -> Optional[str]:
+    # 整表 CHECKSUM 在 InnoDB 上逐行读取，代价高于被缓存的查询；只接受调用方提供的数据版本或带索引的版本列，否则不缓存
+    if params.get("data_version") is not None:
+        return str(params["data_version"])
+    column = params.get("version_column")
+    if not column or not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", str(column)):
+        return None
+    sql = params.get("sql") or "select * from sample_finance"
+    words = set(re.findall(r"[A-Za-z_][A-Za-z0-9_]*", sql.lower()))
+    with connection(settings) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "select table_name from information_schema.columns where table_schema = database() and column_name = %s",
+                (column,),
+            )
+            tables = sorted({str(r[0]) for r in cursor.fetchall() if str(r[0]).lower() in words})
+            if not tables:
+                return None
+            versions = []
+            for table in tables:
+                cursor.execute(f"select max(`{column}`) from `{table}`")
+                versions.append([table, cursor.fetchone()[0]])
+    return json.dumps(versions, default=str)
+
+
+def _report_fingerprint(settings: Settings, params: Dict[str, Any]) -> Optional[str]:
+    # 模板文件不属于工具源码，按内容纳入缓存键
+    from .checkpoint import file_digest
+
+    builtin = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+    paths = sorted(os.path.join(builtin, name) for name in os.listdir(builtin)) if os.path.isdir(builtin) else []
+    if params.get("template_path"):
+        if not os.path.isfile(params["template_path"]):
+            return None
+        paths.append(params["template_path"])
+    return json.dumps([file_digest(path) for path in paths if os.path.isfile(path)])
+
+
+def _stream_source(context: Dict[str, Any]):
+    if context.get("dataframe") is None:
+        return context.get("chunks")
+    return None
+
+
+def _frame_or_sample(settings: Settings, context: Dict[str, Any], params: Dict[str, Any]):
+    chunks = _stream_source(context)
+    if chunks is None:
+        return context.get("dataframe")
+    from .streaming import ReservoirSample
+    sample = ReservoirSample(int(params.get("sample_size") or settings.stream_sample_size))
+    for chunk in chunks:
+        _check_cancelled(context)
+        sample.update(chunk)
+    return sample.frame()
 
 
 def data_clean(settings: Settings, context: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
     import pandas as pd
+    chunks = _stream_source(context)
+    if chunks is not None:
+        from .streaming import ChunkSource, clean_stream
+        with ArtifactStore(settings, params.get("artifact_format")).writer("clean") as writer:
+            summary = clean_stream(
+                chunks,
+                writer,
+                dedupe=bool(params.get("dedupe", True)),
+                max_keys=int(params.get("dedupe_max_keys") or settings.stream_dedupe_max_keys),
+            )
+        context["chunks"] = ChunkSource.from_path(writer.path, chunks.chunksize, rows=summary["rows"])
+        return {**summary, "path": writer.path, "stream": True, "context": {"chunks": writer.path}}
+    from .cleaning import clean_frame
     df: pd.DataFrame = context.get("dataframe")
     if df is None:
         raise ValueError("缺少待清洗数据")
-    df = df.copy()
-    df = df.drop_duplicates()
-    df = df.fillna(method="ffill").fillna(method="bfill")
+    df = clean_frame(
+        df,
+        strategies=params.get("strategies"),
+        default=params.get("default_strategy", "ffill"),
+        dedupe=params.get("dedupe", True),
+        downcast_level=params.get("downcast", False),
+        inplace=params.get("inplace", False),
+    )
     context["dataframe"] = df
-    output_dir = settings.output_dir
-    os.makedirs(output_dir, exist_ok=True)
-    path = os.path.join(output_dir, f"clean_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
-    df.to_csv(path, index=False)
-    return {"rows": len(df), "path": path}
+    path = ArtifactStore(settings, params.get("artifact_format")).write_frame(df, "clean")
+    return {"rows": len(df), "path": path, "context": {"dataframe": path}}
+
+
+def _eda_mode(settings: Settings, params: Dict[str, Any], chunks, df) -> str:
+    mode = params.get("mode", "auto")
+    if mode not in ("auto", "exact", "approx"):
+        raise ValueError(f"不支持的 EDA 模式: {mode}")
+    if mode != "auto":
+        return mode
+    if chunks is not None:
+        return "approx"
+    cells = df.shape[0] * df.shape[1] if df is not None else 0
+    return "approx" if cells > settings.eda_exact_cells else "exact"
 
 
 def eda(settings: Settings, context: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
     import pandas as pd
-    df: pd.DataFrame = context.get("dataframe")
-    if df is None:
-        raise ValueError("缺少数据")
-    desc = df.describe(include="all").fillna("").to_dict()
-    corr = {}
-    numeric_df = df.select_dtypes(include="number")
-    if not numeric_df.empty:
-        corr = numeric_df.corr().to_dict()
-    result = {"describe": desc, "correlation": corr}
+    chunks = _stream_source(context)
+    mode = _eda_mode(settings, params, chunks, context.get("dataframe") if chunks is None else None)
+    if mode == "approx":
+        from .profiling import ApproxProfile
+        source = chunks
+        if source is None:
+            df: pd.DataFrame = context.get("dataframe")
+            if df is None:
+                raise ValueError("缺少数据")
+            step = settings.stream_chunksize
+            source = (df.iloc[i : i + step] for i in range(0, len(df), step))
+        state = ApproxProfile(
+            sample_size=int(params.get("sample_size") or settings.stream_sample_size),
+            quantile_k=int(params.get("quantile_k", 200)),
+            hll_precision=int(params.get("hll_precision", 14)),
+        )
+        for chunk in source:
+            _check_cancelled(context)
+            state.update(chunk)
+        result = state.result(top_k=int(params.get("top_k", 20)), block_size=int(params.get("block_size", 256)))
+    elif chunks is not None:
+        from .streaming import StreamingStats
+        stats = StreamingStats()
+        for chunk in chunks:
+            _check_cancelled(context)
+            stats.update(chunk)
+        result = {"describe": stats.describe(), "correlation": stats.correlation(), "rows": stats.rows}
+    else:
+        df: pd.DataFrame = context.get("dataframe")
+        if df is None:
+            raise ValueError("缺少数据")
+        desc = df.describe(include="all").fillna("").to_dict()
+        corr = {}
+        numeric_df = df.select_dtypes(include="number")
+        if not numeric_df.empty:
+            corr = numeric_df.corr().to_dict()
+        result = {"describe": desc, "correlation": corr}
     output_dir = settings.output_dir
     os.makedirs(output_dir, exist_ok=True)
-    path = os.path.join(output_dir, f"eda_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    path = os.path.join(output_dir, f"eda_{unique_stamp()}.json")
     with open(path, "w", encoding="utf-8") as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+        json.dump(result, f, ensure_ascii=False, default=str)
     context["eda"] = result
     return {"path": path}
 
 
 def modeling(settings: Settings, context: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
     import pandas as pd
-    from sklearn.ensemble import IsolationForest
+    from .anomaly import AnomalyEngine, score_batches
+    chunks = _stream_source(context)
+    if chunks is not None:
+        return _modeling_stream(settings, context, params, chunks)
     df: pd.DataFrame = context.get("dataframe")
     if df is None:
         raise ValueError("缺少数据")
-    numeric_df = df.select_dtypes(include="number")
-    if numeric_df.empty:
+    numeric_cols = df.select_dtypes(include="number").columns.tolist()
+    if not numeric_cols:
         return {"message": "无数值字段，跳过建模"}
-    numeric_df = numeric_df.fillna(0)
-    model = IsolationForest(random_state=42, contamination=0.05)
-    preds = model.fit_predict(numeric_df)
-    df_out = df.copy()
+    engine = AnomalyEngine(settings, params)
+    model = engine.fit(df, numeric_cols)
+    preds = score_batches(model, df, numeric_cols, engine.batch_size)
+    df_out = df.copy(deep=False)
     df_out["anomaly_flag"] = preds
-    context["modeling"] = {"anomaly_count": int((preds == -1).sum())}
-    output_dir = settings.output_dir
-    os.makedirs(output_dir, exist_ok=True)
-    path = os.path.join(output_dir, f"model_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
-    df_out.to_csv(path, index=False)
-    return {"path": path, "anomaly_count": context["modeling"]["anomaly_count"]}
+    context["modeling"] = {"anomaly_count": int((preds == -1).sum()), **engine.summary()}
+    path = ArtifactStore(settings, params.get("artifact_format")).write_frame(df_out, "model")
+    return {"path": path, "anomaly_count": context["modeling"]["anomaly_count"], **engine.summary()}
+
+
+def _modeling_stream(settings: Settings, context: Dict[str, Any], params: Dict[str, Any], chunks) -> Dict[str, Any]:
+    from .anomaly import AnomalyEngine, score_batches
+    sample = _frame_or_sample(settings, context, params)
+    numeric_cols = sample.select_dtypes(include="number").columns.tolist()
+    if not numeric_cols:
+        return {"message": "无数值字段，跳过建模"}
+    engine = AnomalyEngine(settings, params)
+    model = engine.fit(sample, numeric_cols)
+    anomaly_count = 0
+    with ArtifactStore(settings, params.get("artifact_format")).writer("model") as writer:
+        for chunk in chunks:
+            _check_cancelled(context)
+            preds = score_batches(model, chunk, numeric_cols, engine.batch_size)
+            anomaly_count += int((preds == -1).sum())
+            writer.write(chunk.assign(anomaly_flag=preds))
+    context["modeling"] = {"anomaly_count": anomaly_count, "sample_rows": len(sample), **engine.summary()}
+    return {"path": writer.path, "anomaly_count": anomaly_count, "stream": True, **engine.summary()}
 
 
 def visualization(settings: Settings, context: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
     import pandas as pd
-    import matplotlib.pyplot as plt
-    import seaborn as sns
-    df: pd.DataFrame = context.get("dataframe")
+    from .charts import ChartRenderer, histogram_spec, scatter_spec
+    df: pd.DataFrame = _frame_or_sample(settings, context, params)
     if df is None:
         raise ValueError("缺少数据")
-    output_dir = settings.output_dir
-    os.makedirs(output_dir, exist_ok=True)
-    images = []
     numeric_cols = df.select_dtypes(include="number").columns.tolist()
-    if numeric_cols:
-        col = numeric_cols[0]
-        plt.figure(figsize=(8, 4))
-        sns.histplot(df[col].dropna(), kde=True)
-        path = os.path.join(output_dir, f"hist_{col}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
-        plt.tight_layout()
-        plt.savefig(path)
-        plt.close()
-        images.append(path)
-    if len(numeric_cols) >= 2:
-        plt.figure(figsize=(6, 6))
-        sns.scatterplot(data=df, x=numeric_cols[0], y=numeric_cols[1])
-        path = os.path.join(output_dir, f"scatter_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
-        plt.tight_layout()
-        plt.savefig(path)
-        plt.close()
-        images.append(path)
-    context["visuals"] = images
-    return {"images": images}
+    columns = [c for c in params.get("columns") or numeric_cols if c in numeric_cols]
+    max_charts = params.get("max_charts")
+    if max_charts:
+        columns = columns[: int(max_charts)]
+    pairs = params.get("scatter")
+    if pairs is None:
+        pairs = [columns[:2]] if len(columns) >= 2 else []
+    specs = [histogram_spec(df[col], bins=int(params.get("bins", 50)), kde=bool(params.get("kde", False))) for col in columns]
+    for x, y in pairs:
+        specs.append(
+            scatter_spec(
+                df,
+                x,
+                y,
+                max_points=int(params.get("max_points", 20000)),
+                hexbin_threshold=int(params.get("hexbin_threshold", 50000)),
+            )
+        )
+    specs = [spec for spec in specs if spec is not None]
+    result = ChartRenderer(settings, params.get("workers")).render(
+        specs, settings.output_dir, unique_stamp()
+    )
+    context["visuals"] = result["images"]
+    return result
 
 
 def report_tool(settings: Settings, context: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
     from .report import ReportRenderer
     renderer = ReportRenderer(settings)
-    report = renderer.render(context, template_path=params.get("template_path"))
+    report = renderer.render(context, template_path=params.get("template_path"), formats=params.get("formats"))
     return report
 
 
@@ -205,118 +534,261 @@ def _extract_revenue_by_year(text: str, years: list[int]) -> Dict[int, float]:
     return results
 
 
+SAMPLE_FINANCE_COLUMNS = ["company", "year", "revenue", "source", "source_url", "snippet"]
+SAMPLE_FINANCE_DDL = """
+    company varchar(255),
+    year int,
+    revenue double,
+    source varchar(255),
+    source_url text,
+    snippet text,
+    unique key uq_sample_finance_company_year (company, year)
+"""
+SAMPLE_FINANCE_KEY = ["company", "year"]
+
+
+def _records(df) -> list[tuple]:
+    frame = df.astype(object).where(df.notna(), None)
+    return list(frame.itertuples(index=False, name=None))
+
+
+def _bulk_replace(conn, table: str, ddl: str, columns: list[str], rows: list[tuple], batch_size: int = 1000) -> None:
+    # 暂存表与旧表名带随机后缀，并发导入互不删除对方的暂存表；rename 原子交换，最后一次交换生效
+    suffix = uuid.uuid4().hex[:8]
+    staging = f"{table}__staging_{suffix}"
+    retired = f"{table}__old_{suffix}"
+    placeholders = ", ".join(["%s"] * len(columns))
+    insert_sql = f"insert into {staging} ({', '.join(columns)}) values ({placeholders})"
+    batch_size = max(1, batch_size)
+    with conn.cursor() as cursor:
+        cursor.execute(f"create table if not exists {table} ({ddl})")
+        cursor.execute(f"create table {staging} ({ddl})")
+        try:
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(insert_sql, rows[start : start + batch_size])
+            conn.commit()
+            cursor.execute(f"rename table {table} to {retired}, {staging} to {table}")
+        except BaseException:
+            cursor.execute(f"drop table if exists {staging}")
+            raise
+        cursor.execute(f"drop table {retired}")
+    conn.commit()
+
+
+def _has_unique_key(conn, table: str, key: list[str]) -> bool:
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "select index_name, column_name from information_schema.statistics "
+            "where table_schema = database() and table_name = %s and non_unique = 0 "
+            "order by index_name, seq_in_index",
+            (table,),
+        )
+        indexes: Dict[str, list] = {}
+        for index_name, column_name in cursor.fetchall():
+            indexes.setdefault(index_name, []).append(str(column_name).lower())
+    return any(columns == key for columns in indexes.values())
+
+
+def _upsert(
+    conn, table: str, columns: list[str], key: list[str], rows: list[tuple], batch_size: int = 1000, update: bool = True
+) -> None:
+    # 非主键列整体替换，同一行不会混合两次采集的内容；update=False 时已有行保持不变
+    if not rows:
+        return
+    placeholders = ", ".join(["%s"] * len(columns))
+    if update:
+        updates = ", ".join(f"{c} = values({c})" for c in columns if c not in key)
+    else:
+        updates = f"{key[0]} = {key[0]}"
+    sql = f"insert into {table} ({', '.join(columns)}) values ({placeholders}) on duplicate key update {updates}"
+    batch_size = max(1, batch_size)
+    with conn.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start : start + batch_size])
+    conn.commit()
+
+
+def _finance_rows(settings: Settings, doc, years: list[int]) -> list[dict]:
+    extracted = _extract_revenue_by_year(doc.text or "", years)
+    snippet = (doc.text or doc.snippet or "")[:500]
+    if not extracted:
+        source = "tavily" if doc.source_url else "pending"
+        return [{"company": doc.company, "year": years[0], "revenue": None, "source": source, "source_url": doc.source_url, "snippet": snippet}]
+    source = "tavily" if settings.tavily_api_key else "url"
+    return [
+        {"company": doc.company, "year": year, "revenue": revenue, "source": source, "source_url": doc.source_url, "snippet": snippet}
+        for year, revenue in extracted.items()
+    ]
+
+
 def public_data_ingest(settings: Settings, context: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
     import pandas as pd
-    import pymysql
-    import trafilatura
+    from .ingest import IngestPipeline, SourceStateStore
     names = params.get("companies", [])
     if not names:
         names = ["迈为股份", "捷佳伟创", "拉普拉斯", "奥特维", "晶盛机电", "连城数控"]
-    years = params.get("years", [2024, 2023, 2022])
+    years = params.get("years") or [2024, 2023, 2022]
     years = [int(y) for y in years]
     urls = params.get("urls", [])
-    rows = []
-    for name in names:
-        source_url = None
-        snippet = None
-        text_content = None
-        if urls:
-            for u in urls:
-                if name in u:
-                    source_url = u
-                    break
-        if settings.tavily_api_key:
-            try:
-                from tavily import TavilyClient
-                client = TavilyClient(api_key=settings.tavily_api_key)
-                data = client.search(query=f"{name} 年报 营业收入 数据", max_results=3)
-                items = data.get("results", [])
-                if items:
-                    source_url = items[0].get("url")
-                    snippet = items[0].get("content")
-            except Exception:
-                source_url = None
-                snippet = None
-        if source_url:
-            try:
-                downloaded = trafilatura.fetch_url(source_url)
-                if downloaded:
-                    text_content = trafilatura.extract(downloaded)
-            except Exception:
-                text_content = None
-        extracted = _extract_revenue_by_year(text_content or "", years)
-        if extracted:
-            for year, revenue in extracted.items():
-                rows.append(
-                    {
-                        "company": name,
-                        "year": year,
-                        "revenue": revenue,
-                        "source": "tavily" if settings.tavily_api_key else "url",
-                        "source_url": source_url,
-                        "snippet": (text_content or snippet or "")[:500],
-                    }
-                )
-        else:
-            rows.append(
-                {
-                    "company": name,
-                    "year": years[0],
-                    "revenue": None,
-                    "source": "tavily" if source_url else "pending",
-                    "source_url": source_url,
-                    "snippet": (text_content or snippet or "")[:500],
-                }
-            )
-    df = pd.DataFrame(rows)
-    conn = pymysql.connect(
-        host=settings.mysql_host,
-        port=settings.mysql_port,
-        user=settings.mysql_user,
-        password=settings.mysql_password,
-        database=settings.mysql_db,
-        charset="utf8mb4",
-    )
-    with conn.cursor() as cursor:
-        cursor.execute(
-            """
-            create table if not exists sample_finance (
-                company varchar(255),
-                year int,
-                revenue double,
-                source varchar(255),
-                source_url text,
-                snippet text
-            )
-            """
+    batch_size = int(params.get("batch_size") or settings.ingest_batch_size)
+    incremental = bool(params.get("incremental", settings.ingest_incremental))
+    if incremental:
+        with connection(settings) as conn:
+            incremental = _has_unique_key(conn, "sample_finance", SAMPLE_FINANCE_KEY)
+    scope = "years=" + ",".join(str(y) for y in sorted(set(years)))
+    sources = SourceStateStore(settings.ingest_state_path or os.path.join(settings.state_dir, "ingest.db"), scope) if incremental else None
+    try:
+        pipeline = IngestPipeline(
+            settings,
+            fetch_workers=params.get("fetch_workers"),
+            extract_workers=params.get("extract_workers"),
+            per_host_limit=params.get("per_host_limit"),
+            timeout=params.get("timeout"),
+            sources=sources,
         )
-        cursor.execute("delete from sample_finance")
-        for _, row in df.iterrows():
-            cursor.execute(
-                "insert into sample_finance (company, year, revenue, source, source_url, snippet) values (%s, %s, %s, %s, %s, %s)",
-                (
-                    row["company"],
-                    int(row["year"]),
-                    row["revenue"],
-                    row["source"],
-                    row["source_url"],
-                    row["snippet"],
-                ),
+        docs = pipeline.run(names, urls)
+        _check_cancelled(context)
+        if not incremental:
+            rows = [row for doc in docs for row in _finance_rows(settings, doc, years)]
+            df = pd.DataFrame(rows, columns=SAMPLE_FINANCE_COLUMNS).drop_duplicates(SAMPLE_FINANCE_KEY, keep="last")
+            with connection(settings) as conn:
+                _bulk_replace(conn, "sample_finance", SAMPLE_FINANCE_DDL, SAMPLE_FINANCE_COLUMNS, _records(df), batch_size)
+            context["dataframe"] = df
+            return {"rows": len(df), "mode": "full"}
+        changed = [doc for doc in docs if not doc.unchanged and not doc.error]
+        # 未抽取到营收的占位行只补充新公司，不覆盖已有数据；同键时优先保留抽取到营收的行
+        rows = sorted((row for doc in changed for row in _finance_rows(settings, doc, years)), key=lambda r: r["revenue"] is None)
+        upserts = pd.DataFrame(rows, columns=SAMPLE_FINANCE_COLUMNS).drop_duplicates(SAMPLE_FINANCE_KEY, keep="first")
+        pending = upserts["revenue"].isna()
+        with connection(settings) as conn:
+            _upsert(conn, "sample_finance", SAMPLE_FINANCE_COLUMNS, SAMPLE_FINANCE_KEY, _records(upserts[~pending]), batch_size)
+            _upsert(
+                conn, "sample_finance", SAMPLE_FINANCE_COLUMNS, SAMPLE_FINANCE_KEY, _records(upserts[pending]), batch_size, update=False
             )
-    conn.commit()
-    conn.close()
+            placeholders = ", ".join(["%s"] * len(names))
+            df = pd.read_sql(
+                f"select {', '.join(SAMPLE_FINANCE_COLUMNS)} from sample_finance where company in ({placeholders})",
+                conn,
+                params=list(names),
+            )
+        sources.record(changed)
+    finally:
+        if sources is not None:
+            sources.close()
     context["dataframe"] = df
-    return {"rows": len(df)}
+    return {
+        "rows": len(df),
+        "mode": "incremental",
+        "upserted": len(upserts),
+        "changed_sources": len(changed),
+        "skipped_sources": sum(1 for doc in docs if doc.unchanged),
+        "failed_sources": sum(1 for doc in docs if doc.error),
+    }
+
+
+BUILTIN_TOOLS = {
+    "mysql_query": {
+        "target": f"{__name__}:mysql_query",
+        "fingerprint": f"{__name__}:_query_fingerprint",
+        "inputs": [],
+        "outputs": ["dataframe", "chunks"],
+        "resource": "io",
+        "cost": {"scales_with": "rows", "default_row_limit": "QUERY_ROW_LIMIT"},
+        "description": "执行只读 SELECT 查询获取数据",
+        "settings_keys": ["query_row_limit", "query_stream", "stream_chunksize", "artifact_format"],
+        "modules": [f"{__package__}.streaming", f"{__package__}.artifacts"],
+        "policy": {"retries": 2},
+    },
+    "data_clean": {
+        "target": f"{__name__}:data_clean",
+        "inputs": ["dataframe", "chunks"],
+        "outputs": ["dataframe", "chunks"],
+        "resource": "memory",
+        "cost": {"scales_with": "rows"},
+        "description": "缺失值填充、去重与类型压缩",
+        "settings_keys": ["stream_chunksize", "stream_dedupe_max_keys", "artifact_format"],
+        "modules": [f"{__package__}.cleaning", f"{__package__}.streaming", f"{__package__}.artifacts"],
+    },
+    "eda": {
+        "target": f"{__name__}:eda",
+        "inputs": ["dataframe", "chunks"],
+        "outputs": ["eda"],
+        "resource": "cpu",
+        "cost": {"scales_with": "cells"},
+        "description": "描述性统计与相关性分析",
+        "settings_keys": ["eda_exact_cells", "stream_chunksize", "stream_sample_size"],
+        "modules": [f"{__package__}.profiling", f"{__package__}.streaming"],
+    },
+    "modeling": {
+        "target": f"{__name__}:modeling",
+        "inputs": ["dataframe", "chunks"],
+        "outputs": ["modeling"],
+        "resource": "cpu",
+        "cost": {"scales_with": "rows", "parallel": True},
+        "description": "异常检测建模",
+        "settings_keys": ["model_fit_sample_size", "model_reuse", "stream_chunksize", "stream_sample_size", "artifact_format"],
+        "modules": [f"{__package__}.anomaly", f"{__package__}.streaming", f"{__package__}.artifacts"],
+    },
+    "visualization": {
+        "target": f"{__name__}:visualization",
+        "inputs": ["dataframe", "chunks"],
+        "outputs": ["visuals"],
+        "resource": "cpu",
+        "cost": {"scales_with": "columns", "parallel": True},
+        "description": "生成直方图与散点图",
+        "modules": [f"{__package__}.charts"],
+    },
+    "report": {
+        "target": f"{__name__}:report_tool",
+        "fingerprint": f"{__name__}:_report_fingerprint",
+        "inputs": ["eda", "modeling", "visuals", "step_metrics"],
+        "resource": "io",
+        "cost": {"scales_with": "constant"},
+        "description": "汇总分析结果生成 markdown/html/pdf 报告",
+        "settings_keys": ["report_formats"],
+        "modules": [f"{__package__}.report"],
+    },
+    "web_search": {
+        "target": f"{__name__}:web_search",
+        "cacheable": False,
+        "inputs": [],
+        "resource": "network",
+        "cost": {"external_api": "tavily"},
+        "description": "调用检索服务搜索公开信息",
+        "policy": {"retries": 2, "timeout": 60},
+    },
+    "public_data_ingest": {
+        "target": f"{__name__}:public_data_ingest",
+        "cacheable": False,
+        "inputs": [],
+        "outputs": ["dataframe"],
+        "resource": "network",
+        "cost": {"scales_with": "companies", "external_api": "tavily"},
+        "description": "采集公开财务数据并写入 sample_finance 表",
+        "policy": {"retries": 1},
+    },
+}
 
 
 def build_default_registry() -> ToolRegistry:
     registry = ToolRegistry()
-    registry.register("mysql_query", mysql_query)
-    registry.register("data_clean", data_clean)
-    registry.register("eda", eda)
-    registry.register("modeling", modeling)
-    registry.register("visualization", visualization)
-    registry.register("report", report_tool)
-    registry.register("web_search", web_search)
-    registry.register("public_data_ingest", public_data_ingest)
+    for name, options in BUILTIN_TOOLS.items():
+        options = dict(options)
+        registry.register(name, options.pop("target"), **options)
     return registry
+
+
+_registries: Dict[tuple, ToolRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(settings: Settings) -> ToolRegistry:
+    key = tuple(settings.tool_modules)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = build_default_registry()
+            registry.discover()
+            registry.load_modules(settings.tool_modules)
+            _registries[key] = registry
+        return registry
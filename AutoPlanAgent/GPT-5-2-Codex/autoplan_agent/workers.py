@@ -0,0 +1,245 @@
+import importlib
+import logging
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import Settings
+from .policy import RunCancelled
+from .schemas import ExecutionPlan, TaskUnderstanding
+
+
+logger = logging.getLogger("autoplan.workers")
+
+POLL_INTERVAL = 1.0
+SHUTDOWN_GRACE = 5.0
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+class RunTimeout(TimeoutError):
+    pass
+
+
+def _warm(modules: List[str]) -> None:
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"预加载模块失败 {name}: {e}")
+    if "matplotlib" in sys.modules:
+        sys.modules["matplotlib"].use("Agg")
+
+
+def _apply_limits(cpu_seconds: float, memory_bytes: int) -> None:
+    try:
+        import resource
+    except ImportError:
+        return
+    if memory_bytes > 0:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, hard))
+    if cpu_seconds > 0:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1, hard))
+
+
+def _worker_main(settings: Settings, conn, warm: List[str]) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _warm(warm)
+    from .executor import TaskExecutor
+
+    executor = TaskExecutor(settings)
+    send_lock = threading.Lock()
+
+    def send(message) -> None:
+        with send_lock:
+            conn.send(message)
+
+    send(("ready", os.getpid()))
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            run_id, plan, understanding = message
+            try:
+                _apply_limits(settings.worker_cpu_limit, settings.worker_memory_limit)
+                result = executor.run(
+                    ExecutionPlan.model_validate(plan),
+                    TaskUnderstanding.model_validate(understanding),
+                    run_id=run_id,
+                    on_event=lambda event: send(("event", event)),
+                )
+                reply = ("result", result)
+            except RunCancelled as e:
+                reply = ("cancelled", str(e))
+            except BaseException as e:
+                reply = ("error", f"{type(e).__name__}: {e}")
+            # 超时或取消后仍有步骤线程未退出时，该进程不再复用
+            stragglers = executor.stragglers()
+            if stragglers:
+                send(("retire", stragglers))
+            send(reply)
+            if stragglers:
+                break
+    finally:
+        executor.close()
+
+
+class WorkerProcess:
+    def __init__(self, ctx, settings: Settings, warm: List[str]):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(settings, child, warm), daemon=True)
+        self.process.start()
+        child.close()
+
+    def exit_reason(self) -> str:
+        code = self.process.exitcode
+        if code is None:
+            return "worker 无响应"
+        if code < 0:
+            name = signal.Signals(-code).name
+            if -code == getattr(signal, "SIGXCPU", None):
+                return f"worker CPU 时间超出限制 ({name})"
+            return f"worker 被信号终止 ({name})"
+        return f"worker 异常退出 (exit {code})"
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(SHUTDOWN_GRACE)
+        self.conn.close()
+
+
+class WorkerPool:
+    def __init__(self, settings: Settings, size: Optional[int] = None):
+        from .ingest import _process_context
+        from .metrics import REGISTRY
+        from .state import StateStore
+
+        self.settings = settings
+        self.size = max(1, size or settings.api_process_workers)
+        self.timeout = settings.run_timeout
+        self.warm = list(settings.worker_warm_imports)
+        self.ctx = _process_context()
+        self.state = StateStore(settings)
+        self.metrics = REGISTRY
+        self.idle: "queue.Queue[WorkerProcess]" = queue.Queue()
+        self.workers: List[WorkerProcess] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(self.size):
+            self.idle.put(self._spawn())
+
+    def _spawn(self) -> WorkerProcess:
+        worker = WorkerProcess(self.ctx, self.settings, self.warm)
+        with self._lock:
+            self.workers.append(worker)
+        return worker
+
+    def _replace(self, worker: WorkerProcess) -> WorkerProcess:
+        worker.kill()
+        with self._lock:
+            if worker in self.workers:
+                self.workers.remove(worker)
+        return self._spawn()
+
+    def _forward(self, event: Dict[str, Any], on_event: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+        if event.get("type") == "step_finished" and event.get("tool"):
+            self.metrics.observe(event["tool"], event.get("status", ""), event.get("metrics") or {})
+        if on_event is not None:
+            on_event(event)
+
+    def _fail(self, run_id: Optional[str]) -> None:
+        if run_id and self.state.exists(run_id):
+            try:
+                self.state.finish(run_id, "failed")
+            except Exception as e:
+                logger.warning(f"标记运行失败时出错 {run_id}: {e}")
+
+    def run(
+        self,
+        plan: ExecutionPlan,
+        understanding: TaskUnderstanding,
+        run_id: Optional[str] = None,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        if self._closed:
+            raise RuntimeError("worker 池已关闭")
+        if run_id is None:
+            run_id = self.state.create()
+        worker = self.idle.get()
+        if not worker.process.is_alive():
+            # 空闲期间退出（OOM、资源限制等）的 worker 在派发前替换，运行尚未开始
+            logger.warning(f"空闲 worker 已退出，替换后再派发: {worker.exit_reason()}")
+            worker = self._replace(worker)
+        retire = False
+        try:
+            try:
+                worker.conn.send((run_id, plan.model_dump(), understanding.model_dump()))
+            except (EOFError, OSError):
+                worker.process.join(SHUTDOWN_GRACE)
+                raise WorkerCrashed(worker.exit_reason())
+            deadline = time.monotonic() + self.timeout if self.timeout > 0 else None
+            while True:
+                wait = POLL_INTERVAL
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RunTimeout(f"运行超过 {self.timeout:g} 秒未完成")
+                    wait = min(wait, remaining)
+                if not worker.conn.poll(wait):
+                    if not worker.process.is_alive():
+                        raise WorkerCrashed(worker.exit_reason())
+                    continue
+                try:
+                    kind, value = worker.conn.recv()
+                except (EOFError, OSError):
+                    worker.process.join(SHUTDOWN_GRACE)
+                    raise WorkerCrashed(worker.exit_reason())
+                if kind == "event":
+                    self._forward(value, on_event)
+                elif kind == "retire":
+                    logger.warning(f"worker {worker.process.pid} 有 {value} 个步骤线程未退出，运行结束后替换")
+                    retire = True
+                elif kind == "result":
+                    return value
+                elif kind == "cancelled":
+                    retire = True
+                    raise RunCancelled(value)
+                elif kind == "error":
+                    raise RuntimeError(value)
+        except (RunTimeout, WorkerCrashed):
+            retire = False
+            worker = self._replace(worker)
+            self._fail(run_id)
+            raise
+        finally:
+            if retire:
+                worker = self._replace(worker)
+            self.idle.put(worker)
+
+    def shutdown(self) -> None:
+        self._closed = True
+        with self._lock:
+            workers = list(self.workers)
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        deadline = time.monotonic() + SHUTDOWN_GRACE
+        for worker in workers:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            worker.kill()
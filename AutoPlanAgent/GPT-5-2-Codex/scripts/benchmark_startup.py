@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+COMMANDS = {
+    "import": [sys.executable, "-c", "import autoplan_agent.cli"],
+    "status": [sys.executable, "-m", "autoplan_agent.cli", "status", "--run-id", "missing"],
+    "list": [sys.executable, "-m", "autoplan_agent.cli", "list", "--limit", "1"],
+}
+
+
+def time_command(argv: list, env: dict, repeat: int) -> dict:
+    walls = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(argv, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        walls.append(time.perf_counter() - start)
+    return {"wall_seconds_min": min(walls), "wall_seconds_median": statistics.median(walls)}
+
+
+def import_profile(env: dict, top: int) -> list:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import autoplan_agent.cli"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        rows.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    rows.sort(key=lambda r: r["cumulative_us"], reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI import and startup time")
+    parser.add_argument("--commands", nargs="*", default=list(COMMANDS), choices=list(COMMANDS))
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--output")
+    parser.add_argument("--budget", type=float, help="fail when a command's median exceeds this many seconds")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="autoplan_startup_")
+    env = dict(os.environ, STATE_DIR=os.path.join(workdir, "state"), OUTPUT_DIR=os.path.join(workdir, "outputs"))
+    results = []
+    for name in args.commands:
+        results.append({"command": name, "repeat": args.repeat, **time_command(COMMANDS[name], env, args.repeat)})
+        print(f"{name:<8} {results[-1]['wall_seconds_median'] * 1000:.1f}ms", file=sys.stderr)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+        "imports": import_profile(env, args.top),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.budget is not None and any(r["wall_seconds_median"] > args.budget for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+from dataclasses import replace
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from autoplan_agent.config import Settings
+from autoplan_agent.db import ConnectionPool, set_pool
+from autoplan_agent.metrics import StepProbe
+from autoplan_agent.tools import get_registry
+
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+TOOLS = ["mysql_query", "data_clean", "eda", "modeling", "visualization", "report"]
+
+
+def finance_frame(rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    companies = np.array([f"公司{i:04d}" for i in range(max(1, rows // 50))])
+    df = pd.DataFrame(
+        {
+            "company": companies[rng.integers(0, len(companies), rows)],
+            "year": rng.integers(2015, 2025, rows),
+            "revenue": rng.lognormal(mean=20, sigma=1.5, size=rows),
+            "source": rng.choice(["tavily", "url", "pending"], rows),
+            "source_url": "https://example.com/report",
+            "snippet": "营业收入",
+        }
+    )
+    df.loc[rng.random(rows) < 0.05, "revenue"] = np.nan
+    return df
+
+
+def wide_frame(rows: int, cols: int = 64, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = rng.standard_normal((rows, cols))
+    data[rng.random((rows, cols)) < 0.01] = np.nan
+    return pd.DataFrame(data, columns=[f"x{i}" for i in range(cols)])
+
+
+def fake_database(path: str, table: str, df: pd.DataFrame) -> ConnectionPool:
+    with sqlite3.connect(path) as conn:
+        df.to_sql(table, conn, index=False, if_exists="replace", chunksize=100_000)
+    return ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False), max_size=2)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return ""
+
+
+def bench_dataset(settings: Settings, name: str, df: pd.DataFrame, tools: list, repeat: int) -> list:
+    registry = get_registry(settings)
+    table = f"bench_{name}"
+    set_pool(settings, fake_database(os.path.join(settings.state_dir, f"{table}.db"), table, df))
+    params = {"mysql_query": {"sql": f"select * from {table}", "limit": len(df)}}
+    results = []
+    for tool in tools:
+        runs = []
+        for _ in range(repeat):
+            context = {"dataframe": df}
+            if tool in ("eda", "modeling", "visualization", "report"):
+                registry.get("data_clean")(settings, context, {})
+            if tool == "report":
+                for upstream in ("eda", "modeling", "visualization"):
+                    registry.get(upstream)(settings, context, {})
+            probe = StepProbe(settings.step_metrics_memory).start()
+            registry.get(tool)(settings, context, params.get(tool, {}))
+            runs.append(probe.stop(len(df), None, []))
+        walls = [r["wall_seconds"] for r in runs]
+        results.append(
+            {
+                "tool": tool,
+                "dataset": name,
+                "rows": len(df),
+                "columns": df.shape[1],
+                "repeat": repeat,
+                "wall_seconds_min": min(walls),
+                "wall_seconds_median": statistics.median(walls),
+                "cpu_seconds_median": statistics.median(r["cpu_seconds"] for r in runs),
+                "peak_memory_bytes": max(r.get("peak_memory_bytes") or 0 for r in runs),
+            }
+        )
+        print(f"{name:>12} {tool:<14} {results[-1]['wall_seconds_median']:.4f}s", file=sys.stderr)
+    return results
+
+
+def compare(current: list, baseline_path: str, threshold: float) -> int:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["dataset"], r["tool"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    for r in current:
+        base = baseline.get((r["dataset"], r["tool"]))
+        if not base or not base["wall_seconds_median"]:
+            continue
+        ratio = r["wall_seconds_median"] / base["wall_seconds_median"]
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{r['dataset']:>12} {r['tool']:<14} {ratio:6.2f}x{flag}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the built-in analysis tools on synthetic data")
+    parser.add_argument("--sizes", nargs="*", default=["10k", "1m", "10m"], choices=sorted(SIZES))
+    parser.add_argument("--shapes", nargs="*", default=["finance", "wide"], choices=["finance", "wide"])
+    parser.add_argument("--tools", nargs="*", default=TOOLS, choices=TOOLS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="autoplan_bench_")
+    settings = replace(
+        Settings.load(),
+        output_dir=os.path.join(workdir, "outputs"),
+        state_dir=os.path.join(workdir, "state"),
+        step_cache=False,
+    )
+    os.makedirs(settings.state_dir, exist_ok=True)
+    results = []
+    for size in args.sizes:
+        rows = SIZES[size]
+        for shape in args.shapes:
+            df = finance_frame(rows) if shape == "finance" else wide_frame(rows)
+            results.extend(bench_dataset(settings, f"{shape}_{size}", df, args.tools, args.repeat))
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import dataclasses
+
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("joblib")
+
+from autoplan_agent.anomaly import AnomalyEngine, MADDetector, ModelStore, build_detector, schema_key, score_batches
+from autoplan_agent.config import Settings
+
+
+@pytest.fixture()
+def settings(tmp_path):
+    return dataclasses.replace(Settings.load(), state_dir=str(tmp_path / "state"), model_dir="", model_reuse=True)
+
+
+def frame():
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({"a": rng.normal(size=200), "b": rng.normal(size=200)})
+    data.loc[7, "a"] = 50.0
+    return data
+
+
+def test_mad_detector_flags_outliers():
+    data = frame()
+    model = MADDetector().fit(data.to_numpy())
+    preds = score_batches(model, data, ["a", "b"], batch_size=32)
+    assert preds[7] == -1
+    assert (preds == -1).sum() < 10
+    # 常数列的 MAD 为 0，不应产生误报
+    constant = np.ones((10, 1))
+    assert (MADDetector().fit(constant).predict(constant) == 1).all()
+
+
+def test_build_detector_rejects_unknown():
+    with pytest.raises(ValueError):
+        build_detector("lof", {})
+
+
+def test_schema_key_depends_on_columns_and_params():
+    dtypes = [np.dtype("float64")] * 2
+    key = schema_key("mad", ["a", "b"], dtypes, {"threshold": 3.5})
+    assert key == schema_key("mad", ["a", "b"], dtypes, {"threshold": 3.5, "batch_size": 10})
+    assert key != schema_key("mad", ["a", "c"], dtypes, {"threshold": 3.5})
+    assert key != schema_key("mad", ["a", "b"], dtypes, {"threshold": 4})
+
+
+def test_model_store_round_trip(settings, tmp_path):
+    store = ModelStore(settings)
+    assert store.root == str(tmp_path / "state" / "models")
+    assert store.load("missing") is None
+    path = store.save("k", MADDetector(threshold=2.0))
+    assert path == store.path("k")
+    assert store.load("k").threshold == 2.0
+    assert [p.name for p in (tmp_path / "state" / "models").iterdir()] == ["k.joblib"]
+
+
+def test_engine_reuses_saved_model(settings):
+    data = frame()
+    first = AnomalyEngine(settings, {"detector": "mad"})
+    first.fit(data, ["a", "b"])
+    assert first.summary()["model_reused"] is False
+    second = AnomalyEngine(settings, {"detector": "mad"})
+    model = second.fit(data, ["a", "b"])
+    assert second.summary() == {"detector": "mad", "model_path": first.model_path, "model_reused": True}
+    assert model.predict(data.to_numpy())[7] == -1
+    fresh = AnomalyEngine(settings, {"detector": "mad", "reuse_model": False})
+    fresh.fit(data, ["a", "b"])
+    assert fresh.reused is False
+    with pytest.raises(ValueError):
+        AnomalyEngine(settings, {"detector": "lof"})
@@ -0,0 +1,70 @@
+import dataclasses
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from autoplan_agent.cache import StepCache
+from autoplan_agent.config import Settings
+from autoplan_agent.schemas import PlanStep
+from autoplan_agent.tools import build_default_registry
+
+
+@pytest.fixture()
+def settings(tmp_path):
+    return dataclasses.replace(Settings.load(), cache_dir=str(tmp_path / "cache"), step_cache=True)
+
+
+@pytest.fixture()
+def registry():
+    return build_default_registry()
+
+
+def step(tool, **parameters):
+    return PlanStep(name=tool, description=tool, tool=tool, parameters=parameters)
+
+
+def test_query_without_cheap_version_is_not_cached(settings, registry):
+    cache = StepCache(settings)
+    spec = registry.spec("mysql_query")
+    assert cache.key(spec, step("mysql_query", sql="select * from t"), []) is None
+    first = cache.key(spec, step("mysql_query", sql="select * from t", data_version="v1"), [])
+    second = cache.key(spec, step("mysql_query", sql="select * from t", data_version="v2"), [])
+    assert first and second and first != second
+
+
+def test_modeling_key_includes_model_reuse(settings, registry):
+    spec = registry.spec("modeling")
+    off = StepCache(settings).key(spec, step("modeling"), ["a:1"])
+    on = StepCache(dataclasses.replace(settings, model_reuse=True)).key(spec, step("modeling"), ["a:1"])
+    assert off != on
+
+
+def test_report_key_follows_template_content(settings, registry, tmp_path):
+    cache = StepCache(settings)
+    spec = registry.spec("report")
+    template = tmp_path / "custom.md.j2"
+    template.write_text("# {{ report.executive_summary }}", encoding="utf-8")
+    before = cache.key(spec, step("report", template_path=str(template)), ["a:1"])
+    template.write_text("## {{ report.executive_summary }}", encoding="utf-8")
+    after = cache.key(spec, step("report", template_path=str(template)), ["a:1"])
+    assert before and after and before != after
+    assert cache.key(spec, step("report", template_path=str(tmp_path / "missing.j2")), ["a:1"]) is None
+
+
+def test_put_and_get_round_trip(settings, registry, tmp_path):
+    cache = StepCache(settings)
+    spec = registry.spec("eda")
+    artifact = tmp_path / "eda.json"
+    artifact.write_text("{}", encoding="utf-8")
+    key = cache.key(spec, step("eda"), ["a:1"])
+    cache.put(key, spec, {"path": str(artifact)}, {"eda": {"kind": "json", "path": str(artifact)}}, "fp")
+    hit = cache.get(key)
+    assert hit["fingerprint"] == "fp"
+    assert hit["checkpoint"]["eda"]["path"].startswith(settings.cache_dir)
+    cache.close()
+
+
+def test_cache_dir_defaults_under_state_dir(tmp_path):
+    settings = dataclasses.replace(Settings.load(), state_dir=str(tmp_path / "custom"), cache_dir="")
+    assert StepCache(settings).root == str(tmp_path / "custom" / "cache")
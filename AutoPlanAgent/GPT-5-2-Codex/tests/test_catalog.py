@@ -0,0 +1,61 @@
+import dataclasses
+
+import pytest
+
+from autoplan_agent.catalog import RunCatalog
+from autoplan_agent.config import Settings
+
+
+@pytest.fixture()
+def catalog(tmp_path):
+    catalog = RunCatalog(dataclasses.replace(Settings.load(), state_dir=str(tmp_path), catalog_path=""))
+    yield catalog
+    catalog.close()
+
+
+def snapshot(status="running", steps=(), started_at=1.0):
+    return {
+        "created_at": "2026-01-01T00:00:00",
+        "started_at": started_at,
+        "status": status,
+        "plan": {"steps": [{"name": n, "tool": "eda"} for n in ("a", "b", "c")]},
+        "understanding": {"objective": "测试"},
+        "steps": list(steps),
+    }
+
+
+def run(catalog):
+    return catalog.query()["runs"][0]
+
+
+def test_retries_count_each_step_once(catalog):
+    catalog.record_snapshot("r1", snapshot())
+    catalog.record_step("r1", {"step_name": "a", "status": "failed"})
+    catalog.record_step("r1", {"step_name": "a", "status": "success"})
+    catalog.record_step("r1", {"step_name": "a", "status": "success"})
+    row = run(catalog)
+    assert (row["steps_done"], row["steps_failed"]) == (1, 0)
+
+
+def test_resumed_run_does_not_double_count(catalog):
+    catalog.record_snapshot("r1", snapshot(steps=[{"step_name": "a", "status": "success"}]))
+    catalog.record_step("r1", {"step_name": "a", "status": "success"})
+    catalog.record_step("r1", {"step_name": "b", "status": "success"})
+    assert run(catalog)["steps_done"] == 2
+
+
+def test_failed_and_cancelled_steps_stick_until_finish(catalog):
+    catalog.record_snapshot("r1", snapshot())
+    catalog.record_step("r1", {"step_name": "a", "status": "failed"})
+    catalog.record_step("r1", {"step_name": "b", "status": "success"})
+    assert run(catalog)["status"] == "failed"
+    catalog.record_snapshot("r1", snapshot(steps=[{"step_name": "a", "status": "failed"}]))
+    assert run(catalog)["status"] == "failed"
+
+    catalog.record_snapshot("r2", snapshot())
+    catalog.record_step("r2", {"step_name": "a", "status": "cancelled"})
+    catalog.record_step("r2", {"step_name": "b", "status": "success"})
+    assert catalog.query(status="cancelled")["runs"][0]["run_id"] == "r2"
+
+    catalog.record_snapshot("r1", snapshot(status="succeeded", started_at=2.0))
+    assert catalog.query(status="succeeded")["runs"][0]["run_id"] == "r1"
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from autoplan_agent.cleaning import clean_frame, downcast, fill_forward_backward
+
+
+def test_fill_forward_backward_fills_leading_gaps():
+    series = pd.Series([np.nan, 1.0, np.nan, 3.0, np.nan])
+    assert fill_forward_backward(series).tolist() == [1.0, 1.0, 1.0, 3.0, 3.0]
+    empty = pd.Series([np.nan, np.nan])
+    assert fill_forward_backward(empty).isna().all()
+
+
+def test_fill_forward_backward_matches_pandas_for_extension_dtypes():
+    series = pd.Series([None, 2, None, 4], dtype="Int64")
+    pd.testing.assert_series_equal(fill_forward_backward(series), series.ffill().bfill())
+
+
+def test_clean_frame_strategies():
+    df = pd.DataFrame(
+        {
+            "a": [1.0, np.nan, 3.0, 10.0],
+            "b": [1.0, np.nan, 3.0, 5.0],
+            "c": ["x", None, "x", "y"],
+            "d": [np.nan, 2.0, 3.0, 4.0],
+            "e": [0.0, np.nan, 2.0, 3.0],
+        }
+    )
+    out = clean_frame(
+        df,
+        {"a": "median", "b": {"strategy": "constant", "value": 0}, "c": "mode", "d": "none", "e": "interpolate"},
+    )
+    assert out["a"].tolist() == [1.0, 3.0, 3.0, 10.0]
+    assert out["b"].tolist() == [1.0, 0.0, 3.0, 5.0]
+    assert out["c"].tolist() == ["x", "x", "x", "y"]
+    assert np.isnan(out.loc[0, "d"])
+    assert out["e"].tolist() == [0.0, 1.0, 2.0, 3.0]
+    # 默认不修改输入
+    assert df["a"].isna().sum() == 1
+
+
+def test_clean_frame_drop_and_dedupe():
+    df = pd.DataFrame({"k": [1, 1, 2, 3], "v": [1.0, 1.0, np.nan, 4.0]})
+    out = clean_frame(df, {"v": "drop"})
+    assert out["k"].tolist() == [1, 3]
+    kept = clean_frame(df, {"v": "drop"}, dedupe=False)
+    assert kept["k"].tolist() == [1, 1, 3]
+
+
+def test_clean_frame_rejects_unknown_columns_and_strategies():
+    df = pd.DataFrame({"a": [1.0]})
+    with pytest.raises(ValueError):
+        clean_frame(df, {"missing": "mean"})
+    with pytest.raises(ValueError):
+        clean_frame(df, {"a": "zero"})
+
+
+def test_downcast():
+    df = pd.DataFrame({"i": np.arange(10, dtype=np.int64), "f": np.linspace(0, 1, 10), "s": ["a", "b"] * 5})
+    out = downcast(df.copy(), True)
+    assert out["i"].dtype == np.int8
+    assert out["f"].dtype == np.float64
+    assert isinstance(out["s"].dtype, pd.CategoricalDtype)
+    assert downcast(df.copy(), "all")["f"].dtype == np.float32
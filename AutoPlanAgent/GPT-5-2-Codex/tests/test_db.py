@@ -0,0 +1,185 @@
+import dataclasses
+import sqlite3
+import threading
+
+import pytest
+
+from autoplan_agent.config import Settings
+from autoplan_agent.db import ConnectionPool, PoolExhausted, close_pools, connection, get_pool, set_pool
+
+
+class FakeCursor:
+    """按 pymysql 的用法包装 sqlite3 游标：%s 占位符，可作为上下文管理器。"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=None):
+        return self._cursor.execute(sql.replace("%s", "?"), tuple(params or ()))
+
+    def executemany(self, sql, rows):
+        return self._cursor.executemany(sql.replace("%s", "?"), [tuple(r) for r in rows])
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class FakeConnection:
+    paramstyle = "format"
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self.closed = False
+
+    def cursor(self, *args):
+        if self.closed:
+            raise sqlite3.InterfaceError("connection closed")
+        return FakeCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        if self.closed:
+            raise sqlite3.InterfaceError("connection closed")
+        self._conn.rollback()
+
+    def close(self):
+        self.closed = True
+        self._conn.close()
+
+
+class FakeDriver:
+    def __init__(self, path):
+        self.path = path
+        self.opened = []
+        self._lock = threading.Lock()
+
+    def connect(self):
+        conn = FakeConnection(self.path)
+        with self._lock:
+            self.opened.append(conn)
+        return conn
+
+
+@pytest.fixture()
+def driver(tmp_path):
+    return FakeDriver(str(tmp_path / "fake.db"))
+
+
+@pytest.fixture()
+def settings(tmp_path):
+    yield dataclasses.replace(Settings.load(), mysql_db=f"fake_{tmp_path.name}")
+    close_pools()
+
+
+def test_pool_reuses_connections(driver):
+    pool = ConnectionPool(driver.connect, max_size=2)
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("create table t (id integer, name text)")
+            cursor.executemany("insert into t values (%s, %s)", [(1, "a"), (2, "b")])
+        conn.commit()
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("select count(*) from t where id > %s", (0,))
+            assert cursor.fetchone()[0] == 2
+    assert len(driver.opened) == 1
+    assert pool.size == 1
+
+
+def test_pool_discards_connection_after_error(driver):
+    pool = ConnectionPool(driver.connect, max_size=1)
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("select * from missing")
+    assert driver.opened[0].closed
+    with pool.connection():
+        pass
+    assert len(driver.opened) == 2
+
+
+def test_pool_discards_closed_connection_on_release(driver):
+    pool = ConnectionPool(driver.connect, max_size=1)
+    with pool.connection() as conn:
+        conn.close()
+    assert pool.size == 0
+
+
+def test_pool_limits_size(driver):
+    pool = ConnectionPool(driver.connect, max_size=1, acquire_timeout=0.1)
+    held = pool.acquire()
+    with pytest.raises(PoolExhausted):
+        pool.acquire()
+    pool.release(held)
+    pool.release(pool.acquire())
+
+
+def test_pool_evicts_idle_connections(driver):
+    pool = ConnectionPool(driver.connect, max_size=2, idle_timeout=0.0)
+    with pool.connection():
+        pass
+    with pool.connection():
+        pass
+    assert driver.opened[0].closed
+    assert len(driver.opened) == 2
+
+
+def test_tools_share_registered_pool(driver, settings):
+    pool = get_pool(settings, driver.connect)
+    assert get_pool(settings) is pool
+    with connection(settings) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("select 1")
+    assert len(driver.opened) == 1
+
+
+def test_get_pool_rejects_different_factory(driver, settings):
+    get_pool(settings, driver.connect)
+    with pytest.raises(ValueError):
+        get_pool(settings, FakeDriver(driver.path).connect)
+    replacement = ConnectionPool(driver.connect)
+    set_pool(settings, replacement)
+    assert get_pool(settings) is replacement
+
+
+def test_mysql_query_runs_through_pool(driver, settings):
+    pytest.importorskip("pandas")
+    from autoplan_agent.tools import mysql_query
+
+    get_pool(settings, driver.connect)
+    with connection(settings) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("create table sample_finance (company text, year integer, revenue real)")
+            cursor.executemany("insert into sample_finance values (%s, %s, %s)", [("a", 2023, 1.0), ("b", 2023, 2.0)])
+        conn.commit()
+    settings = dataclasses.replace(settings, output_dir=str(driver.path) + ".out", artifact_format="csv", query_stream=False)
+    context = {}
+    result = mysql_query(settings, context, {"sql": "select * from sample_finance"})
+    assert result["rows"] == 2
+    assert len(context["dataframe"]) == 2
+    assert len(driver.opened) == 1
@@ -0,0 +1,280 @@
+import dataclasses
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pydantic")
+
+from autoplan_agent.config import Settings
+from autoplan_agent import executor as executor_module
+from autoplan_agent.db import close_pools
+from autoplan_agent.executor import TaskExecutor, build_dependency_graph
+from autoplan_agent.policy import RunCancelled, StepTimeout, TransientError
+from autoplan_agent.schemas import ExecutionPlan, PlanStep, TaskUnderstanding
+from autoplan_agent.tools import ToolRegistry
+
+
+class Tracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.active = 0
+        self.peak = 0
+
+    def tool(self, settings, context, params):
+        with self.lock:
+            self.events.append(("start", params["id"]))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(params.get("sleep", 0.05))
+        with self.lock:
+            self.active -= 1
+            self.events.append(("end", params["id"]))
+        if params.get("fail"):
+            raise ValueError(f"步骤 {params['id']} 失败")
+        return {"id": params["id"]}
+
+    def index(self, kind, step_id):
+        return self.events.index((kind, step_id))
+
+
+def produce(settings, context, params):
+    context[params.get("key", "value")] = params.get("value", 1)
+    return {"value": params.get("value", 1)}
+
+
+@pytest.fixture()
+def settings(tmp_path):
+    yield dataclasses.replace(
+        Settings.load(),
+        mysql_db=f"fake_{tmp_path.name}",
+        state_dir=str(tmp_path / "state"),
+        output_dir=str(tmp_path / "outputs"),
+        cache_dir=str(tmp_path / "state" / "cache"),
+        catalog_path="",
+        log_file="",
+        step_cache=False,
+        step_timeout=0.0,
+        step_retries=0,
+        step_policies={},
+        max_workers=4,
+    )
+    close_pools()
+
+
+def make_executor(settings, **tools):
+    registry = ToolRegistry()
+    registry.register("produce", produce, inputs=[], outputs=["value"])
+    for name, options in tools.items():
+        options = dict(options)
+        registry.register(name, options.pop("target"), **options)
+    executor = TaskExecutor(settings)
+    executor._registry = registry
+    return executor
+
+
+def plan(*steps):
+    return ExecutionPlan(summary="test", steps=[PlanStep(description=s.get("name", ""), **s) for s in steps])
+
+
+def test_unknown_step_policy_fails_before_run_is_created(settings):
+    settings = dataclasses.replace(settings, step_policies={"produce": {"retry": 1}})
+    executor = make_executor(settings)
+    with pytest.raises(ValueError):
+        executor.run(plan({"name": "a", "tool": "produce"}), TaskUnderstanding())
+    assert executor.state.run_ids() == []
+
+
+def test_scheduler_error_finishes_run(settings):
+    executor = make_executor(settings)
+
+    def on_event(event):
+        if event["type"] == "step_finished":
+            raise RuntimeError("订阅方出错")
+
+    run_id = executor.state.create()
+    with pytest.raises(RuntimeError):
+        executor.run(plan({"name": "a", "tool": "produce"}), TaskUnderstanding(), run_id=run_id, on_event=on_event)
+    data = executor.state.load(run_id)
+    assert data["status"] == "failed"
+    assert data["finished_at"]
+    assert not executor.state.cancel_requested(run_id)
+
+
+def tracked(name, *deps, **params):
+    return {"name": name, "tool": "tracked", "dependencies": list(deps), "parameters": dict(params, id=name)}
+
+
+def test_undeclared_steps_follow_previous_step():
+    steps = plan(
+        {"name": "extract", "tool": "produce"},
+        {"name": "clean", "tool": "produce", "dependencies": ["extract"]},
+        {"name": "eda", "tool": "produce"},
+        {"name": "report", "tool": "produce"},
+    ).steps
+    graph = build_dependency_graph(steps)
+    assert graph == {"extract": set(), "clean": {"extract"}, "eda": {"clean"}, "report": {"eda"}}
+
+
+def test_dependency_graph_rejects_cycles_and_unknown_steps():
+    with pytest.raises(ValueError):
+        build_dependency_graph(plan({"name": "a", "tool": "produce", "dependencies": ["b"]}, {"name": "b", "tool": "produce", "dependencies": ["a"]}).steps)
+    with pytest.raises(ValueError):
+        build_dependency_graph(plan({"name": "a", "tool": "produce", "dependencies": ["missing"]}).steps)
+
+
+def test_steps_run_after_their_dependencies(settings):
+    tracker = Tracker()
+    executor = make_executor(settings, tracked={"target": tracker.tool, "inputs": []})
+    result = executor.run(
+        plan(tracked("a"), tracked("b", "a", sleep=0.2), tracked("c", "a", sleep=0.2), tracked("d", "b", "c")),
+        TaskUnderstanding(),
+    )
+    assert [s["step_name"] for s in result["steps"]] == ["a", "b", "c", "d"]
+    assert tracker.index("end", "a") < min(tracker.index("start", "b"), tracker.index("start", "c"))
+    assert tracker.index("start", "d") > max(tracker.index("end", "b"), tracker.index("end", "c"))
+    assert tracker.peak == 2
+    assert executor.state.load(result["run_id"])["status"] == "succeeded"
+
+
+def test_concurrency_is_bounded_by_max_workers(settings):
+    tracker = Tracker()
+    settings = dataclasses.replace(settings, max_workers=2)
+    executor = make_executor(settings, tracked={"target": tracker.tool, "inputs": []})
+    executor.run(plan(tracked("root"), *[tracked(f"s{i}", "root", sleep=0.1) for i in range(5)]), TaskUnderstanding())
+    assert tracker.peak == 2
+
+
+def test_failure_stops_dependents(settings):
+    tracker = Tracker()
+    executor = make_executor(settings, tracked={"target": tracker.tool, "inputs": []})
+    run_id = executor.state.create()
+    with pytest.raises(ValueError):
+        executor.run(
+            plan(tracked("a"), tracked("bad", "a", fail=True), tracked("after", "bad")),
+            TaskUnderstanding(),
+            run_id=run_id,
+        )
+    assert ("start", "after") not in tracker.events
+    data = executor.state.load(run_id)
+    assert data["status"] == "failed"
+    assert {s["step_name"]: s["status"] for s in data["steps"]} == {"a": "success", "bad": "failed"}
+
+
+class Flaky:
+    def __init__(self, failures, exc=TransientError):
+        self.failures = failures
+        self.exc = exc
+        self.calls = 0
+
+    def tool(self, settings, context, params):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.exc(f"第 {self.calls} 次失败")
+        return {"calls": self.calls}
+
+
+def retry_settings(settings, retries):
+    return dataclasses.replace(settings, step_retries=retries, step_retry_backoff=0.0, step_retry_max_backoff=0.0)
+
+
+def test_transient_failure_is_retried(settings):
+    flaky = Flaky(2)
+    executor = make_executor(retry_settings(settings, 2), flaky={"target": flaky.tool, "inputs": []})
+    events = []
+    result = executor.run(plan({"name": "load", "tool": "flaky"}), TaskUnderstanding(), on_event=events.append)
+    assert flaky.calls == 3
+    assert result["steps"][0]["attempts"] == 3
+    assert [e["attempt"] for e in events if e["type"] == "step_retry"] == [1, 2]
+
+
+def test_retries_are_exhausted(settings):
+    flaky = Flaky(5)
+    executor = make_executor(retry_settings(settings, 1), flaky={"target": flaky.tool, "inputs": []})
+    run_id = executor.state.create()
+    with pytest.raises(TransientError):
+        executor.run(plan({"name": "load", "tool": "flaky"}), TaskUnderstanding(), run_id=run_id)
+    assert flaky.calls == 2
+    assert executor.state.load(run_id)["steps"][0]["attempts"] == 2
+
+
+def test_permanent_failure_is_not_retried(settings):
+    flaky = Flaky(1, exc=ValueError)
+    executor = make_executor(retry_settings(settings, 3), flaky={"target": flaky.tool, "inputs": []})
+    with pytest.raises(ValueError):
+        executor.run(plan({"name": "load", "tool": "flaky"}), TaskUnderstanding())
+    assert flaky.calls == 1
+
+
+def test_timeout_stops_cooperative_step(settings):
+    calls = []
+
+    def slow(settings, context, params):
+        calls.append(1)
+        while True:
+            context.token.raise_if_cancelled()
+            time.sleep(0.01)
+
+    settings = dataclasses.replace(settings, step_policies={"slow": {"timeout": 0.1, "retries": 1, "backoff": 0}})
+    executor = make_executor(settings, slow={"target": slow, "inputs": []})
+    run_id = executor.state.create()
+    with pytest.raises(StepTimeout):
+        executor.run(plan({"name": "slow", "tool": "slow"}), TaskUnderstanding(), run_id=run_id)
+    # 超时属于瞬时错误：线程在宽限期内退出后按策略重试一次
+    assert len(calls) == 2
+    assert executor.stragglers() == 0
+    data = executor.state.load(run_id)
+    assert data["status"] == "failed"
+    assert data["steps"][0]["status"] == "failed"
+
+
+def test_timeout_grace_abandons_stuck_step(settings, monkeypatch):
+    monkeypatch.setattr(executor_module, "TIMEOUT_GRACE", 0.1)
+    release = threading.Event()
+
+    def stuck(settings, context, params):
+        release.wait(5)
+        return {}
+
+    settings = dataclasses.replace(settings, step_policies={"stuck": {"timeout": 0.1, "retries": 2}})
+    executor = make_executor(settings, stuck={"target": stuck, "inputs": []})
+    started = time.monotonic()
+    try:
+        with pytest.raises(StepTimeout):
+            executor.run(plan({"name": "stuck", "tool": "stuck"}), TaskUnderstanding())
+        # 宽限期后仍未退出的线程不再重试，只记录为滞留线程
+        assert time.monotonic() - started < 2
+        assert executor.stragglers() == 1
+    finally:
+        release.set()
+
+
+def test_cancel_request_cancels_run(settings):
+    started = threading.Event()
+
+    def wait(settings, context, params):
+        started.set()
+        while True:
+            context.token.raise_if_cancelled()
+            time.sleep(0.01)
+
+    tracker = Tracker()
+    executor = make_executor(settings, wait={"target": wait, "inputs": []}, tracked={"target": tracker.tool, "inputs": []})
+    run_id = executor.state.create()
+
+    def cancel():
+        started.wait(5)
+        executor.state.request_cancel(run_id)
+
+    thread = threading.Thread(target=cancel)
+    thread.start()
+    with pytest.raises(RunCancelled):
+        executor.run(plan({"name": "wait", "tool": "wait"}, tracked("after", "wait")), TaskUnderstanding(), run_id=run_id)
+    thread.join()
+    assert tracker.events == []
+    data = executor.state.load(run_id)
+    assert data["status"] == "cancelled"
+    assert data["steps"][0]["status"] == "cancelled"
+    assert not executor.state.cancel_requested(run_id)
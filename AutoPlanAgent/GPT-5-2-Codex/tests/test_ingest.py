@@ -0,0 +1,106 @@
+import dataclasses
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from autoplan_agent.config import Settings
+from autoplan_agent.ingest import IngestPipeline, SourceStateStore, fetch_conditional
+
+
+PAGE = "<html><body><p>测试公司 2023年 营业收入 123.4 亿元</p></body></html>".encode("utf-8")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/slow"):
+            time.sleep(1.0)
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture()
+def settings(tmp_path):
+    return dataclasses.replace(Settings.load(), tavily_api_key="", ingest_state_path=str(tmp_path / "sources.db"))
+
+
+def test_fetch_conditional_uses_validators(server):
+    body, validators = fetch_conditional(f"{server}/acme", 5)
+    assert body == PAGE
+    assert validators["etag"] == '"v1"'
+    body, validators = fetch_conditional(f"{server}/acme", 5, etag='"v1"')
+    assert body is None
+    assert validators["etag"] == '"v1"'
+
+
+def test_fetch_conditional_times_out(server):
+    with pytest.raises(OSError):
+        fetch_conditional(f"{server}/slow", 0.2)
+
+
+def test_collect_keeps_caller_url_when_search_is_empty(server, settings):
+    settings = dataclasses.replace(settings, tavily_api_key="key")
+    pipeline = IngestPipeline(settings)
+    pipeline._search = lambda name: None
+    doc = pipeline._collect("acme", [f"{server}/acme"])
+    assert doc.source_url == f"{server}/acme"
+    assert doc.html == PAGE
+    assert doc.error is None
+
+
+def test_collect_skips_unchanged_source(server, settings):
+    sources = SourceStateStore(settings.ingest_state_path)
+    try:
+        pipeline = IngestPipeline(settings, sources=sources)
+        first = pipeline._collect("acme", [f"{server}/acme"])
+        assert not first.unchanged
+        sources.record([first])
+        second = pipeline._collect("acme", [f"{server}/acme"])
+        assert second.unchanged
+        assert second.html is None
+    finally:
+        sources.close()
+
+
+def test_source_state_is_scoped_by_extraction_params(server, settings):
+    url = f"{server}/acme"
+    sources = SourceStateStore(settings.ingest_state_path, "years=2023")
+    try:
+        sources.record([IngestPipeline(settings, sources=sources)._collect("acme", [url])])
+    finally:
+        sources.close()
+    other = SourceStateStore(settings.ingest_state_path, "years=2025")
+    try:
+        assert other.get(url) is None
+        assert not IngestPipeline(settings, sources=other)._collect("acme", [url]).unchanged
+    finally:
+        other.close()
+
+
+def test_run_extracts_text(server, settings):
+    pytest.importorskip("trafilatura")
+    docs = IngestPipeline(settings, extract_workers=0).run(["acme"], [f"{server}/acme"])
+    assert docs[0].error is None
+    assert "营业收入" in (docs[0].text or "")
@@ -0,0 +1,108 @@
+import asyncio
+import dataclasses
+import threading
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from autoplan_agent.config import Settings
+from autoplan_agent.jobs import JobManager, JobQueueFull
+from autoplan_agent.policy import RunCancelled
+from autoplan_agent.schemas import ExecutionPlan, PlanStep, TaskUnderstanding
+
+
+PLAN = ExecutionPlan(summary="test", steps=[PlanStep(name="a", description="a", tool="eda")])
+
+
+class FakeRun:
+    def __init__(self, outcome=None):
+        self.outcome = outcome
+        self.release = threading.Event()
+
+    def __call__(self, plan, understanding, run_id=None, on_event=None):
+        on_event({"type": "step_started", "step": "a"})
+        self.release.wait(5)
+        if self.outcome is not None:
+            raise self.outcome
+        on_event({"type": "step_finished", "step": "a", "status": "success"})
+        return {"run_id": run_id, "steps": []}
+
+
+def manager(run, **overrides):
+    settings = dataclasses.replace(Settings.load(), api_job_workers=1, api_job_queue=2, **overrides)
+    ids = iter(f"run{i}" for i in range(100))
+    return JobManager(settings, run, lambda: next(ids))
+
+
+def stream(job):
+    """按 API 的 SSE 循环读取事件：订阅后等待作业线程唤醒，不占用线程池线程。"""
+
+    async def collect():
+        wake = job.subscribe(asyncio.get_running_loop())
+        cursor, seen = 0, []
+        try:
+            while True:
+                wake.clear()
+                batch = job.events_since(cursor)
+                if not batch:
+                    await asyncio.wait_for(wake.wait(), 5)
+                    continue
+                seen.extend(e["type"] for e in batch)
+                cursor += len(batch)
+                if batch[-1]["type"] == "run_finished":
+                    return seen
+        finally:
+            job.unsubscribe(wake)
+
+    return collect
+
+
+def test_job_events_wake_async_subscribers():
+    run = FakeRun()
+    jobs = manager(run)
+    job = jobs.submit(PLAN, TaskUnderstanding())
+
+    async def main():
+        task = asyncio.ensure_future(stream(job)())
+        await asyncio.sleep(0.05)
+        run.release.set()
+        return await task
+
+    assert asyncio.run(main()) == ["run_started", "step_started", "step_finished", "run_finished"]
+    assert job.status == "succeeded"
+    assert job.progress()["completed_steps"] == 1
+    assert not job._subscribers
+    jobs.shutdown()
+
+
+def test_job_records_cancel_and_failure():
+    cancelled = FakeRun(RunCancelled("已取消"))
+    cancelled.release.set()
+    jobs = manager(cancelled)
+    job = jobs.submit(PLAN, TaskUnderstanding())
+    asyncio.run(stream(job)())
+    assert (job.status, job.error) == ("cancelled", "已取消")
+
+    failing = FakeRun(ValueError("坏数据"))
+    failing.release.set()
+    jobs.run = failing
+    job = jobs.submit(PLAN, TaskUnderstanding())
+    asyncio.run(stream(job)())
+    assert job.status == "failed"
+    jobs.shutdown()
+
+
+def test_queue_limit_and_cancel_queued_job():
+    run = FakeRun()
+    jobs = manager(run)
+    first = jobs.submit(PLAN, TaskUnderstanding())
+    second = jobs.submit(PLAN, TaskUnderstanding())
+    with pytest.raises(JobQueueFull):
+        jobs.submit(PLAN, TaskUnderstanding())
+    assert jobs.cancel(second.run_id).status == "cancelled"
+    run.release.set()
+    asyncio.run(stream(first)())
+    assert first.status == "succeeded"
+    assert second.events[-1]["type"] == "run_finished"
+    jobs.shutdown()
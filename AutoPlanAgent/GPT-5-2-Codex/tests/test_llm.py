@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from autoplan_agent.llm import LLMCache
+from autoplan_agent.schemas import TaskUnderstanding
+
+
+def fake_llm(base_url):
+    return SimpleNamespace(model_name="gpt-4o-mini", openai_api_base=base_url, temperature=0.2)
+
+
+def test_key_separates_endpoints():
+    keys = {
+        LLMCache.key(fake_llm(url), TaskUnderstanding, "system", "task")
+        for url in ("https://a.example/v1", "https://b.example/v1", None)
+    }
+    assert len(keys) == 3
+
+
+def test_get_or_compute_caches(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.db"), ttl=60)
+    calls = []
+    compute = lambda: calls.append(1) or {"objective": "x"}
+    assert cache.get_or_compute("k", compute) == {"objective": "x"}
+    assert cache.get_or_compute("k", compute) == {"objective": "x"}
+    assert len(calls) == 1
@@ -0,0 +1,90 @@
+import dataclasses
+import socket
+
+import pytest
+
+from autoplan_agent.config import Settings
+from autoplan_agent.policy import CancelToken, ExecutionPolicy, RunCancelled, StepCancelled, TransientError, is_transient
+
+
+class OperationalError(Exception):
+    pass
+
+
+class PoolExhausted(RuntimeError):
+    pass
+
+
+@pytest.fixture()
+def settings():
+    return dataclasses.replace(
+        Settings.load(), step_timeout=10.0, step_retries=1, step_retry_backoff=1.0, step_retry_max_backoff=4.0, step_policies={}
+    )
+
+
+@pytest.mark.parametrize(
+    "exc",
+    [TransientError("x"), TimeoutError(), socket.timeout(), ConnectionResetError(), OperationalError(2013, "lost"), PoolExhausted()],
+)
+def test_transient_errors(exc):
+    assert is_transient(exc)
+
+
+@pytest.mark.parametrize(
+    "exc",
+    [ValueError("x"), OperationalError(1064, "syntax"), OperationalError("no code"), StepCancelled(), RunCancelled()],
+)
+def test_permanent_errors(exc):
+    assert not is_transient(exc)
+
+
+def test_transient_cause_is_followed():
+    try:
+        try:
+            raise OperationalError(2006, "gone away")
+        except OperationalError as e:
+            raise RuntimeError("查询失败") from e
+    except RuntimeError as e:
+        assert is_transient(e)
+
+
+def test_policy_precedence(settings):
+    assert ExecutionPolicy.resolve(settings, "eda") == ExecutionPolicy(timeout=10.0, retries=1, backoff=1.0, max_backoff=4.0)
+    declared = ExecutionPolicy.resolve(settings, "eda", {"retries": 3})
+    assert declared.retries == 3
+    settings = dataclasses.replace(settings, step_policies={"eda": {"retries": 0, "timeout": 0}})
+    configured = ExecutionPolicy.resolve(settings, "eda", {"retries": 3})
+    assert (configured.retries, configured.timeout) == (0, 0.0)
+
+
+def test_policy_rejects_unknown_fields(settings):
+    with pytest.raises(ValueError):
+        ExecutionPolicy.resolve(settings, "eda", {"retry": 1})
+
+
+def test_delay_is_capped(settings):
+    policy = ExecutionPolicy.resolve(settings, "eda")
+    assert all(0 <= policy.delay(attempt) <= 4.0 for attempt in range(1, 10))
+
+
+def test_cancel_token_propagates_and_detaches():
+    parent = CancelToken()
+    child = CancelToken(parent)
+    detached = CancelToken(parent)
+    detached.detach()
+    closed = []
+    with child.scope(lambda: closed.append("conn")):
+        parent.cancel()
+    assert child.cancelled and not detached.cancelled
+    assert closed == ["conn"]
+    with pytest.raises(StepCancelled):
+        child.raise_if_cancelled()
+
+
+def test_cancel_token_scope_removes_callback():
+    token = CancelToken()
+    called = []
+    with token.scope(lambda: called.append(1)):
+        pass
+    token.cancel()
+    assert called == []
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from autoplan_agent.profiling import HyperLogLog, QuantileSketch, hash_values, profile, top_k_correlation
+
+
+def test_hyperloglog_estimate_and_merge():
+    values = pd.Series(np.arange(50000))
+    left, right = HyperLogLog(12), HyperLogLog(12)
+    left.update(hash_values(values[:30000]))
+    right.update(hash_values(values[20000:]))
+    left.merge(right)
+    assert abs(left.count() - 50000) / 50000 < 4 * left.relative_error
+    small = HyperLogLog()
+    small.update(hash_values(pd.Series(["a", "b", "a", None])))
+    assert small.count() == 2
+    with pytest.raises(ValueError):
+        HyperLogLog(3)
+
+
+def test_quantile_sketch_rank_error():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=200000)
+    sketch = QuantileSketch(200)
+    for chunk in np.array_split(values, 20):
+        sketch.update(chunk)
+    result = sketch.quantiles((0.1, 0.5, 0.9))
+    for q, key in ((0.1, "p10"), (0.5, "p50"), (0.9, "p90")):
+        rank = (values < result[key]).mean()
+        assert abs(rank - q) < 3 * sketch.rank_error
+
+
+def test_profile_matches_exact_moments():
+    rng = np.random.default_rng(1)
+    frame = pd.DataFrame({"x": rng.normal(5, 2, 20000), "y": rng.integers(0, 100, 20000), "g": rng.choice(["a", "b"], 20000)})
+    frame.loc[::100, "x"] = np.nan
+    chunks = [frame.iloc[i : i + 3000] for i in range(0, len(frame), 3000)]
+    result = profile(chunks, sample_size=1000).result()
+    assert result["mode"] == "approx"
+    assert result["rows"] == 20000
+    x = result["describe"]["x"]
+    assert x["missing"] == 200
+    assert x["mean"] == pytest.approx(frame["x"].mean())
+    assert x["std"] == pytest.approx(frame["x"].std())
+    assert (x["min"], x["max"]) == (frame["x"].min(), frame["x"].max())
+    assert set(result["describe"]["g"]["top_values"]) == {"a", "b"}
+    assert result["sample_rows"] == 1000
+    assert set(result["correlation"]) == {"x", "y"}
+
+
+def test_top_k_correlation_blocks():
+    rng = np.random.default_rng(2)
+    base = rng.normal(size=500)
+    frame = pd.DataFrame({f"c{i}": rng.normal(size=500) for i in range(6)})
+    frame["c5"] = base
+    frame["c1"] = base * 2 + rng.normal(scale=0.01, size=500)
+    pairs = top_k_correlation(frame, k=3, block_size=2)
+    assert len(pairs) == 3
+    assert {pairs[0]["a"], pairs[0]["b"]} == {"c1", "c5"}
+    assert pairs[0]["r"] == pytest.approx(frame["c1"].corr(frame["c5"]))
+    assert top_k_correlation(frame.iloc[:1]) == []
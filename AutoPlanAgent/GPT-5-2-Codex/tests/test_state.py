@@ -0,0 +1,63 @@
+import dataclasses
+import json
+import os
+
+import pytest
+
+from autoplan_agent.config import Settings
+from autoplan_agent.state import StateStore
+
+
+@pytest.fixture()
+def settings(tmp_path):
+    return dataclasses.replace(Settings.load(), state_dir=str(tmp_path / "state"), catalog_path="", state_compact_every=3)
+
+
+def step(name, status="success"):
+    return {"step_name": name, "status": status, "payload": {}}
+
+
+def test_journal_and_compaction(settings):
+    store = StateStore(settings)
+    run_id = store.create()
+    for name in ("a", "b", "c", "d"):
+        store.append_step(run_id, step(name))
+    # 第三条触发压缩：快照记录偏移，之后只重放新的日志
+    with open(store._path(run_id), encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert [s["step_name"] for s in snapshot["steps"]] == ["a", "b", "c"]
+    assert snapshot["journal_offset"] > 0
+    assert [s["step_name"] for s in StateStore(settings).load(run_id)["steps"]] == ["a", "b", "c", "d"]
+
+
+def test_torn_journal_line_is_skipped(settings):
+    store = StateStore(settings)
+    run_id = store.create()
+    store.append_step(run_id, step("a"))
+    with open(store._journal_path(run_id), "ab") as f:
+        f.write(b'{"step_name": "b", "sta')
+    store.append_step(run_id, step("c"))
+    assert [s["step_name"] for s in store.load(run_id)["steps"]] == ["a", "c"]
+
+
+def test_finish_folds_journal(settings):
+    store = StateStore(settings)
+    run_id = store.create()
+    store.append_step(run_id, step("a"))
+    store.finish(run_id, "succeeded")
+    assert not os.path.exists(store._journal_path(run_id))
+    data = store.load(run_id)
+    assert data["status"] == "succeeded"
+    assert [s["step_name"] for s in data["steps"]] == ["a"]
+    assert store.catalog.query()["runs"][0]["status"] == "succeeded"
+
+
+def test_cancel_flag(settings):
+    store = StateStore(settings)
+    run_id = store.create()
+    assert not store.cancel_requested(run_id)
+    store.request_cancel(run_id)
+    assert store.cancel_requested(run_id)
+    store.clear_cancel(run_id)
+    assert not store.cancel_requested(run_id)
+    assert store.run_ids() == [run_id]
@@ -0,0 +1,94 @@
+from decimal import Decimal
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+
+from autoplan_agent.artifacts import FrameWriter, read_frame
+from autoplan_agent.streaming import ChunkSource, HashSet, ReservoirSample, StreamingStats, clean_stream, iter_query
+
+
+class FakeCursor:
+    def __init__(self, rows, columns):
+        self.rows = list(rows)
+        self.description = [(c,) for c in columns]
+        self.closed = False
+
+    def execute(self, sql):
+        pass
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, rows, columns):
+        self.cursor_obj = FakeCursor(rows, columns)
+
+    def cursor(self, *args):
+        return self.cursor_obj
+
+
+def frames(*chunks):
+    return ChunkSource(lambda: [pd.DataFrame(c) for c in chunks], chunksize=2)
+
+
+def test_iter_query_converts_decimals():
+    conn = FakeConnection([("a", Decimal("1.5")), ("b", None), ("c", Decimal("2.25"))], ["company", "revenue"])
+    chunks = list(iter_query(conn, "select", 2))
+    assert [len(c) for c in chunks] == [2, 1]
+    assert all(pd.api.types.is_float_dtype(c["revenue"]) for c in chunks)
+    assert conn.cursor_obj.closed
+
+
+def test_iter_query_empty_result_keeps_columns():
+    chunks = list(iter_query(FakeConnection([], ["company", "revenue"]), "select", 2))
+    assert len(chunks) == 1
+    assert list(chunks[0].columns) == ["company", "revenue"]
+
+
+def test_hash_set_saturates():
+    seen = HashSet(2)
+    seen.add(np.array([3, 1], dtype=np.uint64))
+    seen.add(np.array([2], dtype=np.uint64))
+    assert seen.saturated
+    assert seen.contains(np.array([1, 2, 3], dtype=np.uint64)).tolist() == [True, False, True]
+
+
+def test_clean_stream_dedupes_across_chunks(tmp_path):
+    source = frames({"k": [1, 2], "v": [None, 1.0]}, {"k": [1, 3], "v": [None, None]})
+    with FrameWriter(str(tmp_path / "clean.csv")) as writer:
+        summary = clean_stream(source, writer)
+    assert summary == {"rows": 3, "dedupe_exact": True}
+    df = read_frame(str(tmp_path / "clean.csv"))
+    assert df["k"].tolist() == [1, 2, 3]
+    assert df["v"].notna().all()
+
+
+def test_streaming_stats_match_pandas():
+    rng = np.random.default_rng(0)
+    full = pd.DataFrame({"a": rng.normal(size=50), "b": rng.normal(size=50), "s": ["x"] * 50})
+    full["a"] = full["a"].astype(object)
+    stats = StreamingStats()
+    for start in range(0, 50, 7):
+        stats.update(full.iloc[start : start + 7])
+    described = stats.describe()
+    expected = full[["a", "b"]].astype(float)
+    assert described["a"]["mean"] == pytest.approx(expected["a"].mean())
+    assert described["b"]["std"] == pytest.approx(expected["b"].std())
+    assert described["s"] == {"count": 50}
+    assert stats.correlation()["a"]["b"] == pytest.approx(expected.corr().loc["a", "b"])
+
+
+def test_reservoir_sample_is_bounded():
+    sample = ReservoirSample(5)
+    for start in range(0, 100, 10):
+        sample.update(pd.DataFrame({"x": range(start, start + 10)}))
+    frame = sample.frame()
+    assert len(frame) == 5
+    assert frame["x"].between(0, 99).all()
@@ -0,0 +1,82 @@
+import sys
+from importlib.metadata import EntryPoint
+
+import pytest
+
+from autoplan_agent.tools import ENTRY_POINT_GROUP, SPEC_ENTRY_POINT_GROUP, ToolRegistry
+
+
+PLUGIN = '''
+def score(settings, context, params):
+    return {"ok": True}
+
+SCORE = {
+    "target": "autoplan_plugin_heavy:score",
+    "inputs": ["dataframe"],
+    "outputs": ["scores"],
+    "resource": "network",
+    "policy": {"retries": 1},
+}
+
+BROKEN = {"inputs": []}
+
+def register_tools(registry):
+    registry.register("plugin_a", score, inputs=[])
+    registry.register("plugin_b", score, inputs=["dataframe"])
+'''
+
+
+@pytest.fixture
+def plugin(tmp_path, monkeypatch):
+    (tmp_path / "autoplan_plugin.py").write_text(PLUGIN, encoding="utf-8")
+    (tmp_path / "autoplan_plugin_heavy.py").write_text("raise ImportError('不应在发现阶段导入')\n", encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield
+    for name in ("autoplan_plugin", "autoplan_plugin_heavy"):
+        sys.modules.pop(name, None)
+
+
+def _discover(monkeypatch, *entries):
+    eps = [EntryPoint(name, value, group) for name, value, group in entries]
+    monkeypatch.setattr("importlib.metadata.entry_points", lambda group: [ep for ep in eps if ep.group == group])
+    registry = ToolRegistry()
+    return registry, registry.discover()
+
+
+def test_discover_bare_function_is_lazy(plugin, monkeypatch):
+    registry, found = _discover(monkeypatch, ("score", "autoplan_plugin:score", ENTRY_POINT_GROUP))
+    assert found == 1
+    spec = registry.spec("score")
+    assert spec.target == "autoplan_plugin:score"
+    assert spec.inputs is None
+    assert "autoplan_plugin" not in sys.modules
+    assert spec.func(None, {}, {}) == {"ok": True}
+
+
+def test_discover_metadata_dict(plugin, monkeypatch):
+    registry, _ = _discover(monkeypatch, ("score", "autoplan_plugin:SCORE", SPEC_ENTRY_POINT_GROUP))
+    spec = registry.spec("score")
+    assert spec.inputs == ["dataframe"]
+    assert spec.outputs == ["scores"]
+    assert spec.resource == "network"
+    assert spec.policy == {"retries": 1}
+    # 元数据模块已导入，工具模块仍延迟导入
+    assert "autoplan_plugin_heavy" not in sys.modules
+
+
+def test_discover_register_module(plugin, monkeypatch):
+    registry, _ = _discover(monkeypatch, ("plugin", "autoplan_plugin", ENTRY_POINT_GROUP))
+    assert registry.spec("plugin_a").inputs == []
+    assert registry.spec("plugin_b").inputs == ["dataframe"]
+
+
+def test_discover_skips_broken_plugins(plugin, monkeypatch):
+    registry, found = _discover(
+        monkeypatch,
+        ("broken", "autoplan_plugin:BROKEN", SPEC_ENTRY_POINT_GROUP),
+        ("missing", "autoplan_plugin_missing", ENTRY_POINT_GROUP),
+        ("score", "autoplan_plugin:score", ENTRY_POINT_GROUP),
+    )
+    assert found == 1
+    assert "score" in registry
+    assert "broken" not in registry
@@ -0,0 +1,45 @@
+import dataclasses
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pydantic")
+
+from autoplan_agent.config import Settings
+from autoplan_agent.schemas import ExecutionPlan, TaskUnderstanding
+from autoplan_agent.workers import WorkerPool
+
+
+@pytest.fixture()
+def pool(tmp_path):
+    settings = dataclasses.replace(
+        Settings.load(),
+        state_dir=str(tmp_path / "state"),
+        output_dir=str(tmp_path / "outputs"),
+        cache_dir=str(tmp_path / "state" / "cache"),
+        catalog_path="",
+        log_file="",
+        worker_warm_imports=[],
+        worker_cpu_limit=0.0,
+        worker_memory_limit=0,
+        run_timeout=0.0,
+    )
+    pool = WorkerPool(settings, size=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_runs_plan(pool):
+    result = pool.run(ExecutionPlan(summary="空计划", steps=[]), TaskUnderstanding())
+    assert result["steps"] == []
+    assert pool.state.load(result["run_id"])["status"] == "succeeded"
+
+
+def test_pool_replaces_worker_that_died_while_idle(pool):
+    dead = pool.workers[0]
+    dead.process.kill()
+    dead.process.join(5)
+    result = pool.run(ExecutionPlan(summary="空计划", steps=[]), TaskUnderstanding())
+    assert pool.state.load(result["run_id"])["status"] == "succeeded"
+    assert dead not in pool.workers
+    assert len(pool.workers) == 1